@@ -7,6 +7,7 @@ class Encounter(models.Model):
     started_at = models.DateTimeField(auto_now_add=True)
     reason = models.CharField(max_length=255, blank=True)
     status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='OPEN')
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Encounter #{self.pk} - Patient {self.patient_id}"
@@ -34,6 +35,7 @@ class VitalSign(models.Model):
     unit = models.CharField(max_length=32, default="")
     effective_time = models.DateTimeField(null=True, blank=True)
     note = models.TextField(blank=True, default="")
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         indexes = [models.Index(fields=['encounter','patient','code'])]
@@ -54,6 +56,7 @@ class ConditionEntry(models.Model):
     onset_date = models.DateField(null=True, blank=True)
     abatement_date = models.DateField(null=True, blank=True)
     note = models.TextField(blank=True, default="")
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         indexes = [models.Index(fields=['patient','clinical_status'])]
@@ -72,6 +75,7 @@ class AllergyEntry(models.Model):
     severity = models.CharField(max_length=16, default="", blank=True)  # mild|moderate|severe (optional)
     reaction_text = models.TextField(blank=True, default="")
     note = models.TextField(blank=True, default="")
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         indexes = [models.Index(fields=['patient','status'])]
@@ -1,5 +1,33 @@
 from django.contrib import admin
-from .models import Denial, DenialStatusHistory
+from django.utils import timezone
+from . import denial_rollup
+from .models import Claim, ClaimLine, Diagnosis, Denial, DenialStatusHistory
+from .scrubber import mark_dirty
+
+class ClaimLineInline(admin.TabularInline):
+    model = ClaimLine
+    extra = 0
+    fields = ("cpt", "modifiers", "units", "diagnosis_pointers", "charge", "npi_override")
+
+class DiagnosisInline(admin.TabularInline):
+    model = Diagnosis
+    extra = 0
+    fields = ("order", "code")
+    ordering = ("order",)
+
+@admin.register(Claim)
+class ClaimAdmin(admin.ModelAdmin):
+    list_display = ("id", "patient_id", "payer_name", "pos", "status", "total_charge", "scrub_dirty", "scrubbed_at")
+    list_filter = ("status", "scrub_dirty")
+    search_fields = ("id", "payer_name", "claim_control_number")
+    ordering = ("-id",)
+    readonly_fields = ("scrub_fingerprint", "scrub_rule_version", "scrub_dirty", "scrubbed_at", "created_at")
+    inlines = [DiagnosisInline, ClaimLineInline]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # header and inline edits both change what the scrubber reads
+        mark_dirty([form.instance.pk])
 
 class DenialStatusHistoryInline(admin.TabularInline):
     model = DenialStatusHistory
@@ -17,6 +45,26 @@ class DenialAdmin(admin.ModelAdmin):
     ordering = ("-id",)
     inlines = [DenialStatusHistoryInline]
 
+    # keep DenialRollup in step with edits made here: drop the old row's contribution, add the new one
+    def save_model(self, request, obj, form, change):
+        before = Denial.objects.filter(pk=obj.pk).first() if change else None
+        if obj.status == "CLOSED":
+            obj.closed_at = obj.closed_at or timezone.now()
+        else:
+            obj.closed_at = None
+        super().save_model(request, obj, form, change)
+        if before is not None:
+            denial_rollup.record_removed([before])
+        denial_rollup.record_created([obj])
+
+    def delete_model(self, request, obj):
+        denial_rollup.record_removed([obj])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        denial_rollup.record_removed(list(queryset))
+        super().delete_queryset(request, queryset)
+
 @admin.register(DenialStatusHistory)
 class DenialStatusHistoryAdmin(admin.ModelAdmin):
     list_display = ("denial", "from_status", "to_status", "created_at")
@@ -0,0 +1,23 @@
+from rest_framework.renderers import BaseRenderer
+
+class _PassthroughRenderer(BaseRenderer):
+    """
+    Lets `?format=csv|ndjson` pass DRF content negotiation on streaming views.
+    The view returns a StreamingHttpResponse itself; this only renders errors.
+    """
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, (bytes, str)):
+            return data
+        return str(data.get("detail", data) if isinstance(data, dict) else data)
+
+class CSVRenderer(_PassthroughRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+class NDJSONRenderer(_PassthroughRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
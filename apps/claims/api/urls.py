@@ -1,11 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DenialViewSet, workqueue
+from .views import DenialViewSet, workqueue, scrub_metrics, autofix, spool_metrics
 
 router = DefaultRouter()
 router.register(r"denials", DenialViewSet, basename="denial")
 
 urlpatterns = [
     path("workqueue/", workqueue, name="denial-workqueue"),
+    path("scrub/metrics/", scrub_metrics, name="scrub-metrics"),
+    path("autofix/", autofix, name="claims-autofix"),
+    path("edi/spool/metrics/", spool_metrics, name="edi-spool-metrics"),
     path("", include(router.urls)),
 ]
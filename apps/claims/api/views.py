@@ -1,12 +1,21 @@
-import csv
-from io import StringIO
-from django.http import HttpResponse
+from collections import Counter
+from datetime import timedelta
+from django.db.models import Q, Sum
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view
+from rest_framework.decorators import action, api_view, renderer_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from apps.claims.models import Denial, DenialStatusHistory, Claim
-from apps.claims.scrubber import run_scrubber
+from apps.claims.models import Denial, Claim, ClaimFindingSummary, DenialRollup
+from apps.claims.scrubber import scrub_claims
+from apps.claims.scrub_rules import PROCESS_STATS
+from apps.claims.autofix import iter_autofix, default_note, AUTOFIX_COLUMNS
+from apps.claims import edi_spool, streaming
+from apps.claims.denials import set_status, bulk_set_status
 
+from .renderers import CSVRenderer, NDJSONRenderer
 from .serializers import DenialSerializer
 
 class DenialViewSet(viewsets.ReadOnlyModelViewSet):
@@ -14,7 +23,9 @@ class DenialViewSet(viewsets.ReadOnlyModelViewSet):
     - GET /api/claims/denials/
     - GET /api/claims/denials/{id}/
     - POST /api/claims/denials/{id}/status/  body: {"status":"WORKING","note":"..."}
-    - GET /api/claims/denials/export/?format=csv
+    - POST /api/claims/denials/bulk-status/  body: {"status":"CLOSED","ids":[...]} or {"filter":{...}}
+    - GET /api/claims/denials/rollup/?group_by=payer,carc_code,iso_week
+    - GET /api/claims/denials/export/?format=csv|ndjson&status=&carc=&rarc=&payer=&created_from=&created_to=
     """
     queryset = Denial.objects.select_related("claim").all().order_by("-created_at")
     serializer_class = DenialSerializer
@@ -29,56 +40,347 @@ class DenialViewSet(viewsets.ReadOnlyModelViewSet):
         if new_status not in valid:
             return Response({"detail": "Invalid status."}, status=status.HTTP_400_BAD_REQUEST)
 
-        old_status = denial.status
-        denial.status = new_status
-        denial.save(update_fields=["status"])
-        DenialStatusHistory.objects.create(
-            denial=denial, from_status=old_status or "", to_status=new_status, note=note
-        )
+        set_status(denial, new_status, note)
         return Response(DenialSerializer(denial).data, status=status.HTTP_200_OK)
 
-    @action(detail=False, methods=["get"], url_path="export")
+    @action(detail=False, methods=["post"], url_path="bulk-status")
+    def bulk_status(self, request):
+        """
+        POST /api/claims/denials/bulk-status/
+            {"status": "CLOSED", "note": "...", "ids": [1, 2, 3]}
+            {"status": "CLOSED", "filter": {"carc": "CO-45", "status": "OPEN,WORKING"}}
+        One UPDATE plus one history insert; `results` has an outcome per id.
+        """
+        data = request.data or {}
+        new_status = data.get("status")
+        if new_status not in {s for s, _ in Denial.STATUS}:
+            return Response({"detail": "Invalid status."}, status=400)
+        ids, filters = data.get("ids"), data.get("filter")
+        if (ids is None) == (filters is None):
+            return Response({"detail": "Send exactly one of ids or filter."}, status=400)
+        if ids is not None:
+            try:
+                ids = [int(i) for i in ids]
+            except (TypeError, ValueError):
+                return Response({"detail": "ids must be a list of integers."}, status=400)
+        else:
+            if not isinstance(filters, dict) or not any(filters.get(k) for k in DENIAL_FILTER_KEYS):
+                return Response({"detail": f"filter needs one of {', '.join(DENIAL_FILTER_KEYS)}."}, status=400)
+            try:
+                qs = _filter_denials(Denial.objects.all(), filters)
+            except ValueError as e:
+                return Response({"detail": str(e)}, status=400)
+            ids = list(qs.order_by("id").values_list("id", flat=True)[:BULK_STATUS_MAX + 1])
+        if len(ids) > BULK_STATUS_MAX:
+            return Response({"detail": f"At most {BULK_STATUS_MAX} denials per request."}, status=400)
+
+        outcomes = bulk_set_status(ids, new_status, str(data.get("note") or ""))
+        counts = {}
+        for outcome, _ in outcomes.values():
+            counts[outcome] = counts.get(outcome, 0) + 1
+        return Response({
+            "status": new_status,
+            "counts": counts,
+            "results": [{"id": i, "outcome": o, "from_status": f} for i, (o, f) in outcomes.items()],
+        })
+
+    @action(detail=False, methods=["get"], url_path="export",
+            renderer_classes=[JSONRenderer, CSVRenderer, NDJSONRenderer])
     def export(self, request):
-        fmt = (request.query_params.get("format") or "csv").lower()
-        qs = self.get_queryset()
-        if fmt != "csv":
+        """
+        Streams denials newest first, reading `.values()` rows in chunks so
+        memory stays flat for any result size.
+        ?format=csv|ndjson &status=OPEN,WORKING &carc=CO-50 &rarc=N130 &payer=
+        &created_from=YYYY-MM-DD &created_to=YYYY-MM-DD &columns=id,claim_id,...
+        """
+        qp = request.query_params
+        fmt = (qp.get("format") or "csv").lower()
+        if fmt not in streaming.CONTENT_TYPES:
             return Response({"detail": "Unsupported format"}, status=400)
+        columns = [c.strip() for c in (qp.get("columns") or "").split(",") if c.strip()] or DENIAL_EXPORT_COLUMNS
+        unknown = [c for c in columns if c not in DENIAL_EXPORT_FIELDS]
+        if unknown:
+            return Response({"detail": f"Unknown columns: {', '.join(unknown)}"}, status=400)
+
+        try:
+            qs = _filter_denials(Denial.objects.all(), qp)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+
+        fields = [DENIAL_EXPORT_FIELDS[c] for c in columns]
+        rows = qs.order_by("-created_at", "-id").values_list(*fields).iterator(chunk_size=DENIAL_EXPORT_CHUNK)
+
+        def records():
+            for values in rows:
+                yield {c: (v.isoformat() if hasattr(v, "isoformat") else v) for c, v in zip(columns, values)}
 
-        buf = StringIO()
-        w = csv.writer(buf)
-        w.writerow(["id", "claim_id", "status", "reason", "created_at"])
-        for d in qs:
-            w.writerow([d.id, getattr(d, "claim_id", getattr(d.claim, "id", "")), d.status, d.reason, d.created_at.isoformat()])
-        resp = HttpResponse(buf.getvalue(), content_type="text/csv")
-        resp["Content-Disposition"] = 'attachment; filename="denials_export.csv"'
+        resp = StreamingHttpResponse(streaming.encode(records(), fmt, columns),
+                                     content_type=streaming.CONTENT_TYPES[fmt])
+        resp["Content-Disposition"] = f'attachment; filename="denials_export.{fmt}"'
         return resp
 
+    @action(detail=False, methods=["get"], url_path="rollup")
+    def rollup(self, request):
+        """
+        GET /api/claims/denials/rollup/?group_by=payer,carc_code&from_week=2025-W01&to_week=
+            &payer=&status=OPEN,WORKING&carc=&order=-count|-amount&limit=50
+        Reads DenialRollup only. Each row has count, amount, closed count and
+        avg_days_to_close (over CLOSED denials in the group).
+        """
+        qp = request.query_params
+        group_by = [g.strip() for g in (qp.get("group_by") or "payer,carc_code").split(",") if g.strip()]
+        bad = [g for g in group_by if g not in ROLLUP_DIMENSIONS]
+        if bad:
+            return Response({"detail": f"group_by must be from {', '.join(ROLLUP_DIMENSIONS)}"}, status=400)
+        order = qp.get("order") or "-count"
+        if order.lstrip("-") not in {"count", "amount", *group_by}:
+            return Response({"detail": "order must be count, amount or a group_by field"}, status=400)
+        try:
+            limit = max(1, min(_int_param(request, "limit", 100), 1000))
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+
+        qs = DenialRollup.objects.all()
+        if qp.get("from_week"):
+            qs = qs.filter(iso_week__gte=qp["from_week"].strip())
+        if qp.get("to_week"):
+            qs = qs.filter(iso_week__lte=qp["to_week"].strip())
+        if qp.get("payer"):
+            qs = qs.filter(payer__iexact=qp["payer"].strip())
+        if qp.get("carc"):
+            qs = qs.filter(carc_code__iexact=qp["carc"].strip())
+        statuses = [x.strip().upper() for x in (qp.get("status") or "").split(",") if x.strip()]
+        if statuses:
+            qs = qs.filter(status__in=statuses)
+
+        desc, key = order.startswith("-"), order.lstrip("-")
+        key = {"count": "n", "amount": "dollars"}.get(key, key)
+        rows = (qs.values(*group_by)
+                .annotate(n=Sum("count"), dollars=Sum("amount"),
+                          closed=Sum("count", filter=Q(status="CLOSED")),
+                          secs=Sum("close_seconds"))
+                .filter(n__gt=0)
+                .order_by(("-" if desc else "") + key, *group_by)[:limit])
+        out = []
+        for r in rows:
+            closed = r.pop("closed") or 0
+            secs = r.pop("secs") or 0
+            r["count"] = r.pop("n")
+            r["amount"] = f"{r.pop('dollars') or 0:.2f}"
+            r["closed"] = closed
+            r["avg_days_to_close"] = round(secs / closed / 86400, 2) if closed else None
+            out.append(r)
+        return Response({"group_by": group_by, "results": out})
+
+def _filter_denials(qs, params):
+    """Apply status/carc/rarc/payer/created_from/created_to filters; ValueError on a bad date."""
+    statuses = [x.strip().upper() for x in str(params.get("status") or "").split(",") if x.strip()]
+    if statuses:
+        qs = qs.filter(status__in=statuses)
+    if params.get("carc"):
+        qs = qs.filter(carc_code__iexact=str(params["carc"]).strip())
+    if params.get("rarc"):
+        qs = qs.filter(rarc_code__iexact=str(params["rarc"]).strip())
+    if params.get("payer"):
+        qs = qs.filter(claim__payer_name__iexact=str(params["payer"]).strip())
+    for name, lookup in (("created_from", "created_at__date__gte"), ("created_to", "created_at__date__lte")):
+        if params.get(name):
+            try:
+                d = parse_date(str(params[name]))
+            except ValueError:
+                d = None
+            if d is None:
+                raise ValueError(f"{name} must be YYYY-MM-DD")
+            qs = qs.filter(**{lookup: d})
+    return qs
+
+DENIAL_FILTER_KEYS = ["status", "carc", "rarc", "payer", "created_from", "created_to"]
+BULK_STATUS_MAX = 5000
+
+ROLLUP_DIMENSIONS = ["payer", "carc_code", "rarc_code", "iso_week", "status"]
+
+DENIAL_EXPORT_CHUNK = 2000
+DENIAL_EXPORT_COLUMNS = ["id", "claim_id", "status", "reason", "created_at"]
+# export column -> values() path
+DENIAL_EXPORT_FIELDS = {
+    "id": "id",
+    "claim_id": "claim_id",
+    "status": "status",
+    "reason": "reason",
+    "created_at": "created_at",
+    "carc_code": "carc_code",
+    "rarc_code": "rarc_code",
+    "payer_name": "claim__payer_name",
+    "era_id": "era_id",
+}
+
+WORKQUEUE_DEFAULT_LIMIT = 100
+WORKQUEUE_MAX_LIMIT = 500
+RESCRUB_WINDOW = 200
+
+def _int_param(request, name, default=None):
+    raw = request.query_params.get(name)
+    if raw in (None, ""):
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+
 @api_view(["GET"])
 def workqueue(request):
     """
-    GET /api/claims/workqueue/?rescrub=1
-    Returns recent claims with ERROR/WARN findings (after optional re-scrub).
+    GET /api/claims/workqueue/?cursor=&limit=100&payer=&status=&severity=ERROR|WARN&code=&min_age_days=&max_age_days=&rescrub=1
+    Claims with open ERROR/WARN findings, newest first, keyset-paginated on id.
+    Counts and codes come from ClaimFindingSummary, so each page is one query.
+    rescrub=1 first re-scrubs changed claims among the 200 newest in the filtered window.
     """
-    rescrub = request.query_params.get("rescrub") in {"1", "true", "yes"}
-    # keep it lightweight; feel free to tune slice
-    claims = Claim.objects.all().order_by("-id")[:200]
-    if rescrub:
-        for c in claims:
-            run_scrubber(c)
+    qp = request.query_params
+    try:
+        cursor = _int_param(request, "cursor")
+        limit = _int_param(request, "limit", WORKQUEUE_DEFAULT_LIMIT)
+        min_age = _int_param(request, "min_age_days")
+        max_age = _int_param(request, "max_age_days")
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, WORKQUEUE_MAX_LIMIT))
+
+    claims = Claim.objects.all()
+    if qp.get("payer"):
+        claims = claims.filter(payer_name__iexact=qp["payer"].strip())
+    if qp.get("status"):
+        claims = claims.filter(status=qp["status"].strip().upper())
+    now = timezone.now()
+    if min_age is not None:
+        claims = claims.filter(created_at__lte=now - timedelta(days=min_age))
+    if max_age is not None:
+        claims = claims.filter(created_at__gte=now - timedelta(days=max_age))
+    if cursor is not None:
+        claims = claims.filter(id__lt=cursor)
+
+    if qp.get("rescrub") in {"1", "true", "yes"}:
+        # only claims that are dirty or whose fingerprint / edit version moved
+        window = list(claims.order_by("-id").values_list("id", flat=True)[:RESCRUB_WINDOW])
+        scrub_claims(window, only_changed=True)
+
+    severity = (qp.get("severity") or "").upper()
+    if severity == "ERROR":
+        claims = claims.filter(finding_summary__error_count__gt=0)
+    elif severity == "WARN":
+        claims = claims.filter(finding_summary__warn_count__gt=0)
+    elif severity:
+        return Response({"detail": "severity must be ERROR or WARN"}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        claims = claims.filter(Q(finding_summary__error_count__gt=0) | Q(finding_summary__warn_count__gt=0))
+    code = (qp.get("code") or "").strip().upper()
+    if code:
+        token = f"|{code}|"
+        claims = claims.filter(Q(finding_summary__error_codes__contains=token) |
+                               Q(finding_summary__warn_codes__contains=token))
+
+    page = list(claims.select_related("finding_summary").order_by("-id")[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
 
     rows = []
-    for c in claims:
-        errs = list(c.findings.filter(severity="ERROR").values("code", "message"))
-        warns = list(c.findings.filter(severity="WARN").values("code", "message"))
-        if errs or warns:
-            rows.append({
-                "id": c.id,
-                "patient_id": c.patient_id,
-                "payer_name": c.payer_name,
-                "pos": c.pos,
-                "total_charge": str(c.total_charge),
-                "status": c.status,
-                "errors": errs,
-                "warnings": warns,
-            })
-    return Response({"count": len(rows), "results": rows})
+    for c in page:
+        sm = c.finding_summary
+        rows.append({
+            "id": c.id,
+            "patient_id": c.patient_id,
+            "payer_name": c.payer_name,
+            "pos": c.pos,
+            "total_charge": str(c.total_charge),
+            "status": c.status,
+            "created_at": c.created_at.isoformat() if c.created_at else None,
+            "error_count": sm.error_count,
+            "warn_count": sm.warn_count,
+            "errors": ClaimFindingSummary.unpack_codes(sm.error_codes),
+            "warnings": ClaimFindingSummary.unpack_codes(sm.warn_codes),
+            "oldest_open_finding": sm.oldest_open.isoformat() if sm.oldest_open else None,
+        })
+
+    next_cursor = page[-1].id if has_more and page else None
+    next_url = None
+    if next_cursor is not None:
+        params = qp.copy()
+        params["cursor"] = str(next_cursor)
+        params.pop("rescrub", None)
+        next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+    return Response({"count": len(rows), "next_cursor": next_cursor, "next": next_url, "results": rows})
+
+@api_view(["GET"])
+def scrub_metrics(request):
+    """
+    GET /api/claims/scrub/metrics/
+    Per-rule scrub counters for this worker process: claims evaluated,
+    findings produced and cumulative wall time, slowest rule first.
+    """
+    return Response(PROCESS_STATS.snapshot())
+
+@api_view(["GET"])
+def spool_metrics(request):
+    """
+    GET /api/claims/edi/spool/metrics/?window=15
+    EDI spooler queue depth, oldest QUEUED lag, leased/retrying rows and
+    SENT throughput over the last `window` minutes, across all workers.
+    """
+    try:
+        window = max(1, _int_param(request, "window", 15))
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(edi_spool.metrics(window))
+
+@api_view(["GET", "POST"])
+@renderer_classes([JSONRenderer, CSVRenderer, NDJSONRenderer])
+def autofix(request):
+    """
+    GET  /api/claims/autofix/?format=csv|ndjson&status=&payer=&code=&ids=1,2,3   dry-run report
+    POST /api/claims/autofix/?status=&payer=&code=&ids=1,2,3                      apply, JSON summary
+    GET streams one row per proposed change as each chunk is processed. POST
+    needs at least one filter and applies before responding, so a dropped
+    connection cannot stop it halfway: every chunk commits in its own
+    transaction, writes one AutoFixAudit per changed claim and is re-scrubbed.
+    """
+    qp = request.query_params
+    fmt = (qp.get("format") or "ndjson").lower()
+    if fmt not in streaming.CONTENT_TYPES:
+        return Response({"detail": "format must be csv or ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        chunk_size = max(1, _int_param(request, "chunk_size", 500))
+        ids = [int(x) for x in (qp.get("ids") or "").split(",") if x.strip()]
+    except ValueError:
+        return Response({"detail": "ids and chunk_size must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+    claims = Claim.objects.all()
+    if ids:
+        claims = claims.filter(id__in=ids)
+    if qp.get("status"):
+        claims = claims.filter(status=qp["status"].strip().upper())
+    if qp.get("payer"):
+        claims = claims.filter(payer_name__iexact=qp["payer"].strip())
+    code = (qp.get("code") or "").strip().upper()
+    if code:
+        token = f"|{code}|"
+        claims = claims.filter(Q(finding_summary__error_codes__contains=token) |
+                               Q(finding_summary__warn_codes__contains=token))
+
+    if request.method == "POST":
+        if not (ids or qp.get("status") or qp.get("payer") or code):
+            return Response({"detail": "POST needs at least one filter: ids, status, payer or code"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        changed, changes, applied, by_reason = set(), 0, 0, Counter()
+        for row in iter_autofix(claims, apply=True, chunk_size=chunk_size, note=default_note("api")):
+            changes += 1
+            by_reason[row["reason"].split()[0]] += 1
+            if row["applied"]:
+                applied += 1
+                changed.add(row["claim_id"])
+        return JsonResponse({"claims_changed": len(changed), "changes": changes, "applied": applied,
+                             "by_reason": dict(by_reason)})
+
+    rows = iter_autofix(claims, apply=False, chunk_size=chunk_size)
+    resp = StreamingHttpResponse(streaming.encode(rows, fmt, AUTOFIX_COLUMNS),
+                                 content_type=streaming.CONTENT_TYPES[fmt])
+    resp["Content-Disposition"] = f'attachment; filename="autofix_preview.{fmt}"'
+    return resp
@@ -1,47 +1,43 @@
 from decimal import Decimal, InvalidOperation
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from django.conf import settings
-from .models import Claim, ClaimLine, MUE, NCCIEdit
-from apps.patients.models import Coverage
-from .scrubber import run_scrubber
+from django.db import transaction
+from django.utils import timezone
+from .models import Claim, ClaimLine, AutoFixAudit
+from .edit_cache import EditTables, get_edit_tables
+from .scrubber import run_scrubber, scrub_claims, load_coverages, DEFAULT_CHUNK_SIZE
+from .scrub_rules import claim_dos, ncci_conflicts, _is_office_em
 
 FLAGS = getattr(settings, "AUTOFIX_FLAGS", {})
 
+# Claim fields autofix may rewrite (bulk_update field list).
+CLAIM_FIELDS = ("pos", "payer_name", "total_charge")
+
 def _dec(x):
     try:
         return Decimal(str(x))
     except Exception:
         return None
 
-def _sum_line_total(claim: Claim) -> Decimal:
+def _sum_line_total(lines) -> Decimal:
     total = Decimal("0")
-    for ln in claim.lines.all():
+    for ln in lines:
         u = _dec(ln.units) or Decimal("0")
         ch = _dec(ln.charge) or Decimal("0")
         total += u * ch
     return total
 
-def propose_changes(claim: Claim) -> List[Dict[str, Any]]:
+def _propose(claim: Claim, lines, tables: EditTables, coverage=None) -> List[Dict[str, Any]]:
     """
-    Build a list of proposed changes to fix common ERROR/WARN findings.
+    Pure proposal step over an already-loaded claim: `lines` is walked as a
+    list and `coverage` is the patient's latest Coverage (only read when the
+    payer name is missing).
     """
     changes: List[Dict[str, Any]] = []
-    run_scrubber(claim)  # refresh findings before proposing
-
-    # Lookup helpers
-    mue_map = {m.code: m.max_units for m in MUE.objects.all()}
-    pairs = list(NCCIEdit.objects.all().values("code_primary","code_secondary","edit_type"))
+    dos = claim_dos(claim)
 
     # 1) POS_CONFLICT -> POS=11 if office E/M present
-    has_office_em = False
-    for ln in claim.lines.all():
-        try:
-            n = int(ln.cpt)
-            if 99202 <= n <= 99215:
-                has_office_em = True
-                break
-        except Exception:
-            pass
+    has_office_em = any(_is_office_em(ln.cpt) for ln in lines)
     if FLAGS.get("POS_CONFLICT", True) and has_office_em and claim.pos != "11":
         changes.append({
             "action": "update_claim", "field": "pos",
@@ -49,34 +45,30 @@ def propose_changes(claim: Claim) -> List[Dict[str, Any]]:
         })
 
     # 2) MUE_EXCEEDED -> cap units
-    for ln in claim.lines.all():
-        lim = mue_map.get(ln.cpt)
-        units = _dec(ln.units)
-        if FLAGS.get("MUE_EXCEEDED", True) and lim is not None and units is not None and units > lim:
-            changes.append({
-                "action": "update_line", "line_id": ln.id, "field": "units",
-                "from": str(units), "to": str(lim), "reason": "MUE_EXCEEDED"
-            })
+    if FLAGS.get("MUE_EXCEEDED", True):
+        for ln in lines:
+            lim = tables.mue_limit(ln.cpt, dos)
+            units = _dec(ln.units)
+            if lim is not None and units is not None and units > lim:
+                changes.append({
+                    "action": "update_line", "line_id": ln.id, "field": "units",
+                    "from": str(units), "to": str(lim), "reason": "MUE_EXCEEDED"
+                })
 
     # 3) NCCI_PAIR -> remove secondary
-    codes_on_claim = [ln.cpt for ln in claim.lines.all()]
     if FLAGS.get("NCCI_PAIR", True):
-        for p in pairs:
-            if p["code_primary"] in codes_on_claim and p["code_secondary"] in codes_on_claim:
-                sec = next((ln for ln in claim.lines.all() if ln.cpt == p["code_secondary"]), None)
-                if sec:
-                    changes.append({
-                        "action": "delete_line", "line_id": sec.id,
-                        "reason": f"NCCI_PAIR {p['code_primary']} vs {p['code_secondary']} ({p['edit_type']})"
-                    })
+        for primary, secondary, edit_type, sec in ncci_conflicts(lines, tables, dos):
+            changes.append({
+                "action": "delete_line", "line_id": sec.id,
+                "reason": f"NCCI_PAIR {primary} vs {secondary} ({edit_type})"
+            })
 
     # 4) REQUIRED_PAYER_NAME -> use latest coverage payer
     if FLAGS.get("REQUIRED_PAYER_NAME", True) and not (claim.payer_name or "").strip():
-        cov = Coverage.objects.filter(patient_id=claim.patient_id).order_by("-effective_date","-id").first()
-        if cov and cov.payer_name:
+        if coverage is not None and coverage.payer_name:
             changes.append({
                 "action": "update_claim", "field": "payer_name",
-                "from": claim.payer_name, "to": cov.payer_name, "reason": "REQUIRED_PAYER_NAME"
+                "from": claim.payer_name, "to": coverage.payer_name, "reason": "REQUIRED_PAYER_NAME"
             })
 
     # 5) TOTAL_CHARGE_ZERO -> set to sum(lines)
@@ -84,7 +76,7 @@ def propose_changes(claim: Claim) -> List[Dict[str, Any]]:
         cur_total = _dec(claim.total_charge) or Decimal("0")
     except InvalidOperation:
         cur_total = Decimal("0")
-    new_total = _sum_line_total(claim)
+    new_total = _sum_line_total(lines)
     if FLAGS.get("TOTAL_CHARGE_ZERO", True) and new_total > 0 and cur_total <= 0:
         changes.append({
             "action": "update_claim", "field": "total_charge",
@@ -93,6 +85,16 @@ def propose_changes(claim: Claim) -> List[Dict[str, Any]]:
 
     return changes
 
+def propose_changes(claim: Claim) -> List[Dict[str, Any]]:
+    """
+    Build a list of proposed changes to fix common ERROR/WARN findings.
+    """
+    run_scrubber(claim)  # refresh findings before proposing
+    coverage = None
+    if not (claim.payer_name or "").strip():
+        coverage = load_coverages([claim.patient_id]).get(claim.patient_id)
+    return _propose(claim, list(claim.lines.all()), get_edit_tables(), coverage)
+
 def apply_changes(claim: Claim, changes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Apply the proposed changes to DB and re-scrub.
@@ -117,6 +119,123 @@ def apply_changes(claim: Claim, changes: List[Dict[str, Any]]) -> List[Dict[str,
                 continue
             ln.delete()
             committed.append(ch)
+    claim.scrub_dirty = True
     claim.save()
     run_scrubber(claim)
     return committed
+
+# --- Bulk pipeline ---
+
+AUTOFIX_COLUMNS = ["claim_id", "action", "field", "line_id", "from", "to", "reason", "applied"]
+
+def default_note(user: str = "") -> str:
+    stamp = timezone.now().strftime("%Y-%m-%d %H:%M")
+    return f"bulk autofix {stamp}" + (f" by {user}" if user else "")
+
+def _claim_ids(claims) -> List[int]:
+    if hasattr(claims, "values_list"):
+        return list(claims.order_by("id").values_list("id", flat=True))
+    return sorted(int(i) for i in claims)
+
+def _load_chunk(ids: List[int]):
+    claims = list(Claim.objects.filter(id__in=ids).prefetch_related("lines").order_by("id"))
+    missing_payer = [c.patient_id for c in claims if not (c.payer_name or "").strip()]
+    coverages = load_coverages(missing_payer) if missing_payer else {}
+    return claims, coverages
+
+def _apply_chunk(proposals, note: str) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Apply one chunk's proposals in a single transaction: claim fields and line
+    units via bulk_update, removed lines via one DELETE, one AutoFixAudit per
+    claim via bulk_create. Returns {claim_id: committed changes}.
+    """
+    committed: Dict[int, List[Dict[str, Any]]] = {}
+    claims_to_update: List[Claim] = []
+    claim_fields = set()
+    lines_to_update: Dict[int, ClaimLine] = {}
+    delete_ids = set()
+    audits = []
+
+    for claim, lines, changes in proposals:
+        by_id = {ln.id: ln for ln in lines}
+        done = []
+        for ch in changes:
+            act = ch.get("action")
+            if act == "update_claim" and ch["field"] in CLAIM_FIELDS:
+                setattr(claim, ch["field"], ch["to"])
+                claim_fields.add(ch["field"])
+                done.append(ch)
+            elif act == "update_line" and ch["line_id"] in by_id:
+                ln = by_id[ch["line_id"]]
+                setattr(ln, ch["field"], ch["to"])
+                lines_to_update[ln.id] = ln
+                done.append(ch)
+            elif act == "delete_line" and ch["line_id"] in by_id:
+                delete_ids.add(ch["line_id"])
+                done.append(ch)
+        if not done:
+            continue
+        claim.scrub_dirty = True
+        claims_to_update.append(claim)
+        committed[claim.id] = done
+        audits.append(AutoFixAudit(
+            claim=claim, action="apply", flags=dict(FLAGS),
+            proposed=changes, committed=done, note=note[:255],
+        ))
+
+    for line_id in delete_ids:
+        lines_to_update.pop(line_id, None)
+    with transaction.atomic():
+        if claims_to_update:
+            Claim.objects.bulk_update(claims_to_update, sorted(claim_fields | {"scrub_dirty"}), batch_size=500)
+        if lines_to_update:
+            ClaimLine.objects.bulk_update(list(lines_to_update.values()), ["units"], batch_size=500)
+        if delete_ids:
+            ClaimLine.objects.filter(id__in=delete_ids).delete()
+        if audits:
+            AutoFixAudit.objects.bulk_create(audits, batch_size=500)
+    return committed
+
+def iter_autofix(claims: Optional[Iterable] = None, apply: bool = False,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, note: str = "") -> Iterator[Dict[str, Any]]:
+    """
+    Propose (and optionally apply) fixes for a whole claim set, chunk by chunk.
+    Yields one flat row per proposed change as soon as its chunk is done, so
+    callers can stream CSV/NDJSON. With apply=True each chunk is committed in
+    its own transaction and then re-scrubbed through the batch scrubber.
+    """
+    if claims is None:
+        claims = Claim.objects.all()
+    note = note or default_note()
+    ids = _claim_ids(claims)
+    tables = get_edit_tables()
+    chunk_size = max(1, int(chunk_size))
+
+    for i in range(0, len(ids), chunk_size):
+        chunk, coverages = _load_chunk(ids[i:i + chunk_size])
+        proposals = []
+        for c in chunk:
+            lines = list(c.lines.all())
+            changes = _propose(c, lines, tables, coverages.get(c.patient_id))
+            if changes:
+                proposals.append((c, lines, changes))
+
+        committed: Dict[int, List[Dict[str, Any]]] = {}
+        if apply and proposals:
+            committed = _apply_chunk(proposals, note)
+            scrub_claims(list(committed))
+
+        for c, _lines, changes in proposals:
+            done = committed.get(c.id, [])
+            for ch in changes:
+                yield {
+                    "claim_id": c.id,
+                    "action": ch.get("action", ""),
+                    "field": ch.get("field", ""),
+                    "line_id": ch.get("line_id", ""),
+                    "from": ch.get("from", ""),
+                    "to": ch.get("to", ""),
+                    "reason": ch.get("reason", ""),
+                    "applied": ch in done,
+                }
+
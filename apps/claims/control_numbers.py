@@ -0,0 +1,41 @@
+"""
+Atomic allocator for X12 envelope control numbers.
+
+ISA13, GS06 and ST02 each draw from their own ControlNumberSequence row. A
+block of `count` numbers is reserved with a single UPDATE ... SET value =
+value + count inside a transaction, so concurrent exporters (processes or
+hosts sharing the database) never hand out the same number twice.
+"""
+from typing import List
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import ControlNumberSequence
+
+ISA = "ISA"
+GS = "GS"
+ST = "ST"
+
+MAX_CONTROL = 999999999   # ISA13 is N0 9/9, GS06 N0 1/9, ST02 AN 4/9
+
+def allocate(name: str, count: int = 1) -> List[int]:
+    """Reserve `count` consecutive numbers from sequence `name`; returns them in order."""
+    if count < 1:
+        return []
+    with transaction.atomic():
+        ControlNumberSequence.objects.get_or_create(name=name)
+        ControlNumberSequence.objects.filter(name=name).update(value=F("value") + count)
+        last = ControlNumberSequence.objects.filter(name=name).values_list("value", flat=True).get()
+    first = last - count + 1
+    # wrap inside the 9-digit space, skipping 0
+    return [(n - 1) % MAX_CONTROL + 1 for n in range(first, last + 1)]
+
+def isa_control(n: int) -> str:
+    return f"{n:09d}"
+
+def gs_control(n: int) -> str:
+    return str(n)
+
+def st_control(n: int) -> str:
+    return f"{n:04d}"
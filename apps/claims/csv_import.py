@@ -0,0 +1,180 @@
+"""
+Batched claims CSV importer.
+
+Columns: patient_id,payer_name,pos,total_charge,dx_list,lines
+    dx_list = "E11.9|I10"
+    lines   = "CPT|UNITS|CHARGE;CPT|UNITS|CHARGE"
+
+The file is read with a streaming csv.DictReader. Valid rows are built into
+memory batches of `batch_size`, and each batch is written in its own
+transaction: claims first with bulk_create (which returns the new ids), then
+diagnoses and lines. The ClaimCsvImport checkpoint is advanced in the same
+transaction, so after a crash `resume=True` carries on after the last
+committed row. Rejected rows go to a side-car CSV (original columns plus
+`row` and `error`) and never stop the import; a batch's rejects are only
+written once that batch has committed, so a resume never repeats them.
+"""
+import csv
+import hashlib
+import os
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.ingestion.models import Provenance
+from .models import Claim, ClaimCsvImport, ClaimLine, Diagnosis
+
+DEFAULT_BATCH_SIZE = 1000
+COLUMNS = ["patient_id", "payer_name", "pos", "total_charge", "dx_list", "lines"]
+
+def sha256_path(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class RowError(ValueError):
+    pass
+
+def _dec(raw, label: str, default: str, max_digits: int, places: int = 2) -> Decimal:
+    """Decimal column sized like its model field; only a blank value falls back to `default`."""
+    raw = (raw or "").strip()
+    if not raw:
+        return Decimal(default)
+    try:
+        value = Decimal(raw)
+    except InvalidOperation:
+        raise RowError(f"invalid {label} '{raw}'")
+    if not value.is_finite():
+        raise RowError(f"invalid {label} '{raw}'")
+    try:
+        value = value.quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_UP)
+    except InvalidOperation:   # more digits than the decimal context holds
+        value = None
+    if value is None or abs(value) >= Decimal(10) ** (max_digits - places):
+        raise RowError(f"{label} out of range '{raw}'")
+    return value
+
+def _code(raw: str, label: str, max_length: int) -> str:
+    if len(raw) > max_length:
+        raise RowError(f"{label} '{raw}' longer than {max_length}")
+    return raw
+
+def parse_row(row: Dict[str, str]) -> Tuple[Claim, List[str], List[ClaimLine]]:
+    """Validate one CSV row into an unsaved Claim, its dx codes and unsaved lines."""
+    try:
+        patient_id = int((row.get("patient_id") or "").strip())
+    except ValueError:
+        raise RowError("invalid patient_id")
+    payer_name = (row.get("payer_name") or "").strip()
+    pos = (row.get("pos") or "").strip()
+    if not payer_name or not pos:
+        raise RowError("payer_name and pos are required")
+    if len(pos) > 2:
+        raise RowError(f"invalid pos '{pos}'")
+
+    claim = Claim(
+        patient_id=patient_id,
+        payer_name=payer_name[:120],
+        billing_provider_npi="1234567890",
+        rendering_provider_npi="1234567890",
+        facility_name="Imported Clinic",
+        pos=pos,
+        status="READY",
+        total_charge=_dec(row.get("total_charge"), "total_charge", "0", 10),
+        scrub_dirty=True,
+    )
+    dx = [_code(d.strip(), "dx code", 8) for d in (row.get("dx_list") or "").split("|") if d.strip()]
+
+    lines = []
+    for entry in [c for c in (row.get("lines") or "").split(";") if c.strip()]:
+        parts = [p.strip() for p in entry.split("|")]
+        if len(parts) < 3 or not parts[0]:
+            raise RowError(f"bad line entry '{entry}'")
+        lines.append(ClaimLine(
+            cpt=_code(parts[0], "cpt", 10),
+            modifiers=[],
+            units=_dec(parts[1], "units", "1", 7),
+            diagnosis_pointers=[1],  # simplest case: points to first dx
+            charge=_dec(parts[2], "charge", "0", 10),
+        ))
+    return claim, dx, lines
+
+def _write_batch(batch, run: ClaimCsvImport, last_row: int, rejected: int):
+    with transaction.atomic():
+        claims = Claim.objects.bulk_create([c for c, _dx, _ln in batch])
+        dx_rows, line_rows = [], []
+        for claim, (_c, dx, lines) in zip(claims, batch):
+            dx_rows += [Diagnosis(claim_id=claim.id, code=code, order=i) for i, code in enumerate(dx, start=1)]
+            for ln in lines:
+                ln.claim_id = claim.id
+                line_rows.append(ln)
+        Diagnosis.objects.bulk_create(dx_rows, batch_size=2000)
+        ClaimLine.objects.bulk_create(line_rows, batch_size=2000)
+        run.last_row = last_row
+        run.imported += len(claims)
+        run.rejected += rejected
+        run.save(update_fields=["last_row", "imported", "rejected", "updated_at"])
+
+def import_claims_csv(path: str, batch_size: int = DEFAULT_BATCH_SIZE, resume: bool = False,
+                      error_path: Optional[str] = None) -> ClaimCsvImport:
+    """
+    Import `path`; returns the ClaimCsvImport checkpoint with final counts.
+    With `resume`, a file whose latest run already completed is not imported
+    again: that run is returned as is.
+    """
+    batch_size = max(1, int(batch_size))
+    file_hash = sha256_path(path)
+    run = None
+    if resume:
+        run = ClaimCsvImport.objects.filter(file_hash=file_hash).order_by("-id").first()
+        if run is not None and run.completed_at is not None:
+            return run
+    if run is None:
+        prov = Provenance.objects.create(
+            source_system="CSV (manual)",
+            file_name=os.path.basename(path),
+            file_hash=file_hash,
+            format="CSV",
+            notes="Claims import (Claim + Diagnosis + ClaimLine)",
+        )
+        run = ClaimCsvImport.objects.create(
+            provenance=prov, file_name=os.path.basename(path)[:200], file_hash=file_hash,
+            error_path=(error_path or f"{path}.errors.csv")[:300],
+        )
+    error_path = error_path or run.error_path
+    append = resume and run.last_row > 0 and os.path.exists(error_path)
+
+    with open(path, "r", encoding="utf-8-sig", newline="") as f, \
+            open(error_path, "a" if append else "w", encoding="utf-8", newline="") as ef:
+        reader = csv.DictReader(f)
+        err = csv.DictWriter(ef, fieldnames=["row", "error"] + list(reader.fieldnames or COLUMNS),
+                             extrasaction="ignore")
+        if not append:
+            err.writeheader()
+
+        def commit(batch, errors, row_no):
+            _write_batch(batch, run, row_no, len(errors))
+            err.writerows(errors)
+            ef.flush()
+
+        batch, errors, row_no = [], [], run.last_row
+        for i, row in enumerate(reader, start=1):
+            if i <= run.last_row:
+                continue
+            row_no = i
+            try:
+                batch.append(parse_row(row))
+            except RowError as e:
+                errors.append({"row": i, "error": str(e), **row})
+            if len(batch) + len(errors) >= batch_size:
+                commit(batch, errors, row_no)
+                batch, errors = [], []
+        commit(batch, errors, row_no)
+
+    run.completed_at = timezone.now()
+    run.save(update_fields=["completed_at", "updated_at"])
+    return run
@@ -0,0 +1,112 @@
+"""
+Incrementally maintained denial analytics.
+
+DenialRollup holds one row per (payer, CARC, RARC, ISO week of creation,
+current status) with the denial count, denied dollars and, for CLOSED rows,
+the summed created->closed seconds. Every denial write path feeds deltas in
+here instead of dashboards re-scanning Denial/DenialStatusHistory:
+
+    record_created(denials)              ERA posting, manual creation
+    record_removed(denials)              ERA repost purging a partial import
+    record_status_change(denials, old)   status updates (old = {id: (status, closed_at)})
+
+rebuild() recomputes the table from scratch for backfills.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Claim, Denial, DenialRollup
+
+Key = Tuple[str, str, str, str, str]   # payer, carc, rarc, iso_week, status
+
+def iso_week(dt) -> str:
+    year, week, _ = dt.isocalendar()
+    return f"{year}-W{week:02d}"
+
+def _close_seconds(created_at, closed_at) -> int:
+    return int((closed_at - created_at).total_seconds()) if closed_at and created_at else 0
+
+def _payers(claim_ids) -> Dict[int, str]:
+    return dict(Claim.objects.filter(id__in=set(claim_ids)).values_list("id", "payer_name"))
+
+def _key(payer, carc, rarc, created_at, status) -> Key:
+    return ((payer or "")[:120], carc or "", rarc or "", iso_week(created_at), status)
+
+def apply(deltas: Dict[Key, List]):
+    """Add [count, amount, close_seconds] deltas to their rollup rows (upsert per key)."""
+    for (payer, carc, rarc, week, status), (n, amount, secs) in deltas.items():
+        if not (n or amount or secs):
+            continue
+        key = {"payer": payer, "carc_code": carc, "rarc_code": rarc, "iso_week": week, "status": status}
+        inc = {"count": F("count") + n, "amount": F("amount") + amount, "close_seconds": F("close_seconds") + secs}
+        if DenialRollup.objects.filter(**key).update(**inc):
+            continue
+        try:
+            with transaction.atomic():
+                DenialRollup.objects.create(**key, count=n, amount=amount, close_seconds=secs)
+        except IntegrityError:   # another writer created the row first
+            DenialRollup.objects.filter(**key).update(**inc)
+
+def _new_deltas():
+    return defaultdict(lambda: [0, Decimal("0"), 0])
+
+def _record(denials: Iterable[Denial], sign: int):
+    denials = list(denials)
+    if not denials:
+        return
+    payers = _payers(d.claim_id for d in denials)
+    deltas = _new_deltas()
+    for d in denials:
+        row = deltas[_key(payers.get(d.claim_id), d.carc_code, d.rarc_code, d.created_at, d.status)]
+        row[0] += sign
+        row[1] += sign * (d.amount or 0)
+        row[2] += sign * (_close_seconds(d.created_at, d.closed_at) if d.status == "CLOSED" else 0)
+    apply(deltas)
+
+def record_created(denials: Iterable[Denial]):
+    _record(denials, 1)
+
+def record_removed(denials: Iterable[Denial]):
+    _record(denials, -1)
+
+def record_status_change(denials: Iterable[Denial], old: Dict[int, Tuple[str, object]]):
+    """Move each denial from its old (status, closed_at) bucket to its current one."""
+    denials = [d for d in denials if d.id in old and old[d.id][0] != d.status]
+    if not denials:
+        return
+    payers = _payers(d.claim_id for d in denials)
+    deltas = _new_deltas()
+    for d in denials:
+        old_status, old_closed = old[d.id]
+        payer = payers.get(d.claim_id)
+        src = deltas[_key(payer, d.carc_code, d.rarc_code, d.created_at, old_status)]
+        src[0] -= 1
+        src[1] -= d.amount or 0
+        src[2] -= _close_seconds(d.created_at, old_closed) if old_status == "CLOSED" else 0
+        dst = deltas[_key(payer, d.carc_code, d.rarc_code, d.created_at, d.status)]
+        dst[0] += 1
+        dst[1] += d.amount or 0
+        dst[2] += _close_seconds(d.created_at, d.closed_at) if d.status == "CLOSED" else 0
+    apply(deltas)
+
+def rebuild(chunk_size: int = 5000) -> int:
+    """Recompute every rollup row from Denial; returns the number of rows written."""
+    acc = _new_deltas()
+    rows = (Denial.objects.values_list("claim__payer_name", "carc_code", "rarc_code", "created_at",
+                                       "status", "amount", "closed_at")
+            .iterator(chunk_size=chunk_size))
+    for payer, carc, rarc, created_at, status, amount, closed_at in rows:
+        row = acc[_key(payer, carc, rarc, created_at, status)]
+        row[0] += 1
+        row[1] += amount or 0
+        row[2] += _close_seconds(created_at, closed_at) if status == "CLOSED" else 0
+    objs = [DenialRollup(payer=k[0], carc_code=k[1], rarc_code=k[2], iso_week=k[3], status=k[4],
+                         count=v[0], amount=v[1], close_seconds=v[2]) for k, v in acc.items()]
+    with transaction.atomic():
+        DenialRollup.objects.all().delete()
+        DenialRollup.objects.bulk_create(objs, batch_size=2000)
+    return len(objs)
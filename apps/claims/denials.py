@@ -0,0 +1,73 @@
+"""Denial status changes shared by the API, the portal and bulk tools."""
+from typing import Dict, Iterable, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import denial_rollup
+from .models import Denial, DenialStatusHistory
+
+# from -> statuses it may move to; CLOSED can only be reopened
+TRANSITIONS = {
+    "OPEN": {"WORKING", "CLOSED"},
+    "WORKING": {"OPEN", "CLOSED"},
+    "CLOSED": {"OPEN"},
+}
+
+def set_status(denial: Denial, new_status: str, note: str = "", history: bool = True) -> str:
+    """
+    Move one denial to `new_status`, stamping closed_at, writing history and
+    updating the rollups in one transaction. Returns the previous status.
+    """
+    old = (denial.status, denial.closed_at)
+    denial.status = new_status
+    denial.closed_at = (denial.closed_at or timezone.now()) if new_status == "CLOSED" else None
+    with transaction.atomic():
+        denial.save(update_fields=["status", "closed_at"])
+        if history:
+            DenialStatusHistory.objects.create(
+                denial=denial, from_status=old[0] or "", to_status=new_status, note=note
+            )
+        denial_rollup.record_status_change([denial], {denial.id: old})
+    return old[0]
+
+def bulk_set_status(ids: Iterable[int], new_status: str, note: str = "") -> Dict[int, Tuple[str, str]]:
+    """
+    Move many denials to `new_status` with one UPDATE and one history
+    bulk_create. Returns {id: (outcome, previous status)} where outcome is
+    "updated", "unchanged", "invalid_transition" or "not_found".
+    """
+    ids = list(dict.fromkeys(ids))
+    out: Dict[int, Tuple[str, str]] = {}
+    with transaction.atomic():
+        rows = (Denial.objects.select_for_update().filter(id__in=ids)
+                .only("id", "claim_id", "carc_code", "rarc_code", "status", "amount", "created_at", "closed_at"))
+        found = {d.id: d for d in rows}
+        moving = []
+        for i in ids:
+            d = found.get(i)
+            if d is None:
+                out[i] = ("not_found", "")
+            elif d.status == new_status:
+                out[i] = ("unchanged", d.status)
+            elif new_status not in TRANSITIONS.get(d.status, ()):
+                out[i] = ("invalid_transition", d.status)
+            else:
+                out[i] = ("updated", d.status)
+                moving.append(d)
+        if not moving:
+            return out
+
+        now = timezone.now()
+        closed_at = now if new_status == "CLOSED" else None
+        old = {d.id: (d.status, d.closed_at) for d in moving}
+        Denial.objects.filter(id__in=old).update(status=new_status, closed_at=closed_at)
+        DenialStatusHistory.objects.bulk_create(
+            [DenialStatusHistory(denial_id=d.id, from_status=d.status, to_status=new_status, note=note)
+             for d in moving],
+            batch_size=1000,
+        )
+        for d in moving:
+            d.status, d.closed_at = new_status, closed_at
+        denial_rollup.record_status_change(moving, old)
+    return out
@@ -0,0 +1,146 @@
+"""
+EDI spooler: moves QUEUED EdiExport rows to SENT/FAILED.
+
+Workers lease whole interchange files. A batch is leased by stamping
+locked_by/locked_at on every QUEUED row of the chosen files with one
+conditional UPDATE (candidates are picked with select_for_update(skip_locked)
+where the backend supports it), so several spooler processes can run side by
+side without delivering the same file twice. A lease older than LEASE_SECONDS
+is considered abandoned and can be taken over.
+
+Each file is delivered once through the configured transport. Successes are
+marked SENT in one UPDATE per batch; failures back off exponentially
+(attempts, next_attempt_at) and become FAILED after max_attempts.
+"""
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .edi_transport import TransportError, get_transport
+from .models import Claim, EdiExport
+
+LEASE_SECONDS = 300
+BACKOFF_BASE = 30        # seconds; attempt n waits BACKOFF_BASE * 2**(n-1)
+BACKOFF_MAX = 3600
+MAX_ATTEMPTS = 5
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"[:80]
+
+def _ready_q(now) -> Q:
+    stale = now - timedelta(seconds=LEASE_SECONDS)
+    return (Q(status="QUEUED")
+            & (Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            & (Q(locked_by="") | Q(locked_at__lt=stale)))
+
+def lease(worker: str, files: int = 20) -> Dict[str, List[int]]:
+    """Lease up to `files` interchange files; returns {file_path: [export ids]} owned by `worker`."""
+    now = timezone.now()
+    with transaction.atomic():
+        qs = EdiExport.objects.filter(_ready_q(now)).order_by("created_at", "id")
+        if connection.features.has_select_for_update_skip_locked:
+            qs = qs.select_for_update(skip_locked=True)
+        paths = []
+        for path in qs.values_list("file_path", flat=True)[:files * 50]:
+            if path not in paths:
+                paths.append(path)
+                if len(paths) >= files:
+                    break
+        if not paths:
+            return {}
+        EdiExport.objects.filter(_ready_q(now), file_path__in=paths).update(locked_by=worker, locked_at=now)
+    leased: Dict[str, List[int]] = {}
+    for pk, path in (EdiExport.objects.filter(status="QUEUED", locked_by=worker, locked_at=now)
+                     .values_list("id", "file_path")):
+        leased.setdefault(path, []).append(pk)
+    return leased
+
+def backoff(attempts: int) -> int:
+    return min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+
+def _deliver(transport, path: str):
+    try:
+        return path, transport.send(path), None
+    except TransportError as e:
+        return path, None, str(e) or "transport error"
+    except Exception as e:  # transports are pluggable; never let one kill the worker
+        return path, None, f"{type(e).__name__}: {e}"
+
+def run_batch(worker: str, transport=None, files: int = 20, concurrency: int = 4,
+              max_attempts: int = MAX_ATTEMPTS) -> Dict[str, int]:
+    """Lease, deliver and record one batch. Returns counts of files/rows sent and failed."""
+    leased = lease(worker, files)
+    out = {"files": len(leased), "sent": 0, "retry": 0, "failed": 0}
+    if not leased:
+        return out
+    transport = transport or get_transport()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = list(pool.map(lambda p: _deliver(transport, p), leased))
+
+    now = timezone.now()
+    sent_ids: List[int] = []
+    failures = []
+    for path, ref, error in results:
+        if error is None:
+            sent_ids += leased[path]
+        else:
+            failures.append((path, error))
+
+    attempts = dict(EdiExport.objects.filter(file_path__in=[p for p, _ in failures], locked_by=worker)
+                    .values_list("file_path").annotate(n=Min("attempts")))
+    with transaction.atomic():
+        if sent_ids:
+            EdiExport.objects.filter(id__in=sent_ids).update(
+                status="SENT", sent_at=now, locked_by="", locked_at=None, note="")
+            Claim.objects.filter(edi_exports__id__in=sent_ids).update(status="SENT")
+            out["sent"] = len(sent_ids)
+        for path, error in failures:
+            ids = leased[path]
+            n = attempts.get(path, 0) + 1
+            if n >= max_attempts:
+                EdiExport.objects.filter(id__in=ids).update(
+                    status="FAILED", attempts=F("attempts") + 1, locked_by="", locked_at=None, note=error[:255])
+                out["failed"] += len(ids)
+            else:
+                EdiExport.objects.filter(id__in=ids).update(
+                    attempts=F("attempts") + 1, next_attempt_at=now + timedelta(seconds=backoff(n)),
+                    locked_by="", locked_at=None, note=error[:255])
+                out["retry"] += len(ids)
+    return out
+
+def metrics(window_minutes: int = 15) -> dict:
+    """Queue depth, lag and recent throughput across all workers (read from the table)."""
+    now = timezone.now()
+    by_status = dict(EdiExport.objects.values_list("status").annotate(n=Count("id")))
+    queued = EdiExport.objects.filter(status="QUEUED")
+    oldest = queued.aggregate(t=Min("created_at"))["t"]
+    since = now - timedelta(minutes=window_minutes)
+    sent_recent = EdiExport.objects.filter(status="SENT", sent_at__gte=since).count()
+    return {
+        "queued": by_status.get("QUEUED", 0),
+        "sent": by_status.get("SENT", 0),
+        "failed": by_status.get("FAILED", 0),
+        "leased": queued.exclude(locked_by="").count(),
+        "retrying": queued.filter(attempts__gt=0).count(),
+        "lag_seconds": round((now - oldest).total_seconds(), 1) if oldest else 0.0,
+        "window_minutes": window_minutes,
+        "sent_per_minute": round(sent_recent / window_minutes, 2),
+    }
+
+def run_forever(worker: Optional[str] = None, poll: float = 5.0, stop=lambda: False, report=None, **kw):
+    """Loop run_batch until `stop()` is true, sleeping `poll` seconds when the queue is empty."""
+    worker = worker or worker_name()
+    transport = get_transport()
+    while not stop():
+        res = run_batch(worker, transport=transport, **kw)
+        if report is not None and res["files"]:
+            report(res)
+        if not res["files"]:
+            time.sleep(poll)
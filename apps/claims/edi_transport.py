@@ -0,0 +1,43 @@
+"""
+Delivery transports for the EDI spooler.
+
+A transport is any object with `send(path) -> str` that delivers one
+interchange file and returns a reference for the log, raising TransportError
+when the attempt should be retried. settings.EDI_TRANSPORT names the class
+(dotted path); OutboxTransport is the default and stands in for the
+clearinghouse SFTP drop.
+"""
+import os
+import shutil
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+class TransportError(Exception):
+    pass
+
+class OutboxTransport:
+    """Copy files into EDI_OUTBOX_DIR, via a temp name and rename so pickers never see partial files."""
+
+    def __init__(self, outbox_dir=None):
+        self.outbox_dir = outbox_dir or getattr(
+            settings, "EDI_OUTBOX_DIR", os.path.join(settings.BASE_DIR, "exports", "outbox"))
+
+    def send(self, path: str) -> str:
+        if not os.path.isfile(path):
+            raise TransportError(f"missing file {path}")
+        dest = os.path.join(self.outbox_dir, os.path.basename(path))
+        tmp = f"{dest}.{os.getpid()}.part"
+        try:
+            os.makedirs(self.outbox_dir, exist_ok=True)
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, dest)
+        except OSError as e:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise TransportError(str(e)) from e
+        return dest
+
+def get_transport():
+    dotted = getattr(settings, "EDI_TRANSPORT", "apps.claims.edi_transport.OutboxTransport")
+    return import_string(dotted)()
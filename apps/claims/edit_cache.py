@@ -0,0 +1,100 @@
+"""
+Process-wide, versioned cache of the MUE / NCCI edit tables.
+
+- MUE is a plain dict: code -> max units.
+- NCCI is indexed per edit type as primary -> set(secondary), so checking a
+  claim costs one lookup per line instead of a scan over every pair.
+- The cache is stamped with EditTableVersion.version; `import_data` bumps it
+  when it loads edit datasets and every process drops its stale copy on the
+  next `get_edit_tables()` call.
+- Compiled quarterly CMS editions (see ncci_store) are opened alongside and
+  take precedence for claims whose date of service they cover.
+"""
+import threading
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from django.db.models import F
+
+from .models import MUE, NCCIEdit, EditTableVersion
+from .ncci_store import EditionSet, load_editions
+
+_LOCK = threading.Lock()
+_CACHE: Optional["EditTables"] = None
+
+class EditTables:
+    def __init__(self, version: int, mue: Dict[str, object], ncci: Dict[str, Dict[str, Set[str]]],
+                 editions: Optional[EditionSet] = None):
+        self.version = version
+        self.mue = mue
+        self.ncci = ncci
+        self.editions = editions or EditionSet([])
+
+    @classmethod
+    def load(cls, version: int) -> "EditTables":
+        mue = {code: lim for code, lim in MUE.objects.values_list("code", "max_units")}
+        ncci: Dict[str, Dict[str, Set[str]]] = {}
+        rows = NCCIEdit.objects.values_list("code_primary", "code_secondary", "edit_type").iterator(chunk_size=5000)
+        for primary, secondary, edit_type in rows:
+            ncci.setdefault(edit_type, {}).setdefault(primary, set()).add(secondary)
+        return cls(version, mue, ncci, load_editions())
+
+    def mue_limit(self, code: str, dos: Optional[date] = None):
+        ed = self.editions.for_date(dos)
+        if ed is not None and ed.mue is not None:
+            lim = ed.mue.limit(code)
+            if lim is not None:
+                return Decimal(lim)
+        return self.mue.get(code)
+
+    def pairs_for(self, codes: Iterable[str]) -> Iterator[Tuple[str, str, str]]:
+        """Yield (primary, secondary, edit_type) for every edit hit among `codes`."""
+        present = set(codes)
+        for edit_type in sorted(self.ncci):
+            index = self.ncci[edit_type]
+            for primary in sorted(present):
+                secondaries = index.get(primary)
+                if not secondaries:
+                    continue
+                for secondary in sorted(secondaries & present):
+                    yield primary, secondary, edit_type
+
+    def ptp_edits(self, codes: Iterable[str], dos: Optional[date]) -> Iterator[Tuple[str, str, int]]:
+        """Yield (column1, column2, modifier indicator) from the CMS edition valid on `dos`."""
+        ed = self.editions.for_date(dos)
+        if ed is not None and ed.ptp is not None:
+            yield from ed.ptp.edits_for(codes, dos)
+
+def current_version() -> int:
+    row = EditTableVersion.objects.filter(pk=1).values_list("version", flat=True).first()
+    return row or 0
+
+def bump_version(note: str = "") -> int:
+    """Mark the edit tables as changed; other processes reload on next access."""
+    EditTableVersion.objects.get_or_create(pk=1)
+    EditTableVersion.objects.filter(pk=1).update(version=F("version") + 1, note=note[:255])
+    invalidate()
+    return current_version()
+
+def invalidate():
+    global _CACHE
+    with _LOCK:
+        _CACHE = None
+
+def get_edit_tables(check_version: bool = True) -> EditTables:
+    """
+    Return the cached tables, reloading when the stored version moved.
+    Pass check_version=False inside a batch that already validated the cache.
+    """
+    global _CACHE
+    cached = _CACHE
+    if cached is not None and not check_version:
+        return cached
+    version = current_version()
+    if cached is not None and cached.version == version:
+        return cached
+    with _LOCK:
+        if _CACHE is None or _CACHE.version != version:
+            _CACHE = EditTables.load(version)
+        return _CACHE
@@ -0,0 +1,60 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from apps.claims.models import Claim
+from apps.claims.autofix import iter_autofix, default_note, AUTOFIX_COLUMNS
+from apps.claims.scrubber import DEFAULT_CHUNK_SIZE
+from apps.claims import streaming
+
+class Command(BaseCommand):
+    help = "Propose (dry run) or apply autofixes for a filtered claim set, streaming one row per change."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--status", type=str, default="ALL",
+                            help="Only claims with this status (default ALL)")
+        parser.add_argument("--payer", type=str, default="", help="Only claims for this payer name")
+        parser.add_argument("--ids", type=str, default="", help="Comma-separated claim ids")
+        parser.add_argument("--apply", action="store_true", help="Commit the changes (default is a dry run)")
+        parser.add_argument("--format", choices=sorted(streaming.CONTENT_TYPES), default="csv")
+        parser.add_argument("--output", type=str, default="", help="Write the report here instead of stdout")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                            help="Claims per prefetch/transaction chunk")
+
+    def handle(self, *args, **opts):
+        qs = Claim.objects.all()
+        if opts["ids"]:
+            try:
+                ids = [int(x) for x in opts["ids"].split(",") if x.strip()]
+            except ValueError:
+                raise CommandError("--ids must be a comma-separated list of integers")
+            qs = qs.filter(id__in=ids)
+        if opts["status"].upper() != "ALL":
+            qs = qs.filter(status=opts["status"])
+        if opts["payer"]:
+            qs = qs.filter(payer_name__iexact=opts["payer"].strip())
+        if opts["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be >= 1")
+
+        note = default_note("autofix_claims") if opts["apply"] else ""
+        counts = {"rows": 0, "applied": 0, "claims": set()}
+
+        def counted(rows):
+            for row in rows:
+                counts["rows"] += 1
+                counts["applied"] += bool(row["applied"])
+                counts["claims"].add(row["claim_id"])
+                yield row
+
+        rows = counted(iter_autofix(qs, apply=opts["apply"], chunk_size=opts["chunk_size"], note=note))
+        out = open(opts["output"], "w", newline="", encoding="utf-8") if opts["output"] else sys.stdout
+        try:
+            for chunk in streaming.encode(rows, opts["format"], AUTOFIX_COLUMNS):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        verb = "Applied" if opts["apply"] else "Proposed"
+        self.stderr.write(self.style.SUCCESS(
+            f"{verb} {counts['applied'] if opts['apply'] else counts['rows']} changes "
+            f"across {len(counts['claims'])} claims."
+        ))
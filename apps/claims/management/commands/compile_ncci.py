@@ -0,0 +1,37 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from apps.claims import ncci_store
+from apps.claims.edit_cache import bump_version
+
+class Command(BaseCommand):
+    help = ("Compile CMS quarterly NCCI practitioner PTP and MUE release files into the "
+            "memory-mapped edition format (ptp_<quarter>.bin / mue_<quarter>.bin).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--quarter", required=True, help="Edition quarter, e.g. 2025Q3")
+        parser.add_argument("--ptp", nargs="*", default=[], help="PTP text/CSV files (the CMS release is split in several parts)")
+        parser.add_argument("--mue", nargs="*", default=[], help="Practitioner MUE CSV/text files")
+        parser.add_argument("--out-dir", default="", help="Output directory (default settings.NCCI_EDITIONS_DIR)")
+
+    def handle(self, *args, **opts):
+        quarter = opts["quarter"].upper()
+        try:
+            ncci_store.quarter_bounds(quarter)
+        except ValueError as e:
+            raise CommandError(str(e))
+        if not opts["ptp"] and not opts["mue"]:
+            raise CommandError("Give at least one --ptp or --mue file.")
+        for path in opts["ptp"] + opts["mue"]:
+            if not os.path.exists(path):
+                raise CommandError(f"File not found: {path}")
+        out_dir = opts["out_dir"] or None
+
+        if opts["ptp"]:
+            path, n = ncci_store.compile_ptp(opts["ptp"], quarter, out_dir)
+            self.stdout.write(self.style.SUCCESS(f"[{quarter}] PTP: {n} pairs -> {path}"))
+        if opts["mue"]:
+            path, n = ncci_store.compile_mue(opts["mue"], quarter, out_dir)
+            self.stdout.write(self.style.SUCCESS(f"[{quarter}] MUE: {n} codes -> {path}"))
+
+        version = bump_version(note=f"compile_ncci {quarter}")
+        self.stdout.write(self.style.NOTICE(f"Edit tables changed -> version {version}"))
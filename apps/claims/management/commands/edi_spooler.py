@@ -0,0 +1,55 @@
+import json
+import signal
+import time
+from django.core.management.base import BaseCommand, CommandError
+from apps.claims import edi_spool
+
+class Command(BaseCommand):
+    help = ("Long-running worker that delivers QUEUED EdiExport files through the configured transport. "
+            "Run several side by side; each leases whole files.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--files", type=int, default=20, help="Interchange files leased per batch")
+        parser.add_argument("--concurrency", type=int, default=4, help="Parallel deliveries per worker")
+        parser.add_argument("--max-attempts", type=int, default=edi_spool.MAX_ATTEMPTS,
+                            help="Attempts before an export is marked FAILED")
+        parser.add_argument("--poll", type=float, default=5.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--worker-id", type=str, default="", help="Lease owner name (default host:pid)")
+        parser.add_argument("--once", action="store_true", help="Process a single batch and exit")
+        parser.add_argument("--metrics", action="store_true", help="Print queue metrics as JSON and exit")
+
+    def handle(self, *args, **opts):
+        if opts["metrics"]:
+            self.stdout.write(json.dumps(edi_spool.metrics()))
+            return
+        if opts["files"] < 1 or opts["concurrency"] < 1 or opts["max_attempts"] < 1:
+            raise CommandError("--files, --concurrency and --max-attempts must be >= 1")
+
+        worker = opts["worker_id"] or edi_spool.worker_name()
+        kw = {"files": opts["files"], "concurrency": opts["concurrency"], "max_attempts": opts["max_attempts"]}
+        if opts["once"]:
+            res = edi_spool.run_batch(worker, **kw)
+            self.stdout.write(self.style.SUCCESS(f"{worker}: {res}"))
+            return
+
+        stopping = {"flag": False}
+
+        def _stop(signum, frame):
+            stopping["flag"] = True
+
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+        started = time.monotonic()
+        totals = {"files": 0, "sent": 0, "retry": 0, "failed": 0}
+
+        def report(res):
+            for k in totals:
+                totals[k] += res[k]
+            rate = totals["sent"] / max(time.monotonic() - started, 1e-6)
+            m = edi_spool.metrics()
+            self.stdout.write(f"{worker}: {res} | total sent {totals['sent']} ({rate:.1f}/s) "
+                              f"queued {m['queued']} lag {m['lag_seconds']}s")
+
+        self.stdout.write(f"{worker}: spooling (Ctrl-C to stop)")
+        edi_spool.run_forever(worker, poll=opts["poll"], stop=lambda: stopping["flag"], report=report, **kw)
+        self.stdout.write(self.style.SUCCESS(f"{worker}: stopped after {totals}"))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from apps.claims.models import Claim
+from apps.claims.scrubber import scrub_claims
+from apps.claims.x12_837p import write_837p_batch, max_claims_per_st, max_claims_per_file
+
+class Command(BaseCommand):
+    help = ("Scrub new or edited claims, then write READY claims without open ERROR findings to "
+            "multi-claim 837P interchanges, grouped per billing provider and payer.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--status", type=str, default="READY",
+                            help="Only export claims with this status (use ALL for every claim)")
+        parser.add_argument("--ids", type=str, default="", help="Comma-separated claim ids (overrides --status)")
+        parser.add_argument("--per-st", type=int, default=None,
+                            help=f"Max claims per ST transaction set (default {max_claims_per_st()})")
+        parser.add_argument("--per-file", type=int, default=None,
+                            help=f"Max claims per interchange file (default {max_claims_per_file()})")
+        parser.add_argument("--out-dir", type=str, default=None, help="Output directory (default EXPORTS_DIR)")
+
+    def handle(self, *args, **opts):
+        if opts["ids"]:
+            try:
+                ids = [int(x) for x in opts["ids"].split(",") if x.strip()]
+            except ValueError:
+                raise CommandError("--ids must be a comma-separated list of integers")
+            qs = Claim.objects.filter(id__in=ids)
+        elif opts["status"].upper() == "ALL":
+            qs = Claim.objects.all()
+        else:
+            qs = Claim.objects.filter(status=opts["status"])
+        for name in ("per_st", "per_file"):
+            if opts[name] is not None and opts[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be >= 1")
+
+        # never-scrubbed and edited claims have no or stale summaries; bring them up to date first
+        scrub_claims(qs, only_changed=True)
+        blocked = qs.filter(Q(finding_summary__error_count__gt=0) | Q(finding_summary__isnull=True)
+                            | Q(scrub_dirty=True))
+        skipped = blocked.count()
+        exports = write_837p_batch(qs.exclude(id__in=blocked.values("id")), outdir=opts["out_dir"],
+                                   per_st=opts["per_st"], per_file=opts["per_file"])
+        files = sorted({e.file_path for e in exports})
+        for f in files:
+            self.stdout.write(f)
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {len(exports)} claims in {len(files)} interchange(s); "
+            f"skipped {skipped} with open errors."
+        ))
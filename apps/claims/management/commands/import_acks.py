@@ -0,0 +1,34 @@
+import glob
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.claims.x12_ack import ingest_ack, DEFAULT_CHUNK_SIZE
+
+class Command(BaseCommand):
+    help = "Apply 999 and 277CA acknowledgment files to EdiExport.ack_status and Claim.status."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="*",
+                            help="Acknowledgment files or directories (default: every file in IMPORTS_ACK_DIR)")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                            help="Acknowledged items buffered per set-based UPDATE")
+
+    def handle(self, *args, **opts):
+        if opts["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be >= 1")
+        files = []
+        for p in opts["paths"] or [getattr(settings, "IMPORTS_ACK_DIR", "")]:
+            if os.path.isdir(p):
+                files += sorted(f for f in glob.glob(os.path.join(p, "*")) if os.path.isfile(f))
+            elif os.path.isfile(p):
+                files.append(p)
+            else:
+                raise CommandError(f"No such file or directory: {p}")
+
+        for path in files:
+            try:
+                stats = ingest_ack(path, chunk_size=opts["chunk_size"])
+            except ValueError as e:
+                self.stderr.write(self.style.WARNING(f"{path}: {e}"))
+                continue
+            self.stdout.write(self.style.SUCCESS(f"{path}: " + ", ".join(f"{k}={v}" for k, v in stats.items())))
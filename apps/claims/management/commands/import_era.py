@@ -0,0 +1,42 @@
+import glob
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.claims.x12_835 import post_era, DEFAULT_CHUNK_SIZE
+
+class Command(BaseCommand):
+    help = "Parse X12 835 remittance files and post payments, adjustments and denials (idempotent per file)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="*",
+                            help="835 files or directories (default: every file in IMPORTS_ERA_DIR)")
+        parser.add_argument("--source", type=str, default="", help="Source label stored on EraImport")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                            help="Claim payments per posting transaction")
+
+    def handle(self, *args, **opts):
+        if opts["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be >= 1")
+        files = []
+        for p in opts["paths"] or [settings.IMPORTS_ERA_DIR]:
+            if os.path.isdir(p):
+                files += sorted(f for f in glob.glob(os.path.join(p, "*")) if os.path.isfile(f))
+            elif os.path.isfile(p):
+                files.append(p)
+            else:
+                raise CommandError(f"No such file or directory: {p}")
+
+        for path in files:
+            try:
+                era, created = post_era(path, source=opts["source"], chunk_size=opts["chunk_size"])
+            except ValueError as e:
+                self.stderr.write(self.style.WARNING(f"{path}: {e}"))
+                continue
+            if not created:
+                self.stdout.write(f"{path}: already posted as EraImport #{era.id}, skipped")
+                continue
+            s = era.stats
+            self.stdout.write(self.style.SUCCESS(
+                f"{path}: {s['claims']} claims ({s['unmatched']} unmatched), {s['payments']} payments, "
+                f"{s['adjustments']} adjustments, {s['denials']} denials opened"
+            ))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from apps.claims.denial_rollup import rebuild
+
+class Command(BaseCommand):
+    help = "Recompute DenialRollup from every Denial (backfill / repair after bulk edits outside the app)."
+
+    def handle(self, *args, **opts):
+        n = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {n} denial rollup rows."))
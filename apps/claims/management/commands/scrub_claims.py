@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.claims.models import Claim
+from apps.claims.scrubber import scrub_claims, DEFAULT_CHUNK_SIZE
+
+class Command(BaseCommand):
+    help = "Batch re-scrub claims (default: all READY claims). Loads edit tables once and writes findings in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--status", type=str, default="READY",
+                            help="Only scrub claims with this status (use ALL for every claim)")
+        parser.add_argument("--ids", type=str, default="", help="Comma-separated claim ids (overrides --status)")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Claims per prefetch/commit chunk")
+        parser.add_argument("--workers", type=int, default=1, help="Process pool size (1 = in-process)")
+        parser.add_argument("--profile", action="store_true",
+                            help="Print per-rule wall time, claims evaluated and findings produced")
+        parser.add_argument("--changed-only", action="store_true",
+                            help="Skip claims whose fingerprint and edit-table version are unchanged")
+
+    def handle(self, *args, **opts):
+        if opts["ids"]:
+            try:
+                ids = [int(x) for x in opts["ids"].split(",") if x.strip()]
+            except ValueError:
+                raise CommandError("--ids must be a comma-separated list of integers")
+            qs = Claim.objects.filter(id__in=ids)
+        elif opts["status"].upper() == "ALL":
+            qs = Claim.objects.all()
+        else:
+            qs = Claim.objects.filter(status=opts["status"])
+
+        if opts["workers"] < 1 or opts["chunk_size"] < 1:
+            raise CommandError("--workers and --chunk-size must be >= 1")
+
+        stats = scrub_claims(qs, chunk_size=opts["chunk_size"], workers=opts["workers"],
+                             only_changed=opts["changed_only"], profile=opts["profile"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Scrubbed {stats['claims']} claims (skipped {stats['skipped']} unchanged), {stats['findings']} findings "
+            f"(+{stats['inserted']} new, {stats['resolved']} resolved) "
+            f"in {stats['seconds']}s ({stats['claims_per_sec']} claims/sec)."
+        ))
+
+        if opts["profile"]:
+            self.stdout.write(f"{'rule':<24}{'claims':>10}{'findings':>10}{'seconds':>12}{'avg_us':>10}")
+            for r in stats["rules"]:
+                self.stdout.write(f"{r['rule']:<24}{r['claims']:>10}{r['findings']:>10}"
+                                  f"{r['seconds']:>12.4f}{r['avg_us']:>10.1f}")
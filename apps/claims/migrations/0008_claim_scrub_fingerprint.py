@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claims', '0007_edittableversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='claim',
+            name='scrub_fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='claim',
+            name='scrub_rule_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='claim',
+            name='scrub_dirty',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+        migrations.AddField(
+            model_name='claim',
+            name='scrubbed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claims', '0008_claim_scrub_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrubfinding',
+            name='first_seen',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='scrubfinding',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
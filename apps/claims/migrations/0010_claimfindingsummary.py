@@ -0,0 +1,52 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    ScrubFinding = apps.get_model("claims", "ScrubFinding")
+    ClaimFindingSummary = apps.get_model("claims", "ClaimFindingSummary")
+    acc = {}
+    rows = (ScrubFinding.objects.filter(resolved_at__isnull=True)
+            .values_list("claim_id", "severity", "code", "first_seen").iterator())
+    for claim_id, severity, code, first_seen in rows:
+        s = acc.setdefault(claim_id, {"ERROR": [], "WARN": [], "oldest": first_seen})
+        s.setdefault(severity, []).append(code)
+        if first_seen and (s["oldest"] is None or first_seen < s["oldest"]):
+            s["oldest"] = first_seen
+
+    def pack(codes):
+        codes = sorted(set(codes))
+        return f"|{'|'.join(codes)}|" if codes else ""
+
+    ClaimFindingSummary.objects.bulk_create([
+        ClaimFindingSummary(
+            claim_id=claim_id,
+            error_count=len(s["ERROR"]), warn_count=len(s["WARN"]),
+            error_codes=pack(s["ERROR"]), warn_codes=pack(s["WARN"]),
+            oldest_open=s["oldest"],
+        )
+        for claim_id, s in acc.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claims', '0009_scrubfinding_first_seen_resolved_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimFindingSummary',
+            fields=[
+                ('claim', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='finding_summary', serialize=False, to='claims.claim')),
+                ('error_count', models.PositiveIntegerField(db_index=True, default=0)),
+                ('warn_count', models.PositiveIntegerField(db_index=True, default=0)),
+                ('error_codes', models.CharField(blank=True, max_length=255)),
+                ('warn_codes', models.CharField(blank=True, max_length=255)),
+                ('oldest_open', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
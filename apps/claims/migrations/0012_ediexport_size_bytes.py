@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claims', '0011_controlnumbersequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ediexport',
+            name='size_bytes',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claims', '0012_ediexport_size_bytes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eraimport',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='eraimport',
+            name='size_bytes',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eraimport',
+            name='status',
+            field=models.CharField(choices=[('PROCESSING', 'PROCESSING'), ('POSTED', 'POSTED'), ('FAILED', 'FAILED')], default='POSTED', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='eraimport',
+            name='stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claims', '0014_ediexport_spool'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ediexport',
+            name='transaction_id',
+            field=models.CharField(blank=True, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='ediexport',
+            name='ack_status',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='ediexport',
+            name='ack_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ediexport',
+            index=models.Index(fields=['functional_id', 'transaction_id'], name='ediexport_ack_idx'),
+        ),
+    ]
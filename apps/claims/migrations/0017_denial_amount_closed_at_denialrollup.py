@@ -0,0 +1,40 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claims', '0016_claimcsvimport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='denial',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='denial',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DenialRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payer', models.CharField(max_length=120)),
+                ('carc_code', models.CharField(blank=True, max_length=10)),
+                ('rarc_code', models.CharField(blank=True, max_length=10)),
+                ('iso_week', models.CharField(max_length=8)),
+                ('status', models.CharField(max_length=10)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('close_seconds', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('payer', 'carc_code', 'rarc_code', 'iso_week', 'status')},
+                'indexes': [models.Index(fields=['iso_week', 'payer'], name='denialrollup_week_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class Claim(models.Model):
     patient_id = models.IntegerField()  # simplify FK
@@ -13,6 +14,11 @@ class Claim(models.Model):
     total_charge = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     claim_control_number = models.CharField(max_length=50, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # incremental rescrub bookkeeping (see scrubber.claim_fingerprint)
+    scrub_fingerprint = models.CharField(max_length=64, blank=True)
+    scrub_rule_version = models.PositiveIntegerField(null=True, blank=True)
+    scrub_dirty = models.BooleanField(default=True, db_index=True)
+    scrubbed_at = models.DateTimeField(null=True, blank=True)
 
 class ClaimLine(models.Model):
     claim = models.ForeignKey(Claim, on_delete=models.CASCADE, related_name="lines")
@@ -35,6 +41,27 @@ class ScrubFinding(models.Model):
     message = models.TextField()
     line = models.ForeignKey(ClaimLine, null=True, blank=True, on_delete=models.SET_NULL)
     suggestion = models.TextField(blank=True)
+    first_seen = models.DateTimeField(default=timezone.now)
+    resolved_at = models.DateTimeField(null=True, blank=True, db_index=True)  # null = still open
+
+class ClaimFindingSummary(models.Model):
+    """Denormalized open-finding rollup per claim, maintained by the scrubber (workqueue reads it)."""
+    claim = models.OneToOneField(Claim, primary_key=True, on_delete=models.CASCADE, related_name="finding_summary")
+    error_count = models.PositiveIntegerField(default=0, db_index=True)
+    warn_count = models.PositiveIntegerField(default=0, db_index=True)
+    error_codes = models.CharField(max_length=255, blank=True)  # "|NCCI_PAIR|MUE_EXCEEDED|"
+    warn_codes = models.CharField(max_length=255, blank=True)
+    oldest_open = models.DateTimeField(null=True, blank=True)   # min(first_seen) of open findings
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @staticmethod
+    def pack_codes(codes) -> str:
+        codes = sorted(set(codes))
+        return f"|{'|'.join(codes)}|" if codes else ""
+
+    @staticmethod
+    def unpack_codes(raw: str):
+        return [c for c in (raw or "").split("|") if c]
 
 # --- Edits data (stubs) ---
 class MUE(models.Model):
@@ -65,20 +92,50 @@ class EdiExport(models.Model):
     claim = models.ForeignKey(Claim, on_delete=models.CASCADE, related_name="edi_exports")
     file_path = models.CharField(max_length=300)
     sha256 = models.CharField(max_length=64)
-    interchange_id = models.CharField(max_length=30, blank=True)  # ISA13 (optional later)
-    functional_id = models.CharField(max_length=30, blank=True)   # GS06 (optional later)
+    size_bytes = models.PositiveBigIntegerField(default=0)
+    interchange_id = models.CharField(max_length=30, blank=True)  # ISA13
+    functional_id = models.CharField(max_length=30, blank=True)   # GS06
+    transaction_id = models.CharField(max_length=30, blank=True)  # ST02
     status = models.CharField(max_length=10, choices=STATUS, default="QUEUED")
     note = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # spooler bookkeeping (see edi_spool)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=80, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # 999 implementation acknowledgment for this export's ST (see x12_ack)
+    ack_status = models.CharField(max_length=20, blank=True)   # ACCEPTED / ACCEPTED_ERRORS / REJECTED
+    ack_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="ediexport_spool_idx"),
+            models.Index(fields=["functional_id", "transaction_id"], name="ediexport_ack_idx"),
+        ]
+
+class ControlNumberSequence(models.Model):
+    """Monotonic X12 control-number counter, one row per envelope level (ISA, GS, ST)."""
+    name = models.CharField(max_length=10, primary_key=True)
+    value = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
 
 # --- ERA / Payments / Denials ---
 
 class EraImport(models.Model):
+    STATUS = (("PROCESSING","PROCESSING"), ("POSTED","POSTED"), ("FAILED","FAILED"))
     received_at = models.DateTimeField(auto_now_add=True)
     source = models.CharField(max_length=120, blank=True)
     filename = models.CharField(max_length=200, blank=True)
-    sha256 = models.CharField(max_length=64, blank=True)
-    raw = models.TextField(blank=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    raw = models.TextField(blank=True)  # legacy; x12_835 reads files in place
+    size_bytes = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=12, choices=STATUS, default="POSTED")
+    stats = models.JSONField(default=dict, blank=True)    # claims/payments/adjustments/denials/unmatched
     imported_at = models.DateTimeField(auto_now_add=True)
 
 class Payment(models.Model):
@@ -105,8 +162,10 @@ class Denial(models.Model):
     carc_code = models.CharField(max_length=10, blank=True)
     rarc_code = models.CharField(max_length=10, blank=True)
     status = models.CharField(max_length=10, choices=STATUS, default="OPEN")
+    amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)   # denied dollars (CAS total)
     era = models.ForeignKey(EraImport, null=True, blank=True, on_delete=models.SET_NULL)
     created_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
 
 class DenialStatusHistory(models.Model):
     denial = models.ForeignKey("Denial", on_delete=models.CASCADE, related_name="history")
@@ -119,4 +178,49 @@ class DenialStatusHistory(models.Model):
         ordering = ["-created_at"]
 
     def __str__(self):
-        return f"{self.denial_id}: {self.from_status} -> {self.to_status}"
\ No newline at end of file
+        return f"{self.denial_id}: {self.from_status} -> {self.to_status}"
+
+
+class EditTableVersion(models.Model):
+    """Single-row stamp bumped whenever MUE/NCCI edit tables are (re)loaded."""
+    version = models.PositiveIntegerField(default=0)
+    note = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"edits v{self.version}"
+
+class ClaimCsvImport(models.Model):
+    """Checkpoint for import_claims_csv: last data row committed, so --resume can skip ahead."""
+    provenance = models.ForeignKey("ingestion.Provenance", null=True, blank=True, on_delete=models.SET_NULL)
+    file_name = models.CharField(max_length=200)
+    file_hash = models.CharField(max_length=64, db_index=True)
+    last_row = models.PositiveIntegerField(default=0)       # 1-based data row, header excluded
+    imported = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    error_path = models.CharField(max_length=300, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.file_name} @ row {self.last_row}"
+
+class DenialRollup(models.Model):
+    """
+    Denial counts/dollars per (payer, CARC, RARC, ISO week of creation, current status),
+    kept current by denial_rollup on every create and status change.
+    """
+    payer = models.CharField(max_length=120)
+    carc_code = models.CharField(max_length=10, blank=True)
+    rarc_code = models.CharField(max_length=10, blank=True)
+    iso_week = models.CharField(max_length=8)          # "2025-W27"
+    status = models.CharField(max_length=10)
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    close_seconds = models.BigIntegerField(default=0)  # sum of created->closed for CLOSED rows
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [("payer", "carc_code", "rarc_code", "iso_week", "status")]
+        indexes = [models.Index(fields=["iso_week", "payer"], name="denialrollup_week_idx")]
@@ -0,0 +1,272 @@
+"""
+Compact on-disk format for the quarterly CMS NCCI practitioner PTP and MUE tables.
+
+Each quarter ("edition") is compiled into two files under NCCI_EDITIONS_DIR:
+
+    ptp_<YYYYQn>.bin   fixed-width records sorted by (column1, column2, effective)
+    mue_<YYYYQn>.bin   fixed-width records sorted by code
+
+Records are packed big-endian so their raw bytes sort in key order; readers
+mmap the file and binary-search it, so a worker process only touches the
+pages it needs and all workers share the OS page cache.
+"""
+import mmap
+import os
+import re
+import struct
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">8sHI8sII2x")          # magic, version, count, quarter, valid_from, valid_to
+PTP_REC = struct.Struct(">5s5sIIB")            # col1, col2, effective, deletion, modifier indicator
+MUE_REC = struct.Struct(">5sHB")               # code, max units, MUE adjudication indicator
+PTP_MAGIC = b"NCCIPTP1"
+MUE_MAGIC = b"NCCIMUE1"
+NO_DELETION = 99991231
+
+_CODE_RE = re.compile(r"^[A-Z0-9]{5}$")
+_QUARTER_RE = re.compile(r"^(\d{4})Q([1-4])$")
+
+def editions_dir() -> str:
+    return getattr(settings, "NCCI_EDITIONS_DIR", os.path.join(settings.BASE_DIR, "data", "ncci"))
+
+def quarter_bounds(quarter: str) -> Tuple[int, int]:
+    """'2025Q3' -> (20250701, 20250930) as yyyymmdd ints."""
+    m = _QUARTER_RE.match(quarter or "")
+    if not m:
+        raise ValueError(f"Quarter must look like 2025Q3, got {quarter!r}")
+    year, q = int(m.group(1)), int(m.group(2))
+    start_month = 3 * (q - 1) + 1
+    end_day = {3: 31, 6: 30, 9: 30, 12: 31}[start_month + 2]
+    return (year * 10000 + start_month * 100 + 1,
+            year * 10000 + (start_month + 2) * 100 + end_day)
+
+def _ymd(d: date) -> int:
+    return d.year * 10000 + d.month * 100 + d.day
+
+def _parse_ymd(raw: str, default: int) -> int:
+    raw = (raw or "").strip()
+    if not raw or raw == "*":
+        return default
+    digits = re.sub(r"\D", "", raw)
+    if len(digits) != 8:
+        raise ValueError(f"bad date {raw!r}")
+    return int(digits)
+
+def _split(line: str) -> List[str]:
+    sep = "\t" if "\t" in line else ","
+    return [p.strip().strip('"') for p in line.rstrip("\r\n").split(sep)]
+
+# --- Parsing CMS release files ---
+
+def iter_ptp_rows(path: str) -> Iterator[Tuple[str, str, int, int, int]]:
+    """
+    Yield (col1, col2, effective, deletion, modifier) from a CMS PTP text/CSV file.
+    Layout: Column 1, Column 2, *, Effective Date, Deletion Date, Modifier, Rationale.
+    Header/disclaimer lines (anything whose first two cells aren't codes) are skipped.
+    """
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for line in f:
+            parts = _split(line)
+            if len(parts) < 6:
+                continue
+            c1, c2 = parts[0].upper(), parts[1].upper()
+            if not (_CODE_RE.match(c1) and _CODE_RE.match(c2)):
+                continue
+            try:
+                eff = _parse_ymd(parts[3], 0)
+                dele = _parse_ymd(parts[4], NO_DELETION)
+                mod = int(parts[5] or 9)
+            except ValueError:
+                continue
+            yield c1, c2, eff, dele, mod
+
+def iter_mue_rows(path: str) -> Iterator[Tuple[str, int, int]]:
+    """Yield (code, max_units, mai) from a CMS practitioner MUE CSV/text file."""
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for line in f:
+            parts = _split(line)
+            if len(parts) < 2:
+                continue
+            code = parts[0].upper()
+            if not _CODE_RE.match(code):
+                continue
+            try:
+                units = int(float(parts[1]))
+            except ValueError:
+                continue
+            mai_raw = parts[2] if len(parts) > 2 else ""
+            mai = int(mai_raw[0]) if mai_raw[:1].isdigit() else 0
+            yield code, min(max(units, 0), 0xFFFF), mai
+
+# --- Compiling ---
+
+def _write(path: str, magic: bytes, quarter: str, records: List[bytes]) -> int:
+    valid_from, valid_to = quarter_bounds(quarter)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(magic, FORMAT_VERSION, len(records), quarter.encode("ascii"), valid_from, valid_to))
+        for rec in records:
+            f.write(rec)
+    os.replace(tmp, path)
+    return len(records)
+
+def compile_ptp(sources: Iterable[str], quarter: str, out_dir: Optional[str] = None) -> Tuple[str, int]:
+    """Compile one or more CMS PTP files into ptp_<quarter>.bin. Returns (path, record count)."""
+    records = set()
+    for src in sources:
+        for c1, c2, eff, dele, mod in iter_ptp_rows(src):
+            records.add(PTP_REC.pack(c1.encode("ascii"), c2.encode("ascii"), eff, dele, mod))
+    path = os.path.join(out_dir or editions_dir(), f"ptp_{quarter}.bin")
+    return path, _write(path, PTP_MAGIC, quarter, sorted(records))
+
+def compile_mue(sources: Iterable[str], quarter: str, out_dir: Optional[str] = None) -> Tuple[str, int]:
+    """Compile CMS MUE files into mue_<quarter>.bin (last value wins per code)."""
+    by_code: Dict[str, bytes] = {}
+    for src in sources:
+        for code, units, mai in iter_mue_rows(src):
+            by_code[code] = MUE_REC.pack(code.encode("ascii"), units, mai)
+    path = os.path.join(out_dir or editions_dir(), f"mue_{quarter}.bin")
+    return path, _write(path, MUE_MAGIC, quarter, [by_code[k] for k in sorted(by_code)])
+
+# --- Reading ---
+
+class _MappedTable:
+    magic = b""
+    rec: struct.Struct = None
+    key_len = 0
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            head = f.read(HEADER.size)
+            magic, version, count, quarter, valid_from, valid_to = HEADER.unpack(head)
+            if magic != self.magic or version != FORMAT_VERSION:
+                raise ValueError(f"{path}: not a v{FORMAT_VERSION} {self.magic.decode()} file")
+            self.count = count
+            self.quarter = quarter.rstrip(b"\x00").decode("ascii")
+            self.valid_from, self.valid_to = valid_from, valid_to
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if count else None
+
+    def _offset(self, i: int) -> int:
+        return HEADER.size + i * self.rec.size
+
+    def _lower_bound(self, key: bytes) -> int:
+        lo, hi, n = 0, self.count, len(key)
+        mm = self._mm
+        while lo < hi:
+            mid = (lo + hi) // 2
+            off = self._offset(mid)
+            if mm[off:off + n] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _record(self, i: int):
+        return self.rec.unpack_from(self._mm, self._offset(i))
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+class PtpTable(_MappedTable):
+    magic = PTP_MAGIC
+    rec = PTP_REC
+
+    def lookup(self, col1: str, col2: str, dos: date) -> Optional[int]:
+        """Return the modifier indicator of the edit active on `dos`, or None."""
+        if not self.count:
+            return None
+        key = col1.encode("ascii")[:5].ljust(5, b"\x00") + col2.encode("ascii")[:5].ljust(5, b"\x00")
+        when = _ymd(dos)
+        i = self._lower_bound(key)
+        while i < self.count:
+            c1, c2, eff, dele, mod = self._record(i)
+            if c1 + c2 != key:
+                break
+            if eff <= when < dele:
+                return mod
+            i += 1
+        return None
+
+    def edits_for(self, codes: Iterable[str], dos: date) -> Iterator[Tuple[str, str, int]]:
+        """Yield (column1, column2, modifier indicator) for each active pair among `codes`."""
+        present = sorted({c for c in codes if c and _CODE_RE.match(c)})
+        for c1 in present:
+            for c2 in present:
+                if c1 == c2:
+                    continue
+                mod = self.lookup(c1, c2, dos)
+                if mod is not None:
+                    yield c1, c2, mod
+
+class MueTable(_MappedTable):
+    magic = MUE_MAGIC
+    rec = MUE_REC
+
+    def limit(self, code: str) -> Optional[int]:
+        if not self.count or not code:
+            return None
+        key = code.upper().encode("ascii")[:5].ljust(5, b"\x00")
+        i = self._lower_bound(key)
+        if i < self.count:
+            c, units, _mai = self._record(i)
+            if c == key:
+                return units
+        return None
+
+class Edition:
+    def __init__(self, quarter: str, ptp: Optional[PtpTable], mue: Optional[MueTable]):
+        self.quarter = quarter
+        self.ptp = ptp
+        self.mue = mue
+        self.valid_from, self.valid_to = quarter_bounds(quarter)
+
+class EditionSet:
+    """All compiled quarters in a directory; picks the edition valid for a date of service."""
+
+    def __init__(self, editions: List[Edition]):
+        self.editions = sorted(editions, key=lambda e: e.valid_from)
+
+    def __bool__(self):
+        return bool(self.editions)
+
+    def for_date(self, dos: Optional[date]) -> Optional[Edition]:
+        if not self.editions or dos is None:
+            return None
+        when = _ymd(dos)
+        found = None
+        for ed in self.editions:
+            if ed.valid_from <= when:
+                found = ed   # latest quarter that started on/before DOS
+            else:
+                break
+        return found
+
+    def close(self):
+        for ed in self.editions:
+            for t in (ed.ptp, ed.mue):
+                if t is not None:
+                    t.close()
+
+def load_editions(directory: Optional[str] = None) -> EditionSet:
+    directory = directory or editions_dir()
+    if not os.path.isdir(directory):
+        return EditionSet([])
+    found: Dict[str, Dict[str, str]] = {}
+    for name in os.listdir(directory):
+        m = re.match(r"^(ptp|mue)_(\d{4}Q[1-4])\.bin$", name)
+        if m:
+            found.setdefault(m.group(2), {})[m.group(1)] = os.path.join(directory, name)
+    editions = []
+    for quarter, files in found.items():
+        ptp = PtpTable(files["ptp"]) if "ptp" in files else None
+        mue = MueTable(files["mue"]) if "mue" in files else None
+        editions.append(Edition(quarter, ptp, mue))
+    return EditionSet(editions)
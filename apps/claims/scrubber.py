@@ -1,63 +1,300 @@
-from decimal import Decimal, InvalidOperation
-from .models import ScrubFinding, Claim, MUE, NCCIEdit
+import hashlib
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
 
-def _add(claim, code, severity, message, line=None, suggestion=""):
-    ScrubFinding.objects.create(
-        claim=claim, code=code, severity=severity,
-        message=message, line=line, suggestion=suggestion
-    )
+from django.db import OperationalError, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ScrubFinding, Claim, ClaimFindingSummary
+from .edit_cache import EditTables, get_edit_tables
+from .scrub_rules import (
+    PROCESS_STATS, RuleStats, ScrubContext, _to_dec, claim_dos, required_needs, run_rules,
+)
+
+DEFAULT_CHUNK_SIZE = 500
+
+def load_coverages(patient_ids) -> Dict[int, object]:
+    """Latest Coverage per patient for a whole chunk in one query."""
+    from apps.patients.models import Coverage
+    out: Dict[int, object] = {}
+    rows = (Coverage.objects.filter(patient_id__in=set(patient_ids))
+            .order_by("patient_id", "-effective_date", "-id"))
+    for cov in rows:
+        out.setdefault(cov.patient_id, cov)
+    return out
+
+def evaluate_claim(claim: Claim, lines, tables: EditTables, diagnoses=(), coverage=None,
+                   stats: Optional[RuleStats] = None) -> List[ScrubFinding]:
+    """
+    Run the registered rules (see scrub_rules) against an already-loaded claim
+    and return unsaved ScrubFinding objects. `lines` is the claim's lines
+    (evaluated once); `stats` collects per-rule timing and hit counts.
+    """
+    out: List[ScrubFinding] = []
+
+    def add(code, severity, message, line=None, suggestion=""):
+        out.append(ScrubFinding(
+            claim=claim, code=code, severity=severity,
+            message=message, line=line, suggestion=suggestion
+        ))
+
+    ctx = ScrubContext(claim, lines=lines, diagnoses=diagnoses, coverage=coverage, tables=tables)
+    run_rules(ctx, add, stats)
+    return out
+
+def _norm_dec(x) -> str:
+    d = _to_dec(x)
+    return "" if d is None else str(d.normalize())
+
+def claim_fingerprint(claim: Claim, lines, diagnoses) -> str:
+    """Stable SHA-256 over everything the rules read: header, lines and diagnoses."""
+    dos = claim_dos(claim)
+    payload = {
+        "h": [claim.patient_id, claim.payer_name or "", claim.pos or "", _norm_dec(claim.total_charge),
+              claim.billing_provider_npi or "", claim.rendering_provider_npi or "", dos.isoformat()],
+        "l": sorted([ln.id, ln.cpt, list(ln.modifiers or []), _norm_dec(ln.units), _norm_dec(ln.charge)]
+                    for ln in lines),
+        "d": sorted([dx.order, dx.code] for dx in diagnoses),
+    }
+    raw = json.dumps(payload, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def mark_dirty(claim_ids: Iterable[int]) -> int:
+    """Flag claims for the next incremental rescrub."""
+    return Claim.objects.filter(id__in=list(claim_ids)).update(scrub_dirty=True)
+
+def _stamp(claim: Claim, fingerprint: str, version: int):
+    claim.scrub_fingerprint = fingerprint
+    claim.scrub_rule_version = version
+    claim.scrub_dirty = False
+    claim.scrubbed_at = timezone.now()
+
+STAMP_FIELDS = ["scrub_fingerprint", "scrub_rule_version", "scrub_dirty", "scrubbed_at"]
+
+def _finding_key(claim_id, code, line_id, message):
+    return (claim_id, code, line_id, message)
+
+def persist_findings(claim_ids: List[int], findings: List[ScrubFinding]) -> Dict[str, int]:
+    """
+    Diff freshly evaluated findings against the open rows of `claim_ids` by
+    (code, line, message): insert only new ones (first_seen = now) and stamp
+    resolved_at on ones that no longer fire. Unchanged rows are not touched.
+    Call inside a transaction.
+    """
+    now = timezone.now()
+    existing = {}
+    duplicates = []  # legacy repeats of an open key resolve too
+    open_rows = (ScrubFinding.objects
+                 .filter(claim_id__in=claim_ids, resolved_at__isnull=True)
+                 .values_list("id", "claim_id", "code", "line_id", "message"))
+    for fid, claim_id, code, line_id, message in open_rows:
+        key = _finding_key(claim_id, code, line_id, message)
+        if key in existing:
+            duplicates.append(fid)
+        else:
+            existing[key] = fid
 
-def _to_dec(x):
-    try:
-        return Decimal(str(x))
-    except InvalidOperation:
-        return None
+    fresh = {}
+    for f in findings:
+        key = _finding_key(f.claim_id, f.code, f.line_id, f.message)
+        if key not in existing and key not in fresh:
+            f.first_seen = now
+            fresh[key] = f
+    current = {_finding_key(f.claim_id, f.code, f.line_id, f.message) for f in findings}
+    to_resolve = [fid for key, fid in existing.items() if key not in current] + duplicates
+
+    if fresh:
+        ScrubFinding.objects.bulk_create(list(fresh.values()), batch_size=1000)
+    if to_resolve:
+        ScrubFinding.objects.filter(id__in=to_resolve).update(resolved_at=now)
+    refresh_summaries(claim_ids)
+    return {"inserted": len(fresh), "resolved": len(to_resolve)}
+
+SUMMARY_FIELDS = ["error_count", "warn_count", "error_codes", "warn_codes", "oldest_open", "updated_at"]
+
+def refresh_summaries(claim_ids: List[int]):
+    """Recompute ClaimFindingSummary rows for `claim_ids` from their open findings (one read, one upsert)."""
+    acc = {cid: {"ERROR": [], "WARN": [], "oldest": None} for cid in claim_ids}
+    rows = (ScrubFinding.objects
+            .filter(claim_id__in=claim_ids, resolved_at__isnull=True)
+            .values_list("claim_id", "severity", "code", "first_seen"))
+    for claim_id, severity, code, first_seen in rows:
+        s = acc[claim_id]
+        s.setdefault(severity, []).append(code)
+        if first_seen and (s["oldest"] is None or first_seen < s["oldest"]):
+            s["oldest"] = first_seen
+    now = timezone.now()
+    ClaimFindingSummary.objects.bulk_create(
+        [ClaimFindingSummary(
+            claim_id=cid,
+            error_count=len(s["ERROR"]), warn_count=len(s["WARN"]),
+            error_codes=ClaimFindingSummary.pack_codes(s["ERROR"]),
+            warn_codes=ClaimFindingSummary.pack_codes(s["WARN"]),
+            oldest_open=s["oldest"], updated_at=now,
+        ) for cid, s in acc.items()],
+        update_conflicts=True, unique_fields=["claim"], update_fields=SUMMARY_FIELDS,
+        batch_size=500,
+    )
 
 def run_scrubber(claim: Claim):
     """Starter rules + MUE/NCCI lookups."""
-    claim.findings.all().delete()
+    tables = get_edit_tables()
+    lines = list(claim.lines.all())
+    diagnoses = list(claim.diagnoses.all())
+    coverage = None
+    if "coverage" in required_needs():
+        coverage = load_coverages([claim.patient_id]).get(claim.patient_id)
+    stats = RuleStats()
+    findings = evaluate_claim(claim, lines, tables, diagnoses, coverage, stats)
+    PROCESS_STATS.merge(stats.rows)
+    _stamp(claim, claim_fingerprint(claim, lines, diagnoses), tables.version)
+    with transaction.atomic():
+        persist_findings([claim.pk], findings)
+        Claim.objects.filter(pk=claim.pk).update(**{f: getattr(claim, f) for f in STAMP_FIELDS})
+    return list(claim.findings.filter(resolved_at__isnull=True)
+                .values("code","severity","message","suggestion"))
+
+# --- Batch scrubbing ---
+
+def _chunks(seq: List[int], size: int):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+def _needs_scrub_q(version: int) -> Q:
+    return Q(scrub_dirty=True) | Q(scrub_rule_version__isnull=True) | ~Q(scrub_rule_version=version)
 
-    # R1: required payer
-    if not (claim.payer_name or "").strip():
-        _add(claim, "REQUIRED_PAYER_NAME", "ERROR", "Payer name is required on claim.")
+WRITE_RETRIES = 8
 
-    # R2: POS vs Office E/M mismatch (simple)
-    def _is_office_em(cpt: str):
+def _with_lock_retry(write, findings: List[ScrubFinding]):
+    """
+    Run a chunk's write transaction, retrying with backoff when SQLite reports
+    the database as locked (parallel workers contend for its single writer).
+    """
+    for attempt in range(WRITE_RETRIES):
         try:
-            n = int(cpt)
-            return 99202 <= n <= 99215
-        except Exception:
-            return False
-    if claim.pos != "11":  # 11 = Office
-        for ln in claim.lines.all():
-            if _is_office_em(ln.cpt):
-                _add(claim, "POS_CONFLICT", "ERROR",
-                     f"Office E/M {ln.cpt} cannot be used with POS {claim.pos}.",
-                     line=ln, suggestion="Use appropriate E/M code or correct POS.")
-
-    # R3: TOTAL_CHARGE > 0
-    total = _to_dec(claim.total_charge)
-    if total is None or total <= 0:
-        _add(claim, "TOTAL_CHARGE_ZERO", "WARN",
-             "Total charge is zero or invalid.", suggestion="Set a positive total_charge.")
-
-    # R4: MUE check (per code)
-    mue_map = {m.code: m.max_units for m in MUE.objects.all()}
-    for ln in claim.lines.all():
-        lim = mue_map.get(ln.cpt)
-        units = _to_dec(ln.units)
-        if lim is not None and units is not None and units > lim:
-            _add(claim, "MUE_EXCEEDED", "ERROR",
-                 f"Units {units} for {ln.cpt} exceed limit {lim}.",
-                 line=ln, suggestion=f"Reduce to <= {lim} or split per policy.")
-
-    # R5: NCCI mutual edits (same-claim pairs)
-    codes_on_claim = [ln.cpt for ln in claim.lines.all()]
-    pairs = list(NCCIEdit.objects.all().values("code_primary","code_secondary","edit_type"))
-    for p in pairs:
-        if p["code_primary"] in codes_on_claim and p["code_secondary"] in codes_on_claim:
-            _add(claim, "NCCI_PAIR", "ERROR",
-                 f"{p['code_primary']} conflicts with {p['code_secondary']} ({p['edit_type']}).",
-                 suggestion="Remove one code or apply appropriate modifier per policy.")
-
-    return list(claim.findings.values("code","severity","message","suggestion"))
+            return write()
+        except OperationalError as e:
+            if "locked" not in str(e) or attempt == WRITE_RETRIES - 1:
+                raise
+            for f in findings:  # rolled back: make them insertable again
+                f.pk = None
+                f._state.adding = True
+            time.sleep(0.05 * (2 ** attempt))
+
+def _scrub_chunk(ids: List[int], tables: EditTables, only_changed: bool = False,
+                 stats: Optional[RuleStats] = None) -> Dict[str, int]:
+    qs = Claim.objects.filter(id__in=ids)
+    if only_changed:
+        qs = qs.filter(_needs_scrub_q(tables.version))
+    # lines + diagnoses are always needed for the fingerprint
+    claims = list(qs.prefetch_related("lines", "diagnoses"))
+    coverages = {}
+    if claims and "coverage" in required_needs():
+        coverages = load_coverages(c.patient_id for c in claims)
+    findings: List[ScrubFinding] = []
+    scrubbed: List[Claim] = []
+    unchanged: List[int] = []
+    for c in claims:
+        lines = list(c.lines.all())
+        diagnoses = list(c.diagnoses.all())
+        fp = claim_fingerprint(c, lines, diagnoses)
+        if only_changed and c.scrub_fingerprint == fp and c.scrub_rule_version == tables.version:
+            unchanged.append(c.id)
+            continue
+        findings.extend(evaluate_claim(c, lines, tables, diagnoses, coverages.get(c.patient_id), stats))
+        _stamp(c, fp, tables.version)
+        scrubbed.append(c)
+    def write():
+        written = {"inserted": 0, "resolved": 0}
+        with transaction.atomic():
+            if scrubbed:
+                written = persist_findings([c.id for c in scrubbed], findings)
+                Claim.objects.bulk_update(scrubbed, STAMP_FIELDS, batch_size=500)
+            if unchanged:
+                Claim.objects.filter(id__in=unchanged).update(scrub_dirty=False)
+        return written
+
+    written = _with_lock_retry(write, findings)
+    return {"claims": len(scrubbed), "skipped": len(ids) - len(scrubbed), "findings": len(findings), **written}
+
+def _scrub_partition(ids: List[int], chunk_size: int, only_changed: bool = False) -> Dict[str, object]:
+    """Worker entry point: scrub one partition of claim ids chunk by chunk."""
+    tables = get_edit_tables()
+    stats = RuleStats()
+    totals = {"claims": 0, "skipped": 0, "findings": 0, "inserted": 0, "resolved": 0}
+    for chunk in _chunks(ids, chunk_size):
+        res = _scrub_chunk(chunk, tables, only_changed, stats)
+        for k in totals:
+            totals[k] += res[k]
+    totals["rules"] = stats.rows
+    return totals
+
+def _worker_init():
+    # Forked workers must not share the parent's DB connection.
+    connections.close_all()
+
+def scrub_claims(claims: Optional[Iterable] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 workers: int = 1, only_changed: bool = False, profile: bool = False) -> Dict[str, object]:
+    """
+    Scrub many claims in one pass.
+    - `claims` may be a Claim queryset, an iterable of ids, or None (all claims).
+    - Edit tables come from the shared edit cache, lines/diagnoses are prefetched per
+      chunk and findings are diffed against the open rows (see persist_findings).
+    - only_changed=True skips claims that are not dirty and whose fingerprint and
+      edit-table version match the last scrub.
+    - workers > 1 spreads contiguous id partitions over a process pool.
+    - per-rule stats always roll into PROCESS_STATS; profile=True also returns
+      this run's breakdown under "rules".
+    Returns {"claims", "skipped", "findings", "inserted", "resolved", "seconds", "claims_per_sec"}.
+    """
+    if claims is None:
+        claims = Claim.objects.all()
+    prefiltered = 0
+    if hasattr(claims, "values_list"):
+        if only_changed:
+            prefiltered = claims.count()
+            claims = claims.filter(_needs_scrub_q(get_edit_tables().version))
+        ids = list(claims.order_by("id").values_list("id", flat=True))
+        prefiltered -= len(ids) if only_changed else 0
+    else:
+        ids = sorted(int(i) for i in claims)
+    chunk_size = max(1, int(chunk_size))
+    workers = max(1, int(workers))
+
+    started = time.monotonic()
+    totals = {"claims": 0, "skipped": 0, "findings": 0, "inserted": 0, "resolved": 0}
+    run_stats = RuleStats()
+    if workers == 1 or len(ids) <= chunk_size:
+        res = _scrub_partition(ids, chunk_size, only_changed)
+        run_stats.merge(res.pop("rules"))
+        totals = res
+    else:
+        size = -(-len(ids) // workers)
+        parts = list(_chunks(ids, size))
+        get_edit_tables()  # warm the cache so forked workers inherit it
+        connections.close_all()
+        ctx = multiprocessing.get_context("fork")  # children inherit the configured Django app registry
+        with ProcessPoolExecutor(max_workers=len(parts), mp_context=ctx, initializer=_worker_init) as pool:
+            n = len(parts)
+            for res in pool.map(_scrub_partition, parts, [chunk_size] * n, [only_changed] * n):
+                run_stats.merge(res.pop("rules"))
+                for k in totals:
+                    totals[k] += res[k]
+    elapsed = time.monotonic() - started
+    PROCESS_STATS.merge(run_stats.rows)
+    result = {
+        "claims": totals["claims"],
+        "skipped": totals["skipped"] + prefiltered,
+        "findings": totals["findings"],
+        "inserted": totals["inserted"],
+        "resolved": totals["resolved"],
+        "seconds": round(elapsed, 3),
+        "claims_per_sec": round(totals["claims"] / elapsed, 1) if elapsed > 0 else float(totals["claims"]),
+    }
+    if profile:
+        result["rules"] = run_stats.as_list()
+    return result
@@ -0,0 +1,32 @@
+"""
+Line-at-a-time CSV / NDJSON encoders for streamed exports and reports.
+Both take an iterator of dict rows and yield str chunks, so they can feed a
+StreamingHttpResponse or a file without materialising the whole result.
+"""
+import csv
+import json
+from typing import Dict, Iterable, Iterator, List
+
+class _Echo:
+    """csv.writer target that hands back each formatted row instead of buffering it."""
+    def write(self, value):
+        return value
+
+def iter_csv(rows: Iterable[Dict], columns: List[str]) -> Iterator[str]:
+    w = csv.writer(_Echo())
+    yield w.writerow(columns)
+    for row in rows:
+        yield w.writerow([row.get(c, "") for c in columns])
+
+def iter_ndjson(rows: Iterable[Dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, default=str) + "\n"
+
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+def encode(rows: Iterable[Dict], fmt: str, columns: List[str]) -> Iterator[str]:
+    if fmt == "csv":
+        return iter_csv(rows, columns)
+    if fmt == "ndjson":
+        return iter_ndjson(rows)
+    raise ValueError(f"Unsupported format {fmt!r}")
@@ -0,0 +1,25 @@
+# apps/claims/tests/conftest.py
+from decimal import Decimal
+import pytest
+from apps.claims import edit_cache
+from apps.claims.models import Claim, ClaimLine, Diagnosis
+
+@pytest.fixture(autouse=True)
+def _fresh_edit_cache():
+    edit_cache.invalidate()
+    yield
+    edit_cache.invalidate()
+
+@pytest.fixture
+def make_claim():
+    """Factory: a claim with one R51.9 diagnosis and a $50 line per (cpt, units) in `lines`."""
+    def make(payer="PAYER A", pos="11", total=100, status="READY", lines=()):
+        c = Claim.objects.create(
+            patient_id=1, payer_name=payer, billing_provider_npi="1234567890",
+            rendering_provider_npi="1234567890", pos=pos, status=status, total_charge=total,
+        )
+        Diagnosis.objects.create(claim=c, code="R51.9", order=1)
+        for cpt, units in lines:
+            ClaimLine.objects.create(claim=c, cpt=cpt, units=units, charge=Decimal("50.00"), diagnosis_pointers=[1])
+        return c
+    return make
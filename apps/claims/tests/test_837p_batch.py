@@ -0,0 +1,91 @@
+# apps/claims/tests/test_837p_batch.py
+import io
+from datetime import date
+from decimal import Decimal
+from apps.claims import control_numbers
+from apps.claims.models import Claim, ClaimLine, Diagnosis, EdiExport
+from apps.claims.x12_837p import build_837p_batch, write_837p_batch
+from apps.patients.models import Patient
+
+def _claim(patient, npi="1111111111", payer="PAYER A"):
+    c = Claim.objects.create(
+        patient_id=patient.id, payer_name=payer, billing_provider_npi=npi,
+        rendering_provider_npi=npi, pos="11", status="READY", total_charge=50,
+    )
+    Diagnosis.objects.create(claim=c, code="R51.9", order=1)
+    ClaimLine.objects.create(claim=c, cpt="99213", units=1, charge=Decimal("50.00"), diagnosis_pointers=[1])
+    return c
+
+def _patient(last):
+    return Patient.objects.create(first_name="A", last_name=last, date_of_birth=date(1980, 1, 1))
+
+def test_allocate_is_monotonic_blocks(db):
+    assert control_numbers.allocate("ISA", 3) == [1, 2, 3]
+    assert control_numbers.allocate("ISA") == [4]
+    assert control_numbers.allocate("GS", 2) == [1, 2]
+
+def test_batch_groups_and_limits(db):
+    p1, p2 = _patient("ONE"), _patient("TWO")
+    a = [_claim(p1), _claim(p1), _claim(p2)]
+    b = [_claim(p2, npi="2222222222")]
+    c = [_claim(p1, payer="PAYER B")]
+
+    ics = build_837p_batch(Claim.objects.all(), per_st=2, per_file=3)
+    assert sorted(cid for ic in ics for cid in ic.claim_ids) == sorted(x.id for x in a + b + c)
+    assert all(len(ic.claim_ids) <= 3 for ic in ics)
+    assert len({ic.isa_control for ic in ics}) == len(ics)
+
+    for ic in ics:
+        segs = ic.segments
+        assert segs[0].split("*")[13] == ic.isa_control
+        assert segs[-1] == f"IEA*1*{ic.isa_control}~"
+        sts = [s for s in segs if s.startswith("ST*")]
+        assert segs[-2] == f"GE*{len(sts)}*{ic.gs_control}~"
+        # each ST: at most 2 claims, one billing provider, SE count matches
+        start = None
+        for i, s in enumerate(segs):
+            if s.startswith("ST*"):
+                start = i
+            elif s.startswith("SE*"):
+                body = segs[start:i + 1]
+                assert int(s.split("*")[1]) == len(body)
+                assert s.split("*")[2].rstrip("~") == body[0].split("*")[2]
+                assert sum(x.startswith("CLM*") for x in body) <= 2
+                assert sum(x.startswith("HL*") and x.split("*")[3] == "20" for x in body) == 1
+
+    # the two claims for p1 under PAYER A/npi 1111 share one subscriber HL
+    first_set = ics[0].segments
+    assert sum(s.startswith("HL*") and "*22*" in s for s in first_set[:first_set.index(
+        next(s for s in first_set if s.startswith("SE*")))]) == 1
+
+def test_write_batch_records_control_numbers(db, tmp_path):
+    p = _patient("ONE")
+    claims = [_claim(p), _claim(p)]
+    exports = write_837p_batch([c.id for c in claims], outdir=str(tmp_path))
+    assert len(exports) == 2
+    rows = list(EdiExport.objects.values_list("interchange_id", "functional_id", "file_path").distinct())
+    assert len(rows) == 1
+    isa, gs, path = rows[0]
+    assert isa == "000000001" and gs == "1"
+    exp = exports[0]
+    assert exp.size_bytes == len(open(path, "rb").read())
+    assert open(path).read().startswith("ISA*")
+
+def test_write_segments_hashes_while_streaming(tmp_path):
+    import hashlib
+    from apps.claims.x12_837p import write_segments
+    path = str(tmp_path / "out" / "x.txt")
+    res = write_segments(path, (f"SEG*{i}~" for i in range(1000)))
+    raw = open(path, "rb").read()
+    assert (res.sha256, res.size, res.segments) == (hashlib.sha256(raw).hexdigest(), len(raw), 1000)
+    assert raw.startswith(b"SEG*0~\nSEG*1~") and not raw.endswith(b"\n")
+    assert [p.name for p in (tmp_path / "out").iterdir()] == ["x.txt"]
+
+def test_export_command_scrubs_unchecked_claims_first(db, tmp_path):
+    from django.core.management import call_command
+    p = _patient("ONE")
+    good, bad = _claim(p), _claim(p, payer="")
+    call_command("export_837p", "--out-dir", str(tmp_path), stdout=io.StringIO())
+    assert list(EdiExport.objects.values_list("claim_id", flat=True)) == [good.id]
+    bad.refresh_from_db()
+    assert bad.finding_summary.error_count > 0
@@ -0,0 +1,56 @@
+# apps/claims/tests/test_autofix_bulk.py
+import json
+from decimal import Decimal
+import pytest
+from apps.claims import edit_cache
+from apps.claims.autofix import iter_autofix
+from apps.claims.models import AutoFixAudit, Claim, ClaimLine, MUE, NCCIEdit, ScrubFinding
+
+@pytest.fixture
+def claims(db, make_claim):
+    MUE.objects.create(code="97110", max_units=4)
+    NCCIEdit.objects.create(code_primary="97140", code_secondary="97530", edit_type="PAIR")
+    edit_cache.bump_version()
+    c1 = make_claim(lines=[("97110", 6), ("97140", 1), ("97530", 1)])
+    c2 = make_claim(pos="21", total=0, lines=[("99213", 1)])
+    c3 = make_claim(lines=[("97110", 1)])
+    return c1, c2, c3
+
+def test_dry_run_reports_without_writing(db, claims):
+    c1, c2, c3 = claims
+    rows = list(iter_autofix(Claim.objects.all(), chunk_size=2))
+    assert {r["claim_id"] for r in rows} == {c1.id, c2.id}
+    assert {r["reason"].split()[0] for r in rows} == {"MUE_EXCEEDED", "NCCI_PAIR", "POS_CONFLICT", "TOTAL_CHARGE_ZERO"}
+    assert not any(r["applied"] for r in rows)
+    assert ClaimLine.objects.count() == 5
+    assert not AutoFixAudit.objects.exists()
+
+def test_apply_bulk_writes_and_rescrubs(db, claims):
+    c1, c2, c3 = claims
+    rows = list(iter_autofix(Claim.objects.all(), apply=True, chunk_size=2))
+    assert rows and all(r["applied"] for r in rows)
+
+    assert ClaimLine.objects.get(claim=c1, cpt="97110").units == 4
+    assert not ClaimLine.objects.filter(claim=c1, cpt="97530").exists()
+    c2.refresh_from_db()
+    assert (c2.pos, c2.total_charge) == ("11", Decimal("50.00"))
+    assert AutoFixAudit.objects.filter(action="apply").count() == 2
+    assert not ScrubFinding.objects.filter(claim__in=[c1, c2, c3], resolved_at__isnull=True).exists()
+
+def test_autofix_endpoint_streams_ndjson(db, client, claims):
+    c1, _c2, _c3 = claims
+    resp = client.get(f"/api/claims/autofix/?format=ndjson&ids={c1.id}")
+    assert resp.status_code == 200
+    assert resp["Content-Type"].startswith("application/x-ndjson")
+    rows = [json.loads(x) for x in b"".join(resp.streaming_content).decode().splitlines()]
+    assert {r["claim_id"] for r in rows} == {c1.id}
+
+def test_autofix_post_applies_before_responding(db, client, claims):
+    c1, c2, _c3 = claims
+    assert client.post("/api/claims/autofix/").status_code == 400
+    resp = client.post(f"/api/claims/autofix/?ids={c1.id},{c2.id}")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["claims_changed"] == 2 and body["applied"] == body["changes"]
+    assert set(body["by_reason"]) == {"MUE_EXCEEDED", "NCCI_PAIR", "POS_CONFLICT", "TOTAL_CHARGE_ZERO"}
+    assert AutoFixAudit.objects.filter(action="apply").count() == 2
@@ -0,0 +1,90 @@
+# apps/claims/tests/test_csv_import.py
+import csv
+from decimal import Decimal
+from unittest import mock
+import pytest
+from apps.claims import csv_import
+from apps.claims.models import Claim, ClaimCsvImport, ClaimLine, Diagnosis
+
+HEADER = "patient_id,payer_name,pos,total_charge,dx_list,lines\n"
+
+def _csv(tmp_path, n, bad=()):
+    rows = []
+    for i in range(1, n + 1):
+        if i in bad:
+            rows.append(f"x{i},Sample Health,11,10,E11.9,99213|1|10\n")
+        else:
+            rows.append(f"{i},Sample Health,11,230.00,E11.9|I10,99214|1|150;96372|4|80\n")
+    path = tmp_path / "claims.csv"
+    path.write_text(HEADER + "".join(rows))
+    return str(path)
+
+def test_import_batches_and_reports_errors(db, tmp_path):
+    path = _csv(tmp_path, 7, bad={3})
+    run = csv_import.import_claims_csv(path, batch_size=2)
+    assert (run.imported, run.rejected, run.last_row) == (6, 1, 7)
+    assert run.completed_at is not None
+    assert (Claim.objects.count(), Diagnosis.objects.count(), ClaimLine.objects.count()) == (6, 12, 12)
+    errors = list(csv.DictReader(open(run.error_path)))
+    assert [(e["row"], e["error"]) for e in errors] == [("3", "invalid patient_id")]
+
+def test_resume_continues_after_last_commit(db, tmp_path):
+    path = _csv(tmp_path, 6)
+    real = csv_import._write_batch
+    calls = {"n": 0}
+
+    def crash_on_second(*a, **kw):
+        calls["n"] += 1
+        if calls["n"] == 2:
+            raise RuntimeError("killed")
+        return real(*a, **kw)
+
+    with mock.patch.object(csv_import, "_write_batch", crash_on_second), pytest.raises(RuntimeError):
+        csv_import.import_claims_csv(path, batch_size=2)
+    assert ClaimCsvImport.objects.get().last_row == 2
+
+    run = csv_import.import_claims_csv(path, batch_size=2, resume=True)
+    assert (run.imported, run.last_row) == (6, 6)
+    assert sorted(Claim.objects.values_list("patient_id", flat=True)) == [1, 2, 3, 4, 5, 6]
+
+def test_resume_does_not_repeat_error_rows(db, tmp_path):
+    path = _csv(tmp_path, 6, bad={3, 5})
+    real = csv_import._write_batch
+    calls = {"n": 0}
+
+    def crash_on_second(*a, **kw):
+        calls["n"] += 1
+        if calls["n"] == 2:
+            raise RuntimeError("killed")
+        return real(*a, **kw)
+
+    with mock.patch.object(csv_import, "_write_batch", crash_on_second), pytest.raises(RuntimeError):
+        csv_import.import_claims_csv(path, batch_size=2)
+    run = csv_import.import_claims_csv(path, batch_size=2, resume=True)
+    assert (run.imported, run.rejected) == (4, 2)
+    errors = list(csv.DictReader(open(run.error_path)))
+    assert [e["row"] for e in errors] == ["3", "5"]
+
+def test_bad_values_are_rejected_rows(db, tmp_path):
+    path = tmp_path / "claims.csv"
+    path.write_text(HEADER +
+                    "1,Sample Health,11,NaN,E11.9,99213|1|10\n"
+                    "2,Sample Health,11,abc,E11.9,99213|1|10\n"
+                    "3,Sample Health,11,100000000,E11.9,99213|1|10\n"
+                    "4,Sample Health,11,10,E11.9,99213|100000|10\n"
+                    "5,Sample Health,11,10,E11.9123456,99213|1|10\n"
+                    "6,Sample Health,11,,E11.9,99213||10.005\n")
+    run = csv_import.import_claims_csv(str(path), batch_size=10)
+    assert (run.imported, run.rejected) == (1, 5)
+    errors = [e["error"] for e in csv.DictReader(open(run.error_path))]
+    assert errors[:3] == ["invalid total_charge 'NaN'", "invalid total_charge 'abc'",
+                          "total_charge out of range '100000000'"]
+    line = ClaimLine.objects.get()
+    assert (line.claim.total_charge, line.units, line.charge) == (0, 1, Decimal("10.01"))
+
+def test_resume_of_completed_file_imports_nothing(db, tmp_path):
+    path = _csv(tmp_path, 1)
+    first = csv_import.import_claims_csv(path)
+    again = csv_import.import_claims_csv(path, resume=True)
+    assert again.id == first.id and again.imported == 1
+    assert Claim.objects.count() == 1
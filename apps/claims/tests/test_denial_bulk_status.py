@@ -0,0 +1,35 @@
+# apps/claims/tests/test_denial_bulk_status.py
+from decimal import Decimal
+from rest_framework.test import APIClient
+from apps.claims import denial_rollup
+from apps.claims.models import Claim, Denial, DenialRollup, DenialStatusHistory
+
+URL = "/api/claims/denials/bulk-status/"
+
+def _denial(carc, status="OPEN"):
+    c = Claim.objects.create(patient_id=1, payer_name="ACME", billing_provider_npi="1", rendering_provider_npi="1",
+                             pos="11", status="DENIED")
+    d = Denial.objects.create(claim=c, carc_code=carc, status=status, amount=Decimal("10"))
+    denial_rollup.record_created([d])
+    return d
+
+def test_bulk_close_by_ids_reports_outcomes(db):
+    a, b = _denial("CO-45"), _denial("CO-45", status="WORKING")
+    done = _denial("CO-45", status="CLOSED")
+    resp = APIClient().post(URL, {"status": "CLOSED", "note": "write-off", "ids": [a.id, b.id, done.id, 999999]},
+                            format="json")
+    assert resp.status_code == 200
+    outcomes = {r["id"]: r["outcome"] for r in resp.json()["results"]}
+    assert outcomes == {a.id: "updated", b.id: "updated", done.id: "unchanged", 999999: "not_found"}
+    assert set(Denial.objects.filter(id__in=[a.id, b.id]).values_list("status", flat=True)) == {"CLOSED"}
+    assert not Denial.objects.filter(id=a.id, closed_at__isnull=True).exists()
+    assert DenialStatusHistory.objects.filter(note="write-off").count() == 2
+    assert DenialRollup.objects.get(carc_code="CO-45", status="CLOSED").count == 3
+
+def test_bulk_by_filter_rejects_invalid_transitions(db):
+    _denial("CO-45", status="CLOSED")
+    other = _denial("CO-97")
+    resp = APIClient().post(URL, {"status": "WORKING", "filter": {"carc": "CO-45"}}, format="json")
+    assert resp.json()["counts"] == {"invalid_transition": 1}
+    assert Denial.objects.get(id=other.id).status == "OPEN"
+    assert APIClient().post(URL, {"status": "CLOSED", "filter": {}}, format="json").status_code == 400
@@ -0,0 +1,45 @@
+# apps/claims/tests/test_denial_rollup.py
+from decimal import Decimal
+from rest_framework.test import APIClient
+from apps.claims import denial_rollup
+from apps.claims.denials import set_status
+from apps.claims.models import Claim, Denial, DenialRollup
+
+def _denial(payer, carc, amount):
+    c = Claim.objects.create(patient_id=1, payer_name=payer, billing_provider_npi="1", rendering_provider_npi="1",
+                             pos="11", status="DENIED")
+    d = Denial.objects.create(claim=c, carc_code=carc, amount=Decimal(amount))
+    denial_rollup.record_created([d])
+    return d
+
+def _snapshot():
+    return sorted(DenialRollup.objects.filter(count__gt=0)
+                  .values_list("payer", "carc_code", "status", "count", "amount", "close_seconds"))
+
+def test_incremental_matches_rebuild(db):
+    a = _denial("ACME", "CO-50", "100")
+    _denial("ACME", "CO-50", "40")
+    b = _denial("ZEN", "CO-97", "25")
+    set_status(a, "WORKING")
+    set_status(a, "CLOSED")
+    set_status(b, "CLOSED")
+    set_status(b, "OPEN")   # reopened
+
+    incremental = _snapshot()
+    assert [r[:5] for r in incremental] == [
+        ("ACME", "CO-50", "CLOSED", 1, Decimal("100")),
+        ("ACME", "CO-50", "OPEN", 1, Decimal("40")),
+        ("ZEN", "CO-97", "OPEN", 1, Decimal("25")),
+    ]
+    denial_rollup.rebuild()
+    assert _snapshot() == incremental
+
+def test_rollup_endpoint(db):
+    _denial("ACME", "CO-50", "100")
+    _denial("ACME", "CO-50", "40")
+    _denial("ACME", "CO-45", "5")
+    resp = APIClient().get("/api/claims/denials/rollup/", {"group_by": "payer,carc_code", "status": "OPEN"})
+    assert resp.status_code == 200
+    top = resp.json()["results"][0]
+    assert (top["payer"], top["carc_code"], top["count"], top["amount"]) == ("ACME", "CO-50", 2, "140.00")
+    assert APIClient().get("/api/claims/denials/rollup/", {"group_by": "nope"}).status_code == 400
@@ -0,0 +1,54 @@
+# apps/claims/tests/test_edi_spool.py
+import os
+from apps.claims import edi_spool
+from apps.claims.edi_transport import OutboxTransport, TransportError
+from apps.claims.models import Claim, EdiExport
+
+def _export(tmp_path, name, claims=2):
+    path = tmp_path / name
+    path.write_text("ISA*...~")
+    for _ in range(claims):
+        c = Claim.objects.create(patient_id=1, payer_name="P", billing_provider_npi="1", rendering_provider_npi="1",
+                                 pos="11", status="READY")
+        EdiExport.objects.create(claim=c, file_path=str(path), sha256="x", status="QUEUED")
+    return str(path)
+
+class _Flaky:
+    def __init__(self, bad):
+        self.bad, self.sent = bad, []
+
+    def send(self, path):
+        if path == self.bad:
+            raise TransportError("connection reset")
+        self.sent.append(path)
+        return path
+
+def test_batch_sends_per_file_and_backs_off(db, tmp_path):
+    good = _export(tmp_path, "a.txt")
+    bad = _export(tmp_path, "b.txt")
+    transport = _Flaky(bad)
+
+    res = edi_spool.run_batch("w1", transport=transport, max_attempts=2)
+    assert res == {"files": 2, "sent": 2, "retry": 2, "failed": 0}
+    assert transport.sent == [good]
+    assert set(Claim.objects.filter(edi_exports__file_path=good).values_list("status", flat=True)) == {"SENT"}
+    retry = EdiExport.objects.filter(file_path=bad)
+    assert {(e.status, e.attempts, e.locked_by) for e in retry} == {("QUEUED", 1, "")}
+    assert all(e.next_attempt_at is not None for e in retry)
+
+    # not due yet -> nothing leased; once due, the second failure is final
+    assert edi_spool.run_batch("w1", transport=transport, max_attempts=2)["files"] == 0
+    retry.update(next_attempt_at=None)
+    assert edi_spool.run_batch("w1", transport=transport, max_attempts=2)["failed"] == 2
+    assert edi_spool.metrics()["failed"] == 2
+
+def test_leases_are_exclusive(db, tmp_path):
+    _export(tmp_path, "a.txt")
+    assert list(edi_spool.lease("w1")) and not edi_spool.lease("w2")
+
+def test_outbox_transport_copies_atomically(tmp_path):
+    src = tmp_path / "f.txt"
+    src.write_text("data")
+    dest = OutboxTransport(str(tmp_path / "out")).send(str(src))
+    assert open(dest).read() == "data"
+    assert os.listdir(tmp_path / "out") == ["f.txt"]
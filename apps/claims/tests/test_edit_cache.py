@@ -0,0 +1,26 @@
+# apps/claims/tests/test_edit_cache.py
+from apps.claims import edit_cache
+from apps.claims.models import MUE, NCCIEdit
+
+def test_pairs_for_only_returns_edits_present_on_claim(db):
+    NCCIEdit.objects.create(code_primary="99214", code_secondary="99215", edit_type="PAIR")
+    NCCIEdit.objects.create(code_primary="99214", code_secondary="36415", edit_type="PAIR")
+    NCCIEdit.objects.create(code_primary="A0425", code_secondary="G0008", edit_type="MUTEX")
+    tables = edit_cache.get_edit_tables()
+    assert list(tables.pairs_for(["99215", "99214", "99214"])) == [("99214", "99215", "PAIR")]
+    assert list(tables.pairs_for(["G0008", "A0425", "36415"])) == [("A0425", "G0008", "MUTEX")]
+    assert list(tables.pairs_for(["36415"])) == []
+
+def test_version_bump_drops_stale_cache(db):
+    MUE.objects.create(code="96372", max_units=3)
+    first = edit_cache.get_edit_tables()
+    assert first.mue_limit("96372") == 3
+
+    MUE.objects.filter(code="96372").update(max_units=2)
+    assert edit_cache.get_edit_tables() is first  # same version -> cached copy
+
+    version = edit_cache.bump_version(note="test")
+    fresh = edit_cache.get_edit_tables()
+    assert fresh is not first
+    assert fresh.version == version
+    assert fresh.mue_limit("96372") == 2
@@ -0,0 +1,49 @@
+# apps/claims/tests/test_era_835.py
+from decimal import Decimal
+from apps.claims.models import Adjustment, Claim, ClaimLine, Denial, EraImport, Payment
+from apps.claims.x12_835 import post_era
+
+ISA = "ISA*00*          *00*          *ZZ*PAYER          *ZZ*SENDERID       *250701*1200*^*00501*000000123*0*P*:~"
+
+def _claim(lines):
+    c = Claim.objects.create(patient_id=1, payer_name="ACME", billing_provider_npi="1234567890",
+                             rendering_provider_npi="1234567890", pos="11", status="SENT", total_charge=200)
+    for cpt in lines:
+        ClaimLine.objects.create(claim=c, cpt=cpt, units=1, charge=Decimal("100.00"), diagnosis_pointers=[1])
+    return c
+
+def _write(tmp_path, paid, denied):
+    segs = [
+        ISA, "GS*HP*PAYER*SENDERID*20250701*1200*1*X*005010X221A1", "ST*835*0001",
+        "BPR*I*80*C*ACH*CCP*01*999*DA*123*1512345678**01*999*DA*456*20250705",
+        "TRN*1*CHK1001*1512345678", "N1*PR*ACME HEALTH", "LX*1",
+        f"CLP*{paid.id}*1*200*80**12*PCN1", "CAS*PR*1*20",
+        "SVC*HC:99213*100*80**1", "DTM*472*20250601", "CAS*CO*45*20",
+        "SVC*HC:97110*100*0**1", "CAS*CO*97*100", "LQ*HE*N130",
+        f"CLP*{denied.id}*4*100*0**12*PCN2", "CAS*CO*50*100",
+        "CLP*999999*1*10*10**12*PCN3",
+        "SE*17*0001", "GE*1*1", "IEA*1*000000123",
+    ]
+    path = tmp_path / "remit.835"
+    path.write_text("~\n".join(s.rstrip("~") for s in segs) + "~\n")
+    return str(path)
+
+def test_post_era_posts_and_is_idempotent(db, tmp_path):
+    paid = _claim(["99213", "97110"])
+    denied = _claim(["99214"])
+    path = _write(tmp_path, paid, denied)
+
+    era, created = post_era(path, chunk_size=1)
+    assert created and era.status == "POSTED"
+    assert era.stats == {"claims": 2, "unmatched": 1, "payments": 1, "adjustments": 4, "denials": 2}
+
+    pay = Payment.objects.get()
+    assert (pay.claim_id, pay.line.cpt, pay.amount, str(pay.date)) == (paid.id, "99213", Decimal("80"), "2025-07-05")
+    adj = Adjustment.objects.get(carc_code="CO-97")
+    assert (adj.line.cpt, adj.rarc_code) == ("97110", "N130")
+    assert set(Denial.objects.values_list("claim_id", "carc_code")) == {(paid.id, "CO-97"), (denied.id, "CO-50")}
+    assert Claim.objects.get(id=denied.id).status == "DENIED"
+
+    again, created = post_era(path)
+    assert not created and again.id == era.id
+    assert EraImport.objects.count() == 1 and Payment.objects.count() == 1
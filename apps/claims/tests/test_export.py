@@ -37,10 +37,32 @@ def test_denials_export_csv(db):
     assert resp.status_code == 200
     assert resp["Content-Type"].startswith("text/csv")
 
-    content = resp.content.decode()
+    content = b"".join(resp.streaming_content).decode()
     rows = list(csv.reader(StringIO(content)))
     assert rows[0] == ["id", "claim_id", "status", "reason", "created_at"]
     # check our two denials are present
     body = "\n".join(",".join(r) for r in rows[1:])
     assert str(d1.id) in body
     assert str(d2.id) in body
+
+def test_denials_export_ndjson_filters(db):
+    import json
+    c1 = Claim.objects.create(patient_id=1, payer_name="PAYER A", billing_provider_npi="1234567890",
+                              rendering_provider_npi="1234567890", pos="11", status="DRAFT", total_charge=0)
+    c2 = Claim.objects.create(patient_id=2, payer_name="PAYER B", billing_provider_npi="1234567890",
+                              rendering_provider_npi="1234567890", pos="11", status="DRAFT", total_charge=0)
+    keep = Denial.objects.create(claim=c1, status="OPEN", carc_code="CO-50")
+    Denial.objects.create(claim=c1, status="CLOSED", carc_code="CO-50")
+    Denial.objects.create(claim=c2, status="OPEN", carc_code="CO-50")
+    Denial.objects.create(claim=c1, status="OPEN", carc_code="CO-45")
+
+    resp = APIClient().get(reverse("denial-export"), {
+        "format": "ndjson", "status": "open,working", "carc": "co-50", "payer": "payer a",
+        "columns": "id,carc_code,payer_name",
+    })
+    assert resp.status_code == 200
+    assert resp["Content-Type"].startswith("application/x-ndjson")
+    rows = [json.loads(x) for x in b"".join(resp.streaming_content).decode().splitlines()]
+    assert rows == [{"id": keep.id, "carc_code": "CO-50", "payer_name": "PAYER A"}]
+
+    assert APIClient().get(reverse("denial-export"), {"created_from": "2025-13-01"}).status_code == 400
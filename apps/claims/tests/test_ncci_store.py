@@ -0,0 +1,71 @@
+# apps/claims/tests/test_ncci_store.py
+from datetime import date
+from decimal import Decimal
+from apps.claims import edit_cache, ncci_store
+from apps.claims.models import Claim, ClaimLine
+from apps.claims.scrubber import run_scrubber
+
+PTP_TXT = (
+    "CPT only copyright 2024 American Medical Association\n"
+    "Column 1\tColumn 2\t*=in existence prior to 1996\tEffective Date\tDeletion Date\tModifier\tPTP Edit Rationale\n"
+    "99214\t36415\t\t20240101\t*\t0\tMisuse of column two code\n"
+    "97140\t97530\t\t20200101\t20250101\t1\tMutually exclusive procedures\n"
+    "97140\t97530\t\t20250401\t*\t1\tMutually exclusive procedures\n"
+)
+MUE_CSV = (
+    '"HCPCS/CPT Code","Practitioner Services MUE Values","MUE Adjudication Indicator","MUE Rationale"\n'
+    '"96372","3","3 Date of Service Edit: Clinical","Clinical: Data"\n'
+    '"J1885","8","3 Date of Service Edit: Clinical","Clinical: Data"\n'
+)
+
+def _compile(tmp_path, quarter):
+    (tmp_path / "ptp.txt").write_text(PTP_TXT)
+    (tmp_path / "mue.csv").write_text(MUE_CSV)
+    ncci_store.compile_ptp([str(tmp_path / "ptp.txt")], quarter, str(tmp_path))
+    ncci_store.compile_mue([str(tmp_path / "mue.csv")], quarter, str(tmp_path))
+
+def test_compiled_ptp_respects_effective_and_deletion_dates(tmp_path):
+    _compile(tmp_path, "2025Q2")
+    ptp = ncci_store.PtpTable(str(tmp_path / "ptp_2025Q2.bin"))
+    assert ptp.count == 3
+    assert ptp.lookup("99214", "36415", date(2025, 5, 1)) == 0
+    assert ptp.lookup("36415", "99214", date(2025, 5, 1)) is None
+    assert ptp.lookup("97140", "97530", date(2024, 6, 1)) == 1
+    assert ptp.lookup("97140", "97530", date(2025, 2, 1)) is None   # deleted, not yet re-added
+    assert ptp.lookup("97140", "97530", date(2025, 4, 1)) == 1
+    assert list(ptp.edits_for(["36415", "99214", "11111"], date(2025, 5, 1))) == [("99214", "36415", 0)]
+
+    mue = ncci_store.MueTable(str(tmp_path / "mue_2025Q2.bin"))
+    assert mue.limit("96372") == 3
+    assert mue.limit("J1885") == 8
+    assert mue.limit("99999") is None
+
+def test_edition_set_picks_quarter_for_date_of_service(tmp_path):
+    _compile(tmp_path, "2025Q1")
+    _compile(tmp_path, "2025Q3")
+    editions = ncci_store.load_editions(str(tmp_path))
+    assert editions.for_date(date(2024, 12, 31)) is None
+    assert editions.for_date(date(2025, 2, 14)).quarter == "2025Q1"
+    assert editions.for_date(date(2025, 5, 1)).quarter == "2025Q1"
+    assert editions.for_date(date(2025, 8, 1)).quarter == "2025Q3"
+    assert editions.for_date(date(2026, 1, 5)).quarter == "2025Q3"
+
+def test_scrubber_uses_compiled_edition(tmp_path, settings, db):
+    quarter = f"{date.today().year}Q{(date.today().month - 1) // 3 + 1}"
+    _compile(tmp_path, quarter)
+    settings.NCCI_EDITIONS_DIR = str(tmp_path)
+    edit_cache.invalidate()
+    try:
+        c = Claim.objects.create(
+            patient_id=1, payer_name="PAYER A", billing_provider_npi="1234567890",
+            rendering_provider_npi="1234567890", pos="11", status="READY", total_charge=100,
+        )
+        ClaimLine.objects.create(claim=c, cpt="99214", units=1, charge=Decimal("90"))
+        ClaimLine.objects.create(claim=c, cpt="36415", units=1, charge=Decimal("10"))
+        ClaimLine.objects.create(claim=c, cpt="96372", units=4, charge=Decimal("10"))
+        ClaimLine.objects.create(claim=c, cpt="97140", units=1, charge=Decimal("10"))
+        ClaimLine.objects.create(claim=c, cpt="97530", units=1, modifiers=["59"], charge=Decimal("10"))
+        codes = sorted(f["code"] for f in run_scrubber(c))
+        assert codes == ["MUE_EXCEEDED", "NCCI_PAIR"]
+    finally:
+        edit_cache.invalidate()
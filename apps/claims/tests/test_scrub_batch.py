@@ -0,0 +1,99 @@
+# apps/claims/tests/test_scrub_batch.py
+from apps.claims import edit_cache
+from apps.claims.models import Claim, ClaimLine, MUE, NCCIEdit, ScrubFinding
+from apps.claims.scrubber import run_scrubber, scrub_claims
+
+def test_scrub_claims_matches_single_claim_scrubber(db, make_claim):
+    MUE.objects.create(code="97110", max_units=4)
+    NCCIEdit.objects.create(code_primary="97140", code_secondary="97530", edit_type="PAIR")
+    edit_cache.bump_version()
+    c1 = make_claim(lines=[("97110", 6), ("97140", 1), ("97530", 1)])
+    c2 = make_claim(payer="", pos="21", total=0, lines=[("99213", 1)])
+    c3 = make_claim(lines=[("97110", 1)])
+
+    expected = {}
+    for c in (c1, c2, c3):
+        expected[c.id] = sorted(f["code"] for f in run_scrubber(c))
+
+    stats = scrub_claims(Claim.objects.all(), chunk_size=2)
+    assert stats["claims"] == 3
+    assert stats["findings"] == sum(len(v) for v in expected.values())
+    for cid, codes in expected.items():
+        got = sorted(ScrubFinding.objects.filter(claim_id=cid, resolved_at__isnull=True)
+                     .values_list("code", flat=True))
+        assert got == codes
+    assert expected[c1.id] == ["MUE_EXCEEDED", "NCCI_PAIR"]
+    assert expected[c2.id] == ["POS_CONFLICT", "REQUIRED_PAYER_NAME", "TOTAL_CHARGE_ZERO"]
+    assert expected[c3.id] == []
+
+def test_scrub_claims_resolves_stale_findings(db, make_claim):
+    c = make_claim(lines=[("97110", 1)])
+    stale = ScrubFinding.objects.create(claim=c, code="STALE", severity="ERROR", message="old")
+    res = scrub_claims([c.id])
+    assert (res["inserted"], res["resolved"]) == (0, 1)
+    stale.refresh_from_db()
+    assert stale.resolved_at is not None
+    assert not ScrubFinding.objects.filter(claim=c, resolved_at__isnull=True).exists()
+
+def test_rescrub_keeps_unchanged_findings_and_first_seen(db, make_claim):
+    c = make_claim(payer="", total=0, lines=[("97110", 1)])
+    run_scrubber(c)
+    before = {f.code: (f.id, f.first_seen) for f in ScrubFinding.objects.filter(claim=c)}
+    assert set(before) == {"REQUIRED_PAYER_NAME", "TOTAL_CHARGE_ZERO"}
+
+    Claim.objects.filter(id=c.id).update(payer_name="PAYER A")
+    res = scrub_claims([c.id])
+    assert (res["inserted"], res["resolved"]) == (0, 1)
+    still_open = ScrubFinding.objects.get(claim=c, resolved_at__isnull=True)
+    assert still_open.code == "TOTAL_CHARGE_ZERO"
+    assert (still_open.id, still_open.first_seen) == before["TOTAL_CHARGE_ZERO"]
+    assert ScrubFinding.objects.get(id=before["REQUIRED_PAYER_NAME"][0]).resolved_at is not None
+
+def test_only_changed_skips_claims_with_same_fingerprint(db, make_claim):
+    c1 = make_claim(lines=[("97110", 1)])
+    c2 = make_claim(lines=[("97110", 1)])
+    first = scrub_claims(Claim.objects.all())
+    assert first["claims"] == 2
+
+    again = scrub_claims(Claim.objects.all(), only_changed=True)
+    assert (again["claims"], again["skipped"]) == (0, 2)
+
+    # a dirty flag alone does not rewrite findings when nothing changed
+    Claim.objects.filter(id=c1.id).update(scrub_dirty=True)
+    res = scrub_claims([c1.id, c2.id], only_changed=True)
+    assert (res["claims"], res["skipped"]) == (0, 2)
+    assert not Claim.objects.get(id=c1.id).scrub_dirty
+
+    ClaimLine.objects.filter(claim=c2).update(units=2)
+    res = scrub_claims([c1.id, c2.id], only_changed=True)
+    assert (res["claims"], res["skipped"]) == (0, 2)  # not marked dirty -> not selected
+    Claim.objects.filter(id=c2.id).update(scrub_dirty=True)
+    res = scrub_claims([c1.id, c2.id], only_changed=True)
+    assert (res["claims"], res["skipped"]) == (1, 1)
+
+    edit_cache.bump_version()
+    res = scrub_claims(Claim.objects.all(), only_changed=True)
+    assert (res["claims"], res["skipped"]) == (2, 0)
+
+def test_registered_rule_runs_with_needs_and_profile(db, make_claim):
+    from apps.claims import scrub_rules
+
+    @scrub_rules.register("DX_REQUIRED", needs={"diagnoses"})
+    def dx_required(ctx, add):
+        if not ctx.diagnoses:
+            add("DX_REQUIRED", "ERROR", "At least one diagnosis is required.")
+
+    try:
+        c1 = make_claim(lines=[("97110", 1)])
+        c2 = make_claim(lines=[("97110", 1)])
+        c2.diagnoses.all().delete()
+        res = scrub_claims(Claim.objects.all(), profile=True)
+        rules = {r["rule"]: r for r in res["rules"]}
+        assert rules["DX_REQUIRED"]["claims"] == 2
+        assert rules["DX_REQUIRED"]["findings"] == 1
+        assert rules["DX_REQUIRED"]["needs"] == ["diagnoses"]
+        assert set(rules) >= {"REQUIRED_PAYER_NAME", "POS_CONFLICT", "MUE_EXCEEDED", "NCCI_PAIR"}
+        assert ScrubFinding.objects.filter(claim=c2, code="DX_REQUIRED").exists()
+        assert not ScrubFinding.objects.filter(claim=c1, code="DX_REQUIRED").exists()
+    finally:
+        scrub_rules.unregister("DX_REQUIRED")
@@ -0,0 +1,48 @@
+# apps/claims/tests/test_workqueue.py
+from rest_framework.test import APIClient
+from apps.claims.models import Claim, ClaimFindingSummary
+from apps.claims.scrubber import scrub_claims
+
+URL = "/api/claims/workqueue/"
+
+def test_workqueue_pages_with_cursor_and_constant_queries(db, django_assert_num_queries, make_claim):
+    clean = make_claim(lines=[("97110", 1)])
+    warn_only = [make_claim(total=0, lines=[("97110", 1)]) for _ in range(4)]
+    errored = make_claim(pos="21", payer="PAYER B", lines=[("99213", 1)])
+    scrub_claims(Claim.objects.all())
+
+    summary = ClaimFindingSummary.objects.get(claim=errored)
+    assert (summary.error_count, summary.warn_count) == (1, 0)
+    assert ClaimFindingSummary.unpack_codes(summary.error_codes) == ["POS_CONFLICT"]
+
+    client = APIClient()
+    with django_assert_num_queries(1):
+        r = client.get(URL, {"limit": 2})
+    data = r.json()
+    assert [row["id"] for row in data["results"]] == [errored.id, warn_only[-1].id]
+    assert data["results"][0]["errors"] == ["POS_CONFLICT"]
+
+    seen = [row["id"] for row in data["results"]]
+    while data["next_cursor"]:
+        with django_assert_num_queries(1):
+            data = client.get(URL, {"limit": 2, "cursor": data["next_cursor"]}).json()
+        seen += [row["id"] for row in data["results"]]
+    assert clean.id not in seen
+    assert sorted(seen) == sorted([errored.id] + [c.id for c in warn_only])
+
+def test_workqueue_filters(db, make_claim):
+    make_claim(total=0, lines=[("97110", 1)])
+    errored = make_claim(pos="21", payer="PAYER B", lines=[("99213", 1)])
+    scrub_claims(Claim.objects.all())
+    client = APIClient()
+
+    assert [r["id"] for r in client.get(URL, {"severity": "ERROR"}).json()["results"]] == [errored.id]
+    assert [r["id"] for r in client.get(URL, {"code": "pos_conflict"}).json()["results"]] == [errored.id]
+    assert [r["id"] for r in client.get(URL, {"payer": "payer b"}).json()["results"]] == [errored.id]
+    assert client.get(URL, {"status": "DRAFT"}).json()["count"] == 0
+    assert client.get(URL, {"min_age_days": 1}).json()["count"] == 0
+    assert client.get(URL, {"severity": "BOGUS"}).status_code == 400
+
+    # fixing the claim clears it from the queue through the summary table
+    Claim.objects.filter(id=errored.id).update(pos="11", scrub_dirty=True)
+    assert client.get(URL, {"severity": "ERROR", "rescrub": "1"}).json()["count"] == 0
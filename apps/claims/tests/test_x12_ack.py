@@ -0,0 +1,66 @@
+# apps/claims/tests/test_x12_ack.py
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from apps.claims.models import Claim, EdiExport
+from apps.claims.x12_ack import ingest_ack
+
+ISA = "ISA*00*          *00*          *ZZ*CLEARINGHOUSE  *ZZ*SENDERID       *250701*1200*^*00501*000000777*0*P*:~"
+
+def _write(tmp_path, name, segs):
+    path = tmp_path / name
+    path.write_text("~\n".join(s.rstrip("~") for s in [ISA] + segs) + "~\n")
+    return str(path)
+
+def _sent(n, st):
+    out = []
+    for _ in range(n):
+        c = Claim.objects.create(patient_id=1, payer_name="P", billing_provider_npi="1", rendering_provider_npi="1",
+                                 pos="11", status="SENT")
+        EdiExport.objects.create(claim=c, file_path="f", sha256="x", status="SENT",
+                                 functional_id="42", transaction_id=st)
+        out.append(c)
+    return out
+
+def test_999_updates_exports_per_transaction_set(db, tmp_path):
+    ok, bad = _sent(3, "0001"), _sent(2, "0002")
+    path = _write(tmp_path, "ack.999", [
+        "GS*FA*CH*SENDERID*20250701*1200*9*X*005010X231A1", "ST*999*0001*005010X231A1",
+        "AK1*HC*42*005010X222A1", "AK2*837*0001", "IK5*A", "AK2*837*0002", "IK5*R*5",
+        "AK9*P*2*2*1", "SE*8*0001", "GE*1*9", "IEA*1*000000777",
+    ])
+    stats = ingest_ack(path)
+    assert (stats["exports_accepted"], stats["exports_rejected"], stats["claims_rejected"]) == (3, 2, 2)
+    assert set(EdiExport.objects.filter(transaction_id="0001").values_list("ack_status", flat=True)) == {"ACCEPTED"}
+    assert {c.status for c in Claim.objects.filter(id__in=[c.id for c in bad])} == {"REJECTED"}
+    assert {c.status for c in Claim.objects.filter(id__in=[c.id for c in ok])} == {"SENT"}
+
+def test_277ca_set_based_claim_status(db, tmp_path):
+    claims = _sent(40, "0001")
+    segs = ["GS*HN*CH*SENDERID*20250701*1200*10*X*005010X214", "ST*277*0001*005010X214",
+            "BHT*0085*08*1*20250701*1200*TH", "HL*1**20*1", "HL*2*1*21*1", "HL*3*2*19*1", "STC*A1:19*20250701*WQ*0"]
+    for i, c in enumerate(claims):
+        cat = "A3:21" if i % 4 == 0 else "A2:20"
+        segs += [f"HL*{i + 4}*3*PT", "NM1*QC*1*DOE*JOHN", f"TRN*2*{c.id}", f"STC*{cat}*20250701*WQ*100"]
+    segs += ["HL*99*3*PT", "TRN*2*999999", "STC*A2:20*20250701*WQ*1", "SE*1*0001", "GE*1*10", "IEA*1*000000777"]
+    path = _write(tmp_path, "ack.277", segs)
+
+    with CaptureQueriesContext(connection) as ctx:
+        stats = ingest_ack(path)
+    assert len(ctx.captured_queries) <= 6
+    assert (stats["claims_accepted"], stats["claims_rejected"], stats["unmatched"]) == (30, 10, 1)
+    assert Claim.objects.filter(status="REJECTED").count() == 10
+
+def test_277ca_ignores_trn_above_patient_level(db, tmp_path):
+    first, claim = _sent(2, "0001")
+    path = _write(tmp_path, "ack.277", [
+        "GS*HN*CH*SENDERID*20250701*1200*10*X*005010X214", "ST*277*0001*005010X214",
+        "BHT*0085*08*1*20250701*1200*TH", "HL*1**20*1", "TRN*1*BATCH9", "HL*2*1*21*1",
+        f"TRN*2*{first.id}", "STC*A3:24*20250701*WQ*0", "HL*3*2*19*1",
+        "HL*4*3*PT", "NM1*QC*1*DOE*JOHN", f"TRN*2*{claim.id}", "STC*A2:20*20250701*WQ*100",
+        "SE*1*0001", "GE*1*10", "IEA*1*000000777",
+    ])
+    stats = ingest_ack(path)
+    assert (stats["claims_accepted"], stats["claims_rejected"]) == (1, 0)
+    first.refresh_from_db()
+    claim.refresh_from_db()
+    assert (first.status, claim.status) == ("SENT", "ACCEPTED")
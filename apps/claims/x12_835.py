@@ -0,0 +1,260 @@
+"""
+X12 005010X221A1 835 (ERA) parser and poster.
+
+`iter_claim_payments()` turns the segment stream from x12_reader into one
+ClaimPayment per CLP loop (with its SVC service lines and CAS adjustments).
+`post_era()` resolves those to our claims and lines and posts Payment,
+Adjustment and Denial rows with bulk_create, one transaction per chunk.
+
+Imports are idempotent by file SHA-256: a POSTED file is skipped, a file whose
+previous import died mid-way has its partial postings removed and is redone.
+"""
+import os
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import denial_rollup
+from .models import Adjustment, Claim, Denial, EraImport, Payment
+from .x12_reader import X12File, element, components, parse_date
+
+DEFAULT_CHUNK_SIZE = 500
+
+# CAS groups that can represent a denial: contractual (CO), payer-initiated
+# reduction (PI) and other (OA). PR (patient responsibility) never does.
+DENIAL_GROUPS = {"CO", "PI", "OA"}
+DENIED_STATUS = "4"   # CLP02
+
+def _dec(x) -> Decimal:
+    try:
+        return Decimal(str(x).strip() or "0")
+    except InvalidOperation:
+        return Decimal("0")
+
+class ServicePayment:
+    __slots__ = ("cpt", "modifiers", "charge", "paid", "units", "adjustments", "remarks", "dos")
+
+    def __init__(self, cpt, modifiers, charge, paid, units):
+        self.cpt = cpt
+        self.modifiers = modifiers
+        self.charge = charge
+        self.paid = paid
+        self.units = units
+        self.adjustments: List[Tuple[str, str, Decimal]] = []   # (group, carc, amount)
+        self.remarks: List[str] = []
+        self.dos = None
+
+class ClaimPayment:
+    __slots__ = ("patient_control", "status_code", "charge", "paid", "patient_resp", "payer_control",
+                 "payer_name", "check_number", "paid_date", "adjustments", "remarks", "services")
+
+    def __init__(self, seg, header):
+        self.patient_control = element(seg, 1)
+        self.status_code = element(seg, 2)
+        self.charge = _dec(element(seg, 3))
+        self.paid = _dec(element(seg, 4))
+        self.patient_resp = _dec(element(seg, 5))
+        self.payer_control = element(seg, 7)
+        self.payer_name = header.get("payer_name", "")
+        self.check_number = header.get("check_number", "")
+        self.paid_date = header.get("paid_date")
+        self.adjustments: List[Tuple[str, str, Decimal]] = []
+        self.remarks: List[str] = []
+        self.services: List[ServicePayment] = []
+
+def _cas(seg) -> List[Tuple[str, str, Decimal]]:
+    """CAS*group*reason*amount*qty*reason*amount*qty... -> [(group, carc, amount)]."""
+    group = element(seg, 1)
+    out = []
+    for i in range(2, min(len(seg), 20), 3):
+        carc = element(seg, i)
+        if carc:
+            out.append((group, carc, _dec(element(seg, i + 1))))
+    return out
+
+def iter_claim_payments(x12: X12File) -> Iterator[ClaimPayment]:
+    header: Dict[str, object] = {}
+    claim: Optional[ClaimPayment] = None
+    svc: Optional[ServicePayment] = None
+    delims = x12.delimiters
+    for seg in x12.segments():
+        sid = seg[0]
+        if sid == "CLP":
+            if claim is not None:
+                yield claim
+            claim, svc = ClaimPayment(seg, header), None
+        elif sid == "SVC" and claim is not None:
+            proc = components(element(seg, 1), delims)
+            svc = ServicePayment(
+                cpt=proc[1] if len(proc) > 1 else "",
+                modifiers=[m for m in proc[2:6] if m],
+                charge=_dec(element(seg, 2)),
+                paid=_dec(element(seg, 3)),
+                units=_dec(element(seg, 5) or "1"),
+            )
+            claim.services.append(svc)
+        elif sid == "CAS" and claim is not None:
+            (svc.adjustments if svc is not None else claim.adjustments).extend(_cas(seg))
+        elif sid == "LQ" and svc is not None and element(seg, 1) == "HE":
+            svc.remarks.append(element(seg, 2))
+        elif sid in ("MOA", "MIA") and claim is not None:
+            first = 3 if sid == "MOA" else 5
+            claim.remarks.extend(r for r in seg[first:] if r.strip() and not r.strip()[0].isdigit())
+        elif sid == "DTM" and svc is not None and element(seg, 1) in ("472", "150"):
+            svc.dos = parse_date(element(seg, 2))
+        elif sid in ("SE", "PLB", "ST"):
+            if claim is not None:
+                yield claim
+            claim, svc = None, None
+            if sid == "ST":
+                header = {}
+        elif sid == "BPR":
+            header["paid_date"] = parse_date(element(seg, 16))
+        elif sid == "TRN":
+            header["check_number"] = element(seg, 2)
+        elif sid == "N1" and element(seg, 1) == "PR":
+            header["payer_name"] = element(seg, 2)
+    if claim is not None:
+        yield claim
+
+# --- Posting ---
+
+def _resolve_claims(chunk: List[ClaimPayment]) -> Dict[str, Claim]:
+    """CLP01 -> Claim, matching our CLM01 (claim id) or claim_control_number; one query per chunk."""
+    keys = {cp.patient_control for cp in chunk if cp.patient_control}
+    ids = {int(k) for k in keys if k.isdigit()}
+    found: Dict[str, Claim] = {}
+    qs = Claim.objects.filter(Q(id__in=ids) | Q(claim_control_number__in=keys)).prefetch_related("lines")
+    for c in qs:
+        if c.claim_control_number in keys:
+            found.setdefault(c.claim_control_number, c)
+        if str(c.id) in keys:
+            found[str(c.id)] = c
+    return found
+
+def _denial_codes(cp: ClaimPayment) -> List[Tuple[str, str, str, Decimal]]:
+    """[(carc 'CO-50', rarc, reason, amount)] that open a denial for this claim payment."""
+    out = []
+    if cp.status_code == DENIED_STATUS:
+        adjs = [(g, c, a, cp.remarks) for g, c, a in cp.adjustments]
+        adjs += [(g, c, a, s.remarks or cp.remarks) for s in cp.services for g, c, a in s.adjustments]
+        adjs = [a for a in adjs if a[0] in DENIAL_GROUPS] or [("", "", cp.charge, cp.remarks)]
+    else:
+        adjs = [(g, c, a, s.remarks or cp.remarks) for s in cp.services if s.paid <= 0
+                for g, c, a in s.adjustments if g in DENIAL_GROUPS]
+    for group, carc, amount, remarks in adjs:
+        code = f"{group}-{carc}" if group else carc
+        reason = f"ERA {cp.payer_control or cp.patient_control}: " + (
+            f"{code} denied" if code else f"claim denied (CLP02={cp.status_code})")
+        out.append((code[:10], (remarks[0] if remarks else "")[:10], reason[:255], amount))
+    return out
+
+def _post_chunk(era: EraImport, chunk: List[ClaimPayment], totals: Dict[str, int]):
+    claims = _resolve_claims(chunk)
+    payments, adjustments, denials = [], [], []
+    paid_ids, denied_ids = set(), set()
+    wanted: Dict[Tuple[int, str], List] = {}
+
+    for cp in chunk:
+        claim = claims.get(cp.patient_control)
+        if claim is None:
+            totals["unmatched"] += 1
+            continue
+        totals["claims"] += 1
+        source = (cp.payer_name or f"ERA {cp.check_number}")[:120]
+        unused = list(claim.lines.all())
+        for s in cp.services:
+            line = next((ln for ln in unused if ln.cpt == s.cpt), None)
+            if line is not None:
+                unused.remove(line)
+            if s.paid:
+                payments.append(Payment(claim=claim, line=line, amount=s.paid, date=cp.paid_date,
+                                        source=source, era=era))
+            rarc = s.remarks[0][:10] if s.remarks else ""
+            for group, carc, amount in s.adjustments:
+                adjustments.append(Adjustment(claim=claim, line=line, carc_code=f"{group}-{carc}"[:10],
+                                              rarc_code=rarc, amount=amount, era=era))
+        if not cp.services and cp.paid:
+            payments.append(Payment(claim=claim, amount=cp.paid, date=cp.paid_date, source=source, era=era))
+        rarc = cp.remarks[0][:10] if cp.remarks else ""
+        for group, carc, amount in cp.adjustments:
+            adjustments.append(Adjustment(claim=claim, carc_code=f"{group}-{carc}"[:10], rarc_code=rarc,
+                                          amount=amount, era=era, note=f"claim-level {cp.payer_control}"[:255]))
+
+        codes = _denial_codes(cp)
+        for carc, rarc, reason, amount in codes:
+            hit = wanted.setdefault((claim.id, carc), [rarc, reason, Decimal("0")])
+            hit[2] += amount
+        if codes:
+            denied_ids.add(claim.id)
+        elif cp.paid > 0:
+            paid_ids.add(claim.id)
+
+    # don't reopen a denial that is already being worked for the same claim + CARC
+    if wanted:
+        existing = set(Denial.objects.filter(claim_id__in={k[0] for k in wanted}, status__in=["OPEN", "WORKING"])
+                       .values_list("claim_id", "carc_code"))
+        for (claim_id, carc), (rarc, reason, amount) in wanted.items():
+            if (claim_id, carc) not in existing:
+                denials.append(Denial(claim_id=claim_id, carc_code=carc, rarc_code=rarc,
+                                      reason=reason, amount=amount, status="OPEN", era=era))
+
+    with transaction.atomic():
+        Payment.objects.bulk_create(payments, batch_size=1000)
+        Adjustment.objects.bulk_create(adjustments, batch_size=1000)
+        Denial.objects.bulk_create(denials, batch_size=1000)
+        denial_rollup.record_created(denials)
+        if paid_ids:
+            Claim.objects.filter(id__in=paid_ids).update(status="PAID")
+        if denied_ids:
+            Claim.objects.filter(id__in=denied_ids).update(status="DENIED")
+    totals["payments"] += len(payments)
+    totals["adjustments"] += len(adjustments)
+    totals["denials"] += len(denials)
+
+def _purge(era: EraImport):
+    """Drop postings left behind by an interrupted import of the same file."""
+    with transaction.atomic():
+        Payment.objects.filter(era=era).delete()
+        Adjustment.objects.filter(era=era).delete()
+        stale = list(Denial.objects.filter(era=era))
+        Denial.objects.filter(era=era).delete()
+        denial_rollup.record_removed(stale)
+
+def post_era(path: str, source: str = "", chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[EraImport, bool]:
+    """
+    Parse and post one 835 file. Returns (EraImport, created); created is
+    False when the same bytes were already posted.
+    """
+    chunk_size = max(1, int(chunk_size))
+    with X12File(path) as x12:
+        digest = x12.sha256()
+        era = EraImport.objects.filter(sha256=digest).order_by("-id").first()
+        if era is not None and era.status == "POSTED":
+            return era, False
+        if era is None:
+            era = EraImport.objects.create(sha256=digest, filename=os.path.basename(path)[:200],
+                                           source=source[:120], size_bytes=x12.size, status="PROCESSING")
+        else:
+            _purge(era)
+            EraImport.objects.filter(pk=era.pk).update(status="PROCESSING")
+
+        totals = {"claims": 0, "unmatched": 0, "payments": 0, "adjustments": 0, "denials": 0}
+        try:
+            chunk: List[ClaimPayment] = []
+            for cp in iter_claim_payments(x12):
+                chunk.append(cp)
+                if len(chunk) >= chunk_size:
+                    _post_chunk(era, chunk, totals)
+                    chunk = []
+            if chunk:
+                _post_chunk(era, chunk, totals)
+        except Exception:
+            EraImport.objects.filter(pk=era.pk).update(status="FAILED", stats=totals)
+            raise
+
+    era.status, era.stats = "POSTED", totals
+    era.save(update_fields=["status", "stats"])
+    return era, True
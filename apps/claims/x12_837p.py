@@ -2,13 +2,31 @@
 X12 005010X222A1 837P skeleton builder (validator-friendly baseline).
 This is NOT production-complete, but it lays out proper loops/segments with
 safe placeholders where your data is incomplete.
+
+Batch mode packs many claims into one interchange: claims are grouped per
+billing provider and payer, each group becomes one or more ST transaction
+sets (2000A billing provider HL, then one 2000B subscriber HL per patient with
+that patient's 2300 claims under it), and sets are packed into files under
+the per-ST / per-file claim limits. Control numbers come from control_numbers.
+Segments are generated lazily and streamed through write_segments(), which
+hashes and sizes the file while writing it.
 """
 from datetime import datetime
-from typing import List
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
 from decimal import Decimal
 from django.conf import settings
+from django.db.models import Prefetch
+import hashlib
 import os
 
+from . import control_numbers as cn
+
+if TYPE_CHECKING:
+    from .models import EdiExport
+
+SENDER_ID = "SENDERID"
+RECEIVER_ID = "RECEIVERID"
+
 def _now():
     dt = datetime.utcnow()
     return dt.strftime("%Y%m%d"), dt.strftime("%H%M")
@@ -23,44 +41,51 @@ def _money(x) -> str:
     except Exception:
         return "0.00"
 
-def build_837p_segments(claim, patient, coverage, payer_name: str, control="0001") -> List[str]:
-    ymd, hms = _now()
-    sender_id = "SENDERID"
-    receiver_id = "RECEIVERID"
+def max_claims_per_st() -> int:
+    # 005010X222A1 recommends no more than 5000 CLM segments per transaction set
+    return int(getattr(settings, "X12_MAX_CLAIMS_PER_ST", 5000))
 
-    segs = []
-    # Interchange/Functional/Transaction headers
-    segs.append(f"ISA*00*          *00*          *ZZ*{sender_id:<15}*ZZ*{receiver_id:<15}*{ymd[2:]}*{hms}*^*00501*000000905*0*T*:~")
-    segs.append(f"GS*HC*{sender_id}*{receiver_id}*{ymd}*{hms}*1*X*005010X222A1~")
-    segs.append(f"ST*837*{control}*005010X222A1~")
-    segs.append(f"BHT*0019*00*{control}*{ymd}*{hms}*CH~")
+def max_claims_per_file() -> int:
+    return int(getattr(settings, "X12_MAX_CLAIMS_PER_FILE", 5000))
 
+# --- Segment groups ---
+
+def _isa(isa13: str, ymd: str, hms: str) -> str:
+    return (f"ISA*00*          *00*          *ZZ*{SENDER_ID:<15}*ZZ*{RECEIVER_ID:<15}"
+            f"*{ymd[2:]}*{hms}*^*00501*{isa13}*0*T*:~")
+
+def _gs(gs06: str, ymd: str, hms: str) -> str:
+    return f"GS*HC*{SENDER_ID}*{RECEIVER_ID}*{ymd}*{hms}*{gs06}*X*005010X222A1~"
+
+def _st_header(st02: str, ymd: str, hms: str) -> List[str]:
+    segs = [f"ST*837*{st02}*005010X222A1~",
+            f"BHT*0019*00*{st02}*{ymd}*{hms}*CH~"]
     # 1000A Submitter
     submitter_name = "Demo Submitter"
     submitter_id = "123456789"
     segs.append(f"NM1*41*2*{submitter_name}*****46*{submitter_id}~")
     segs.append("PER*IC*SUBMITTER CONTACT*TE*5551231234*EM*submitter@example.com~")
-
     # 1000B Receiver
-    segs.append(f"NM1*40*2*{receiver_id}*****46*RECEIVER~")
+    segs.append(f"NM1*40*2*{RECEIVER_ID}*****46*RECEIVER~")
+    return segs
 
-    # 2000A Billing Provider HL
-    hl1 = 1
-    segs.append(f"HL*{hl1}**20*1~")
-    segs.append("PRV*BI*PXC*207Q00000X~")  # taxonomy placeholder
-    # 2010AA Billing Provider
+def _billing_provider(hl: int, npi: str) -> List[str]:
+    # 2000A Billing Provider HL / 2010AA Billing Provider
     bp_name = "Sample Clinic"
-    bp_npi = "1234567890"
-    segs.append(f"NM1*85*2*{bp_name}*****XX*{bp_npi}~")
-    segs.append("N3*100 Medical Way~")
-    segs.append("N4*Chicago*IL*60601~")
-    segs.append("REF*EI*123456789~")  # TIN placeholder
+    bp_npi = _ns(npi) or "1234567890"
+    return [
+        f"HL*{hl}**20*1~",
+        "PRV*BI*PXC*207Q00000X~",  # taxonomy placeholder
+        f"NM1*85*2*{bp_name}*****XX*{bp_npi}~",
+        "N3*100 Medical Way~",
+        "N4*Chicago*IL*60601~",
+        "REF*EI*123456789~",  # TIN placeholder
+    ]
 
+def _subscriber(hl: int, parent: int, patient, coverage, payer_name: str) -> List[str]:
     # 2000B Subscriber HL
-    hl2 = hl1 + 1
-    segs.append(f"HL*{hl2}*{hl1}*22*0~")
-    segs.append("SBR*P*18*******MC~")  # primary, self; product type placeholder
-
+    segs = [f"HL*{hl}*{parent}*22*0~",
+            "SBR*P*18*******MC~"]  # primary, self; product type placeholder
     # 2010BA Subscriber (patient)
     last = _ns(getattr(patient, "last_name", "")) or "DOE"
     first = _ns(getattr(patient, "first_name", "")) or "JOHN"
@@ -72,19 +97,23 @@ def build_837p_segments(claim, patient, coverage, payer_name: str, control="0001
     segs.append("N3*1 MAIN ST~")
     segs.append("N4*CHICAGO*IL*60601~")
     segs.append(f"DMG*D8*{dob_str}*{gender}~")
-
     # 2010BB Payer
     payer_disp = _ns(payer_name) or "PAYER"
     segs.append(f"NM1*PR*2*{payer_disp}*****PI*PAYERID~")
+    return segs
 
+def _claim(claim, ymd: str, dx_codes=None, lines=None) -> List[str]:
     # 2300 Claim
+    segs = []
     total = _money(getattr(claim, "total_charge", "0"))
     pos = _ns(getattr(claim, "pos", "")) or "11"
     segs.append(f"CLM*{claim.id}*{total}***{pos}:11*Y*A*Y*I~")
     segs.append(f"REF*D9*{claim.id}~")  # patient control number
 
     # 2300 HI Diagnoses (max 12)
-    dx_codes = list(claim.diagnoses.order_by("order").values_list("code", flat=True))[:12]
+    if dx_codes is None:
+        dx_codes = list(claim.diagnoses.order_by("order").values_list("code", flat=True))
+    dx_codes = list(dx_codes)[:12]
     if dx_codes:
         parts = []
         for i, d in enumerate(dx_codes):
@@ -94,32 +123,218 @@ def build_837p_segments(claim, patient, coverage, payer_name: str, control="0001
         segs.append("HI*" + "*".join(parts) + "~")
 
     # 2400 Service lines
-    for i, ln in enumerate(claim.lines.all(), start=1):
+    for i, ln in enumerate(lines if lines is not None else claim.lines.all(), start=1):
         charge = _money(getattr(ln, "charge", "0"))
         units = str(getattr(ln, "units", "") or "1")
         cpt = _ns(getattr(ln, "cpt", "")) or "99213"
         segs.append(f"LX*{i}~")
         segs.append(f"SV1*HC:{cpt}*{charge}*UN*{units}***1~")
         segs.append(f"DTP*472*D8*{ymd}~")
-
-    # Tail (SE count from ST..SE inclusive)
-    st_idx = next(i for i, v in enumerate(segs) if v.startswith("ST*"))
-    se_count = (len(segs) - st_idx) + 1  # +1 for SE we add now
-    segs.append(f"SE*{se_count}*{control}~")
-    segs.append("GE*1*1~")
-    segs.append("IEA*1*000000905~")
     return segs
 
-def write_837p_file(path: str, segs: List[str]) -> str:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        f.write("\n".join(segs))
-    return path
+def _se(body: List[str], st02: str) -> str:
+    # SE count from ST..SE inclusive
+    return f"SE*{len(body) + 1}*{st02}~"
+
+# --- Single claim ---
+
+def build_837p_segments(claim, patient, coverage, payer_name: str, control: Optional[str] = None,
+                        isa_control: Optional[str] = None, gs_control: Optional[str] = None) -> List[str]:
+    """One claim in its own ISA/GS/ST envelope. ISA13/GS06/ST02 are allocated when not given."""
+    ymd, hms = _now()
+    control = control or cn.st_control(cn.allocate(cn.ST)[0])
+    isa_control = isa_control or cn.isa_control(cn.allocate(cn.ISA)[0])
+    gs_control = gs_control or cn.gs_control(cn.allocate(cn.GS)[0])
+
+    body = _st_header(control, ymd, hms)
+    body += _billing_provider(1, getattr(claim, "billing_provider_npi", ""))
+    body += _subscriber(2, 1, patient, coverage, payer_name)
+    body += _claim(claim, ymd)
+    return ([_isa(isa_control, ymd, hms), _gs(gs_control, ymd, hms)] + body +
+            [_se(body, control), f"GE*1*{gs_control}~", f"IEA*1*{isa_control}~"])
+
+
+# --- Batch ---
+
+LOAD_CHUNK = 500   # claims fetched (with lines/diagnoses) per query while generating
 
-def build_and_write_837p(claim, patient, coverage, payer_name: str) -> str:
+class Interchange:
+    """
+    Plan for one ISA/IEA file: control numbers plus, per ST, the ordered claim
+    ids it carries. Segments are produced lazily by iter_segments(), which
+    loads claims LOAD_CHUNK at a time, so a file never sits in memory whole.
+    """
+
+    def __init__(self, isa_control: str, gs_control: str, ymd: str, hms: str):
+        self.isa_control = isa_control
+        self.gs_control = gs_control
+        self.ymd, self.hms = ymd, hms
+        self.sets: List[Tuple[str, str, str, List[Tuple[int, int]]]] = []  # (npi, payer, st02, [(patient, claim)])
+
+    @property
+    def claim_st(self) -> Dict[int, str]:
+        return {cid: st02 for _npi, _payer, st02, rows in self.sets for _pid, cid in rows}
+
+    @property
+    def claim_ids(self) -> List[int]:
+        return [cid for *_k, rows in self.sets for _pid, cid in rows]
+
+    @property
+    def segments(self) -> List[str]:
+        return list(self.iter_segments())
+
+    def iter_segments(self) -> Iterator[str]:
+        ymd, hms = self.ymd, self.hms
+        yield _isa(self.isa_control, ymd, hms)
+        yield _gs(self.gs_control, ymd, hms)
+        for npi, payer, st02, rows in self.sets:
+            count = 0
+            for seg in _st_header(st02, ymd, hms) + _billing_provider(1, npi):
+                count += 1
+                yield seg
+            hl, current = 1, None
+            for i in range(0, len(rows), LOAD_CHUNK):
+                claims, patients, coverages = _load_claims([cid for _pid, cid in rows[i:i + LOAD_CHUNK]])
+                for c in claims:
+                    segs = []
+                    if c.patient_id != current:
+                        hl += 1
+                        current = c.patient_id
+                        segs += _subscriber(hl, 1, patients.get(c.patient_id), coverages.get(c.patient_id), payer)
+                    segs += _claim(c, ymd, [d.code for d in c.diagnoses.all()], list(c.lines.all()))
+                    count += len(segs)
+                    yield from segs
+            yield f"SE*{count + 1}*{st02}~"
+        yield f"GE*{len(self.sets)}*{self.gs_control}~"
+        yield f"IEA*1*{self.isa_control}~"
+
+def _load_claims(ids: List[int]):
+    """Claims (in `ids` order) with lines, ordered diagnoses, patients and latest coverages."""
+    from apps.patients.models import Patient
+    from .models import Claim, Diagnosis
+    from .scrubber import load_coverages
+
+    by_id = Claim.objects.prefetch_related(
+        "lines", Prefetch("diagnoses", queryset=Diagnosis.objects.order_by("order"))).in_bulk(ids)
+    claims = [by_id[i] for i in ids if i in by_id]
+    patient_ids = {c.patient_id for c in claims}
+    return claims, Patient.objects.in_bulk(patient_ids), load_coverages(patient_ids)
+
+def _payer_names(patient_ids) -> Dict[int, str]:
+    from .scrubber import load_coverages
+    return {pid: cov.payer_name for pid, cov in load_coverages(patient_ids).items() if cov.payer_name}
+
+def _plan_rows(claims):
+    """(id, patient_id, npi, claim payer) tuples without loading full claim rows."""
+    from .models import Claim
+
+    if not hasattr(claims, "model"):
+        claims = Claim.objects.filter(id__in=[getattr(c, "id", c) for c in claims])
+    return claims.order_by("id").values_list("id", "patient_id", "billing_provider_npi", "payer_name")
+
+def _pack(groups, per_st: int, per_file: int):
+    """Split (key, rows) groups into transaction sets and sets into files under both limits."""
+    files, cur, cur_n = [], [], 0
+    for key, group in groups:
+        i = 0
+        while i < len(group):
+            room = per_file - cur_n
+            if room <= 0:
+                files.append(cur)
+                cur, cur_n, room = [], 0, per_file
+            take = min(per_st, room, len(group) - i)
+            cur.append((key, group[i:i + take]))
+            cur_n += take
+            i += take
+    if cur:
+        files.append(cur)
+    return files
+
+def build_837p_batch(claims, per_st: Optional[int] = None, per_file: Optional[int] = None) -> List[Interchange]:
+    """
+    Plan multi-claim interchanges for `claims` (queryset, instances or ids).
+    Grouping only reads ids, NPIs and payer names; all ISA13/GS06/ST02 numbers
+    for the batch are reserved up front, one allocation per envelope level.
+    """
+    per_st = max(1, per_st or max_claims_per_st())
+    per_file = max(1, per_file or max_claims_per_file())
+    rows = list(_plan_rows(claims))
+    if not rows:
+        return []
+    payers = _payer_names({pid for _cid, pid, _npi, _payer in rows})
+
+    by_key: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+    for cid, pid, npi, claim_payer in rows:
+        payer = payers.get(pid) or claim_payer or "PAYER"
+        by_key.setdefault((_ns(npi), payer), []).append((pid, cid))
+    groups = [(k, sorted(v)) for k, v in sorted(by_key.items())]
+    files = _pack(groups, per_st, per_file)
+
+    isas = cn.allocate(cn.ISA, len(files))
+    gss = cn.allocate(cn.GS, len(files))
+    sts = iter(cn.allocate(cn.ST, sum(len(f) for f in files)))
     ymd, hms = _now()
-    fname = f"claim_{claim.id}_{ymd}{hms}.txt"
-    outdir = getattr(settings, "EXPORTS_DIR", os.path.join(os.getcwd(), "exports", "edi"))
-    path = os.path.join(outdir, fname)
-    segs = build_837p_segments(claim, patient, coverage, payer_name)
-    return write_837p_file(path, segs)
+
+    out = []
+    for file_sets, isa_n, gs_n in zip(files, isas, gss):
+        ic = Interchange(cn.isa_control(isa_n), cn.gs_control(gs_n), ymd, hms)
+        for (npi, payer), set_rows in file_sets:
+            ic.sets.append((npi, payer, cn.st_control(next(sts)), set_rows))
+        out.append(ic)
+    return out
+
+# --- Writing ---
+
+class WriteResult:
+    __slots__ = ("path", "sha256", "size", "segments")
+
+    def __init__(self, path: str, sha256: str, size: int, segments: int):
+        self.path, self.sha256, self.size, self.segments = path, sha256, size, segments
+
+def write_segments(path: str, segments: Iterable[str], buffer_size: int = 1 << 16) -> WriteResult:
+    """
+    Stream `segments` to `path` ("\\n"-separated), hashing and counting as it
+    goes. Bytes land in a temp file next to `path` that is renamed into place
+    only once complete, so readers never see a partial interchange.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    digest = hashlib.sha256()
+    size = count = 0
+    try:
+        with open(tmp, "wb", buffering=buffer_size) as f:
+            for seg in segments:
+                data = (seg if count == 0 else "\n" + seg).encode("utf-8")
+                f.write(data)
+                digest.update(data)
+                size += len(data)
+                count += 1
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return WriteResult(path, digest.hexdigest(), size, count)
+
+def _exports_dir() -> str:
+    return getattr(settings, "EXPORTS_DIR", os.path.join(os.getcwd(), "exports", "edi"))
+
+def write_837p_batch(claims, outdir: Optional[str] = None, per_st: Optional[int] = None,
+                     per_file: Optional[int] = None) -> List["EdiExport"]:
+    """
+    Build, write and log a batch: one file per interchange and one QUEUED
+    EdiExport per claim carrying its ISA13/GS06/ST02, the file digest and size.
+    """
+    from .models import EdiExport
+
+    outdir = outdir or _exports_dir()
+    exports = []
+    for ic in build_837p_batch(claims, per_st=per_st, per_file=per_file):
+        res = write_segments(os.path.join(outdir, f"837p_{ic.isa_control}_{ic.ymd}{ic.hms}.txt"),
+                             ic.iter_segments())
+        rows = [EdiExport(claim_id=claim_id, file_path=res.path, sha256=res.sha256, size_bytes=res.size,
+                          status="QUEUED", interchange_id=ic.isa_control, functional_id=ic.gs_control,
+                          transaction_id=st02)
+                for claim_id, st02 in ic.claim_st.items()]
+        exports += EdiExport.objects.bulk_create(rows, batch_size=1000)
+    return exports
@@ -0,0 +1,146 @@
+"""
+999 implementation acknowledgment and 277CA claim acknowledgment ingestion.
+
+Both are streamed through x12_reader. Results are buffered and applied with
+set-based UPDATEs every `chunk_size` items, so a file acknowledging thousands
+of claims costs a handful of queries:
+
+- 999: AK1 carries the GS06 and AK2 the ST02 we sent; IK5 (per ST) or AK9
+  (whole group, when no AK2 is present) gives the result. It is written to
+  EdiExport.ack_status by (functional_id, transaction_id). Claims in rejected
+  transaction sets move to REJECTED.
+- 277CA: each patient-level HL (HL03 = PT, loop 2200D) names our claim by
+  TRN02 (falling back to REF*D9), which build_837p_segments fills with the
+  claim id. STC01's category code decides ACCEPTED or REJECTED for
+  Claim.status. TRN/STC at the source, receiver and provider levels trace
+  the batch, not a claim, and are ignored.
+"""
+from typing import Dict, List, Set
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Claim, EdiExport
+from .x12_reader import X12File, element, components
+
+DEFAULT_CHUNK_SIZE = 5000
+
+ACK_999 = {"A": "ACCEPTED", "E": "ACCEPTED_ERRORS"}   # anything else (R, M, W, X) is REJECTED
+STC_ACCEPTED = {"A1", "A2", "A5"}
+STC_REJECTED = {"A3", "A4", "A6", "A7", "A8"}
+# claims past acknowledgment are never pulled back by a late or replayed ack
+FINAL_CLAIM_STATUSES = ("PAID", "DENIED")
+
+def _ack_result(code: str) -> str:
+    return ACK_999.get((code or "").upper(), "REJECTED")
+
+class _Ack999:
+    def __init__(self, stats: Dict[str, int]):
+        self.stats = stats
+        self.pending: Dict[tuple, List[str]] = {}   # (result, gs06) -> [st02]; [] = whole group
+        self.size = 0
+
+    def add(self, result: str, gs: str, st: str = ""):
+        key = (result, gs)
+        self.pending.setdefault(key, [])
+        if st:
+            self.pending[key].append(st)
+        self.size += 1
+
+    def flush(self):
+        now = timezone.now()
+        for (result, gs), sts in self.pending.items():
+            exports = EdiExport.objects.filter(functional_id=gs)
+            if sts:
+                exports = exports.filter(transaction_id__in=sts)
+            n = exports.update(ack_status=result, ack_at=now)
+            self.stats["exports_" + result.lower()] += n
+            if n == 0:
+                self.stats["unmatched"] += len(sts) or 1
+            if result == "REJECTED":
+                claims = Claim.objects.filter(edi_exports__functional_id=gs)
+                if sts:
+                    claims = claims.filter(edi_exports__transaction_id__in=sts)
+                self.stats["claims_rejected"] += (Claim.objects.filter(id__in=claims.values("id"))
+                                                  .exclude(status__in=FINAL_CLAIM_STATUSES)
+                                                  .update(status="REJECTED"))
+        self.pending, self.size = {}, 0
+
+class _Ack277:
+    def __init__(self, stats: Dict[str, int]):
+        self.stats = stats
+        self.accepted: Set[str] = set()
+        self.rejected: Set[str] = set()
+
+    @property
+    def size(self):
+        return len(self.accepted) + len(self.rejected)
+
+    def add(self, key: str, categories: Set[str]):
+        if not key:
+            return
+        if categories & STC_REJECTED:
+            self.rejected.add(key)
+            self.accepted.discard(key)
+        elif categories & STC_ACCEPTED and key not in self.rejected:
+            self.accepted.add(key)
+
+    def flush(self):
+        for status, keys in (("ACCEPTED", self.accepted - self.rejected), ("REJECTED", self.rejected)):
+            if not keys:
+                continue
+            ids = {int(k) for k in keys if k.isdigit()}
+            match = Q(id__in=ids) | Q(claim_control_number__in=keys)
+            found = Claim.objects.filter(match).count()
+            self.stats["unmatched"] += max(len(keys) - found, 0)
+            self.stats["claims_" + status.lower()] += (Claim.objects.filter(match)
+                                                       .exclude(status__in=FINAL_CLAIM_STATUSES)
+                                                       .update(status=status))
+        self.accepted, self.rejected = set(), set()
+
+def ingest_ack(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, int]:
+    """Apply every 999 / 277CA transaction set in `path`; returns counters."""
+    stats = {"transactions": 0, "exports_accepted": 0, "exports_accepted_errors": 0, "exports_rejected": 0,
+             "claims_accepted": 0, "claims_rejected": 0, "unmatched": 0}
+    a999, a277 = _Ack999(stats), _Ack277(stats)
+    kind = gs = st = ""
+    st_seen = False
+    claim_key, categories, in_claim = "", set(), False
+    with X12File(path) as x12:
+        delims = x12.delimiters
+        for seg in x12.segments():
+            sid = seg[0]
+            if sid == "ST":
+                kind = element(seg, 1)
+                stats["transactions"] += 1
+            elif kind == "999":
+                if sid == "AK1":
+                    gs, st, st_seen = element(seg, 2), "", False
+                elif sid == "AK2":
+                    st, st_seen = element(seg, 2), True
+                elif sid == "IK5" and st:
+                    a999.add(_ack_result(element(seg, 1)), gs, st)
+                    st = ""
+                elif sid == "AK9" and gs and not st_seen:
+                    a999.add(_ack_result(element(seg, 1)), gs)
+                if a999.size >= chunk_size:
+                    a999.flush()
+            elif kind == "277":
+                if sid in ("HL", "SE"):
+                    a277.add(claim_key, categories)
+                    claim_key, categories = "", set()
+                    in_claim = sid == "HL" and element(seg, 3) == "PT"
+                    if a277.size >= chunk_size:
+                        a277.flush()
+                elif not in_claim:
+                    continue
+                elif sid == "TRN" and element(seg, 1) == "2":
+                    claim_key = element(seg, 2)
+                elif sid == "REF" and element(seg, 1) == "D9" and not claim_key:
+                    claim_key = element(seg, 2)
+                elif sid == "STC" and claim_key:
+                    categories.add(components(element(seg, 1), delims)[0].upper())
+    a277.add(claim_key, categories)
+    a999.flush()
+    a277.flush()
+    return stats
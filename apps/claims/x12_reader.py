@@ -0,0 +1,84 @@
+"""
+Streaming X12 tokenizer.
+
+The file is memory-mapped and walked one segment terminator at a time, so a
+50 MB remit never exists as one Python string. Delimiters are read from the
+fixed-width ISA header (element separator at byte 3, component separator at
+104, segment terminator at 105), so files using `*`/`:`/`~` or anything else
+parse the same way.
+"""
+import hashlib
+import mmap
+import os
+from datetime import date
+from typing import Iterator, List, NamedTuple
+
+ISA_LEN = 106
+
+class Delimiters(NamedTuple):
+    element: str
+    component: str
+    segment: str
+
+class X12File:
+    """mmap-backed X12 file: `sha256()` hashes the mapping, `segments()` yields element lists."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._f = open(path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.start = self._mm.find(b"ISA") if self._mm is not None else -1
+        if self.start < 0 or self.size - self.start < ISA_LEN:
+            self.close()
+            raise ValueError(f"{path}: no ISA header, not an X12 interchange")
+        isa = self._mm[self.start:self.start + ISA_LEN]
+        self.delimiters = Delimiters(chr(isa[3]), chr(isa[104]), chr(isa[105]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        if getattr(self, "_f", None) is not None:
+            self._f.close()
+            self._f = None
+
+    def sha256(self) -> str:
+        return hashlib.sha256(self._mm).hexdigest()
+
+    def segments(self) -> Iterator[List[str]]:
+        mm = self._mm
+        term = self.delimiters.segment.encode("latin-1")
+        sep = self.delimiters.element
+        pos, end = self.start, self.size
+        while pos < end:
+            nxt = mm.find(term, pos)
+            if nxt < 0:
+                nxt = end
+            raw = mm[pos:nxt].strip()
+            pos = nxt + 1
+            if raw:
+                yield raw.decode("latin-1").split(sep)
+
+def element(seg: List[str], i: int, default: str = "") -> str:
+    """seg[i] (X12 numbering, seg[0] is the segment id) or `default` when absent."""
+    return seg[i].strip() if len(seg) > i else default
+
+def components(value: str, delims: Delimiters) -> List[str]:
+    return value.split(delims.component)
+
+def parse_date(value: str):
+    """CCYYMMDD -> date, or None."""
+    v = (value or "").strip()
+    if len(v) != 8 or not v.isdigit():
+        return None
+    try:
+        return date(int(v[:4]), int(v[4:6]), int(v[6:]))
+    except ValueError:
+        return None
@@ -3,3 +3,7 @@ class FhirApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.fhir_api"
     verbose_name = "FHIR API"
+
+    def ready(self):
+        from . import signals
+        signals.connect()
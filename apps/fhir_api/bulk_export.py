@@ -0,0 +1,150 @@
+# apps/fhir_api/bulk_export.py
+# FHIR Bulk Data ($export) jobs on top of compliance.ExportJob.
+#
+# kick_off() queues an ExportJob (scope "fhir-bulk") with the requested
+# _type / _since in meta. run_job() claims a QUEUED job with a conditional
+# UPDATE, then writes one gzip NDJSON file per resource type. Types run in a
+# process pool, each streaming its rows with a server-side iterator, and
+# report back (file, count, patient ids). On success the job folder goes into
+# ExportJob.location, the per-file manifest into meta["output"], and one
+# DisclosureLog row is written per patient whose data left the system.
+import gzip
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from apps.billing.models import Superbill as DbSuperbill
+from apps.chart.models import (Encounter as DbEncounter, VitalSign as DbVital, ConditionEntry as DbCondition,
+                               AllergyEntry as DbAllergy)
+from apps.compliance.models import DisclosureLog, ExportJob
+from apps.patients.models import Patient as DbPatient
+from apps.registry.models import Coverage as DbCoverage
+from .resources import (patient_to_fhir, coverage_to_fhir, encounter_to_fhir, observation_from_vital,
+                        condition_to_fhir, allergy_to_fhir, claim_from_superbill)
+
+SCOPE = "fhir-bulk"
+CHUNK_SIZE = 2000
+DISCLOSURE_BATCH = 1000
+
+class ExportType(NamedTuple):
+    queryset: Callable        # () -> QuerySet with updated_at and a patient id column
+    patient_field: str
+    to_fhir: Callable
+
+EXPORT_TYPES: Dict[str, ExportType] = {
+    "Patient": ExportType(lambda: DbPatient.objects.all(), "id", patient_to_fhir),
+    "Coverage": ExportType(lambda: DbCoverage.objects.all(), "patient_id", coverage_to_fhir),
+    "Encounter": ExportType(lambda: DbEncounter.objects.all(), "patient_id", encounter_to_fhir),
+    "Observation": ExportType(lambda: DbVital.objects.all(), "patient_id", observation_from_vital),
+    "Condition": ExportType(lambda: DbCondition.objects.all(), "patient_id", condition_to_fhir),
+    "AllergyIntolerance": ExportType(lambda: DbAllergy.objects.all(), "patient_id", allergy_to_fhir),
+    "Claim": ExportType(lambda: DbSuperbill.objects.all(), "patient_id", claim_from_superbill),
+}
+
+def job_dir(job_id: int) -> str:
+    return os.path.join(settings.FHIR_EXPORT_DIR, f"job-{job_id}")
+
+def file_name(resource_type: str) -> str:
+    return f"{resource_type}.ndjson.gz"
+
+def kick_off(types: Iterable[str], since: Optional[datetime], requested_by=None, request_url: str = "",
+             recipient: str = "", purpose: str = "operations") -> ExportJob:
+    """Queue a bulk export; unknown types raise ValueError."""
+    types = list(dict.fromkeys(types)) or list(EXPORT_TYPES)
+    unknown = [t for t in types if t not in EXPORT_TYPES]
+    if unknown:
+        raise ValueError(f"Unsupported _type: {', '.join(unknown)}")
+    user = requested_by if getattr(requested_by, "is_authenticated", False) else None
+    return ExportJob.objects.create(scope=SCOPE, requested_by=user, status="QUEUED", meta={
+        "types": types,
+        "since": since.isoformat() if since else None,
+        "request": request_url,
+        "recipient": recipient or (user.get_username() if user else "fhir-bulk-client"),
+        "purpose": purpose,
+    })
+
+def export_type(job_id: int, resource_type: str, since_iso: Optional[str], out_dir: str) -> Tuple[str, str, int, List[int]]:
+    """Write one type's NDJSON.gz; returns (type, path, count, patient ids). Runs in a pool worker."""
+    spec = EXPORT_TYPES[resource_type]
+    qs = spec.queryset()
+    if since_iso:
+        qs = qs.filter(updated_at__gt=datetime.fromisoformat(since_iso))
+    path = os.path.join(out_dir, file_name(resource_type))
+    tmp = path + ".part"
+    count, patients = 0, set()
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        for row in qs.order_by("id").iterator(chunk_size=CHUNK_SIZE):
+            f.write(json.dumps(spec.to_fhir(row), default=str, separators=(",", ":")))
+            f.write("\n")
+            count += 1
+            pid = getattr(row, spec.patient_field, None)
+            if pid:
+                patients.add(pid)
+    os.replace(tmp, path)
+    return resource_type, path, count, sorted(patients)
+
+def _init_worker():
+    import django
+    django.setup()
+
+def _run_types(job: ExportJob, out_dir: str, processes: int) -> List[Tuple[str, str, int, List[int]]]:
+    types, since = job.meta.get("types") or list(EXPORT_TYPES), job.meta.get("since")
+    if processes <= 1 or len(types) == 1:
+        return [export_type(job.id, t, since, out_dir) for t in types]
+    connections.close_all()   # forked workers must open their own connections
+    with ProcessPoolExecutor(max_workers=min(processes, len(types)), initializer=_init_worker) as pool:
+        futures = [pool.submit(export_type, job.id, t, since, out_dir) for t in types]
+        return [f.result() for f in futures]
+
+def _log_disclosures(job: ExportJob, patient_ids: Set[int], files: List[str]):
+    meta = {"job_id": job.id, "scope": SCOPE, "types": files}
+    purpose, recipient = job.meta.get("purpose") or "operations", job.meta.get("recipient") or ""
+    batch = []
+    for pid in sorted(patient_ids):
+        batch.append(DisclosureLog(patient_id=pid, purpose=purpose[:128], recipient=recipient[:256], meta=meta))
+        if len(batch) >= DISCLOSURE_BATCH:
+            DisclosureLog.objects.bulk_create(batch)
+            batch = []
+    DisclosureLog.objects.bulk_create(batch)
+
+def claim_next(job_id: Optional[int] = None) -> Optional[ExportJob]:
+    """Move the oldest QUEUED bulk job (or `job_id`) to PROCESSING; None when there is nothing to do."""
+    qs = ExportJob.objects.filter(scope=SCOPE, status="QUEUED")
+    if job_id is not None:
+        qs = qs.filter(pk=job_id)
+    for pk in qs.order_by("requested_at", "id").values_list("id", flat=True)[:5]:
+        if ExportJob.objects.filter(pk=pk, status="QUEUED").update(status="PROCESSING"):
+            return ExportJob.objects.get(pk=pk)
+    return None
+
+def run_job(job: ExportJob, processes: int = 1) -> ExportJob:
+    """Execute a job already moved to PROCESSING by claim_next()."""
+    out_dir = job_dir(job.id)
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        results = _run_types(job, out_dir, processes)
+    except Exception as e:
+        job.status = "FAILED"
+        job.meta = {**job.meta, "error": f"{type(e).__name__}: {e}"[:500]}
+        job.completed_at = timezone.now()
+        job.save(update_fields=["status", "meta", "completed_at"])
+        raise
+
+    patients: Set[int] = set()
+    output = []
+    for resource_type, path, count, pids in results:
+        output.append({"type": resource_type, "file": os.path.basename(path), "count": count})
+        patients.update(pids)
+    job.status = "COMPLETED"
+    job.location = out_dir[:512]
+    job.completed_at = timezone.now()
+    job.meta = {**job.meta, "output": output, "patients": len(patients)}
+    job.save(update_fields=["status", "location", "completed_at", "meta"])
+    _log_disclosures(job, patients, [o["type"] for o in output])
+    return job
@@ -0,0 +1,94 @@
+# apps/fhir_api/directory.py
+# GET Practitioner? search for the provider directory, paged by id.
+#
+# A page is one Provider query plus one prefetch each for DEA registrations
+# and licenses; asking for PractitionerRoles adds one for facility links and
+# one for payer credentials (payer joined in). That is 3 or 5 queries per
+# page whatever `_count` is, and the mappers never query on their own.
+# `_cursor` is the last provider id of the previous page, carried in `next`.
+from typing import Callable, NamedTuple
+
+from django.db.models import Prefetch, Q
+
+from apps.registry.models import (Provider, ProviderDEARegistration, ProviderFacility, ProviderLicense,
+                                  ProviderPayerCredential)
+from .resources import practitioner_roles, practitioner_to_fhir
+
+DEFAULT_COUNT = 100
+MAX_COUNT = 1000
+NPI_SYSTEM = "http://hl7.org/fhir/sid/us-npi"
+# `_include=PractitionerRole` as asked for by directory consumers; the spec form is the reverse include
+ROLE_INCLUDES = {"PractitionerRole", "PractitionerRole:practitioner"}
+
+class DirectoryError(ValueError):
+    pass
+
+class DirectoryQuery(NamedTuple):
+    count: int
+    after: int                   # last provider id of the previous page
+    name: str
+    npi: str
+    include_roles: bool
+
+def parse_params(params) -> DirectoryQuery:
+    """Validate _count / _cursor / name / identifier / _include; raises DirectoryError."""
+    try:
+        count = int(params.get("_count") or DEFAULT_COUNT)
+    except ValueError:
+        raise DirectoryError("_count must be an integer")
+    if count < 1:
+        raise DirectoryError("_count must be >= 1")
+    try:
+        after = int(params.get("_cursor") or 0)
+    except ValueError:
+        raise DirectoryError("Invalid _cursor")
+    if after < 0:
+        raise DirectoryError("Invalid _cursor")
+
+    npi = (params.get("identifier") or "").strip()
+    if "|" in npi:
+        system, npi = npi.split("|", 1)
+        if system and system != NPI_SYSTEM:
+            raise DirectoryError(f"Unsupported identifier system: {system}")
+
+    includes = set(params.getlist("_include")) | set(params.getlist("_revinclude"))
+    unknown = includes - ROLE_INCLUDES
+    if unknown:
+        raise DirectoryError(f"Unsupported _include: {', '.join(sorted(unknown))}")
+    return DirectoryQuery(min(count, MAX_COUNT), after, (params.get("name") or "").strip(), npi.strip(),
+                          bool(includes))
+
+def providers(query: DirectoryQuery):
+    """One page worth of providers (plus one to detect a next page) with mapper relations prefetched."""
+    qs = Provider.objects.filter(id__gt=query.after)
+    if query.name:
+        qs = qs.filter(Q(last_name__istartswith=query.name) | Q(first_name__istartswith=query.name))
+    if query.npi:
+        qs = qs.filter(npi=query.npi)
+    related = [
+        Prefetch("dea_regs", queryset=ProviderDEARegistration.objects.order_by("id")),
+        Prefetch("licenses", queryset=ProviderLicense.objects.order_by("state", "id")),
+    ]
+    if query.include_roles:
+        related += [
+            Prefetch("facilities", queryset=ProviderFacility.objects.order_by("id")),
+            Prefetch("registry_payer_credentials",
+                     queryset=ProviderPayerCredential.objects.select_related("payer").order_by("payer__name", "id")),
+        ]
+    return qs.order_by("id").prefetch_related(*related)[:query.count + 1]
+
+def search_bundle(query: DirectoryQuery, self_url: str, next_url: Callable[[str], str]) -> dict:
+    rows = list(providers(query))
+    page, more = rows[:query.count], len(rows) > query.count
+    entries = []
+    for pr in page:
+        entries.append({"resource": practitioner_to_fhir(pr, dea_regs=pr.dea_regs.all(), licenses=pr.licenses.all()),
+                        "search": {"mode": "match"}})
+        if query.include_roles:
+            for role in practitioner_roles(pr, facilities=pr.facilities.all(),
+                                           credentials=pr.registry_payer_credentials.all()):
+                entries.append({"resource": role, "search": {"mode": "include"}})
+    links = [{"relation": "self", "url": self_url}]
+    if more:
+        links.append({"relation": "next", "url": next_url(str(page[-1].id))})
+    return {"resourceType": "Bundle", "type": "searchset", "link": links, "entry": entries}
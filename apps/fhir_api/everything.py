@@ -0,0 +1,136 @@
+# apps/fhir_api/everything.py
+# Patient/{id}/$everything, paged and streamed.
+#
+# Each section is one model query keyed by id, so a page costs the Patient
+# lookup plus at most one query per section it touches, whatever the
+# patient's history size. Paging is a keyset cursor "<section>.<last id>"
+# carried in the `next` link; `_count` caps entries per page, `_since` keeps
+# rows whose updated_at is later than the given instant and `_type` limits
+# the resource types. The Bundle JSON is written entry by entry.
+import json
+from datetime import timezone as dt_timezone
+from typing import Callable, Iterator, List, NamedTuple, Optional, Set
+
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+
+from apps.chart.models import (Encounter as DbEncounter, VitalSign as DbVital, ConditionEntry as DbCondition,
+                               AllergyEntry as DbAllergy, SoapNote as DbSoap)
+from apps.registry.models import Coverage as DbCoverage
+from .resources import (patient_to_fhir, coverage_to_fhir, encounter_to_fhir, documentreference_soap,
+                        observation_from_vital, condition_to_fhir, allergy_to_fhir)
+
+DEFAULT_COUNT = 200
+MAX_COUNT = 1000
+
+class Section(NamedTuple):
+    resource_type: str
+    queryset: Callable        # patient -> QuerySet
+    to_fhir: Callable         # row -> dict
+
+SECTIONS: List[Section] = [
+    Section("Coverage", lambda p: DbCoverage.objects.filter(patient=p), coverage_to_fhir),
+    Section("Encounter", lambda p: DbEncounter.objects.filter(patient=p), encounter_to_fhir),
+    Section("DocumentReference", lambda p: DbSoap.objects.filter(encounter__patient=p).select_related("encounter"),
+            lambda s: documentreference_soap(s.encounter, s)),
+    Section("Observation", lambda p: DbVital.objects.filter(patient=p), observation_from_vital),
+    Section("Condition", lambda p: DbCondition.objects.filter(patient=p), condition_to_fhir),
+    Section("AllergyIntolerance", lambda p: DbAllergy.objects.filter(patient=p), allergy_to_fhir),
+]
+RESOURCE_TYPES = ["Patient"] + [s.resource_type for s in SECTIONS]
+
+class EverythingError(ValueError):
+    pass
+
+class EverythingQuery(NamedTuple):
+    count: int
+    since: Optional[object]      # aware datetime
+    types: Set[str]
+    cursor: tuple                # (section index, last id); (-1, 0) = first page
+
+def parse_since(raw: Optional[str]):
+    """FHIR _since (date or instant) -> aware datetime, None when blank; naive values are UTC."""
+    raw = (raw or "").strip()
+    if not raw:
+        return None
+    since = parse_datetime(raw)
+    if since is None and parse_date(raw) is not None:
+        since = parse_datetime(raw + "T00:00:00")
+    if since is None:
+        raise EverythingError("_since must be an ISO date or instant")
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, dt_timezone.utc)
+    return since
+
+def parse_params(params) -> EverythingQuery:
+    """Validate _count / _since / _type / _cursor; raises EverythingError."""
+    try:
+        count = int(params.get("_count") or DEFAULT_COUNT)
+    except ValueError:
+        raise EverythingError("_count must be an integer")
+    if count < 1:
+        raise EverythingError("_count must be >= 1")
+
+    since = parse_since(params.get("_since"))
+
+    types = {t.strip() for t in (params.get("_type") or "").split(",") if t.strip()}
+    unknown = types - set(RESOURCE_TYPES)
+    if unknown:
+        raise EverythingError(f"Unsupported _type: {', '.join(sorted(unknown))}")
+
+    cursor = (-1, 0)
+    raw = (params.get("_cursor") or "").strip()
+    if raw:
+        try:
+            section, last_id = (int(x) for x in raw.split("."))
+        except ValueError:
+            raise EverythingError("Invalid _cursor")
+        if not (0 <= section < len(SECTIONS)) or last_id < 0:
+            raise EverythingError("Invalid _cursor")
+        cursor = (section, last_id)
+    return EverythingQuery(min(count, MAX_COUNT), since, types or set(RESOURCE_TYPES), cursor)
+
+class EverythingPage:
+    """One page of entries; `next_cursor` is set once `entries()` has been consumed."""
+
+    def __init__(self, patient, query: EverythingQuery):
+        self.patient = patient
+        self.query = query
+        self.next_cursor: Optional[str] = None
+
+    def entries(self) -> Iterator[dict]:
+        q = self.query
+        left = q.count
+        start, after = q.cursor
+        if start < 0:
+            if "Patient" in q.types and (q.since is None or self.patient.updated_at > q.since):
+                left -= 1
+                yield patient_to_fhir(self.patient)
+            start, after = 0, 0
+        for index in range(start, len(SECTIONS)):
+            section = SECTIONS[index]
+            if section.resource_type not in q.types:
+                continue
+            if left <= 0:
+                self.next_cursor = f"{index}.0"
+                return
+            qs = section.queryset(self.patient).filter(id__gt=after if index == start else 0)
+            if q.since is not None:
+                qs = qs.filter(updated_at__gt=q.since)
+            rows = list(qs.order_by("id")[:left + 1])
+            for row in rows[:left]:
+                yield section.to_fhir(row)
+            if len(rows) > left:
+                self.next_cursor = f"{index}.{rows[left - 1].id}"
+                return
+            left -= len(rows)
+
+def stream_bundle(page: EverythingPage, self_url: str, next_url: Callable[[str], str]) -> Iterator[str]:
+    """Bundle JSON in pieces: entries first, then links (the next cursor is only known at the end)."""
+    yield '{"resourceType":"Bundle","type":"searchset","entry":['
+    for i, resource in enumerate(page.entries()):
+        yield ("," if i else "") + json.dumps({"resource": resource}, default=str)
+    links = [{"relation": "self", "url": self_url}]
+    if page.next_cursor is not None:
+        links.append({"relation": "next", "url": next_url(page.next_cursor)})
+    yield '],"link":' + json.dumps(links) + "}"
@@ -0,0 +1,37 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from apps.fhir_api import bulk_export
+
+class Command(BaseCommand):
+    help = "Run queued FHIR bulk $export jobs, writing one gzip NDJSON file per resource type."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=min(len(bulk_export.EXPORT_TYPES), os.cpu_count() or 1),
+                            help="Worker processes per job (resource types run in parallel; 1 = inline)")
+        parser.add_argument("--job", type=int, default=None, help="Run only this job id")
+        parser.add_argument("--poll", type=float, default=10.0, help="Seconds to sleep when no job is queued")
+        parser.add_argument("--once", action="store_true", help="Run at most one job and exit")
+
+    def handle(self, *args, **opts):
+        if opts["processes"] < 1:
+            raise CommandError("--processes must be >= 1")
+        while True:
+            job = bulk_export.claim_next(opts["job"])
+            if job is None:
+                if opts["once"] or opts["job"] is not None:
+                    self.stdout.write("No queued export jobs.")
+                    return
+                time.sleep(opts["poll"])
+                continue
+            started = time.monotonic()
+            try:
+                job = bulk_export.run_job(job, processes=opts["processes"])
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f"Export job #{job.id} failed: {e}"))
+            else:
+                counts = ", ".join(f"{o['type']}={o['count']}" for o in job.meta["output"])
+                self.stdout.write(self.style.SUCCESS(
+                    f"Export job #{job.id} done in {time.monotonic() - started:.1f}s: {counts} -> {job.location}"))
+            if opts["once"] or opts["job"] is not None:
+                return
@@ -0,0 +1,13 @@
+from django.db import models
+
+class ResourceVersion(models.Model):
+    """Version stamp per served FHIR resource; bumped by signals on its source rows (see resource_cache)."""
+    resource_type = models.CharField(max_length=64)
+    object_id = models.CharField(max_length=64)
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("resource_type", "object_id")
+
+    def __str__(self): return f"{self.resource_type}/{self.object_id} v{self.version}"
@@ -0,0 +1,82 @@
+# apps/fhir_api/resource_cache.py
+# Serialized FHIR reads keyed by (resourceType, id, version).
+#
+# ResourceVersion holds one counter per served resource; signals on the
+# source models (see signals.py) bump it on every save/delete. A read looks
+# up the current version first: a matching If-None-Match gets a 304 straight
+# away, otherwise the JSON body comes from the Django cache under the
+# versioned key and the mapper only runs on a miss. Old versions are never
+# invalidated, they just stop being asked for and age out. Writes that bypass
+# signals (QuerySet.update, raw SQL) must call bump() themselves.
+import json
+from typing import Callable, Iterable, Tuple
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseNotModified
+
+from .models import ResourceVersion
+
+CACHE_TIMEOUT = 24 * 3600
+KEY_PREFIX = "fhir-res"
+
+Target = Tuple[str, object]   # (resource_type, object_id)
+
+def stored_version(resource_type: str, object_id):
+    """The ResourceVersion counter, None when no row exists yet."""
+    return (ResourceVersion.objects.filter(resource_type=resource_type, object_id=str(object_id))
+            .values_list("version", flat=True).first())
+
+def current_version(resource_type: str, object_id) -> int:
+    """0 for resources that have not changed since versioning started."""
+    return stored_version(resource_type, object_id) or 0
+
+def bump(targets: Iterable[Target]):
+    """Increment the version of each (resource_type, object_id) (upsert per key)."""
+    for resource_type, object_id in dict.fromkeys((t, str(i)) for t, i in targets):
+        key = {"resource_type": resource_type, "object_id": object_id}
+        if ResourceVersion.objects.filter(**key).update(version=F("version") + 1):
+            continue
+        try:
+            with transaction.atomic():
+                ResourceVersion.objects.create(**key, version=1)
+        except IntegrityError:   # another writer created the row first
+            ResourceVersion.objects.filter(**key).update(version=F("version") + 1)
+
+def etag(version: int) -> str:
+    return f'W/"{version}"'
+
+def _matches(if_none_match: str, version: int) -> bool:
+    wanted = {etag(version), f'"{version}"'}
+    return any(tag.strip() in wanted for tag in if_none_match.split(","))
+
+def cache_key(resource_type: str, object_id, version: int, variant: str = "") -> str:
+    return f"{KEY_PREFIX}:{resource_type}:{object_id}:{version}:{variant}"
+
+def cached_response(request, resource_type: str, object_id, build: Callable[[], dict],
+                    variant: str = "") -> HttpResponse:
+    """
+    Serve `build()` (which may raise Http404) through the versioned cache.
+    `variant` separates different renderings of the same resource version.
+    A 304 needs a version row or a cached body, i.e. proof the resource was
+    there; an unversioned id that was never served goes through build() so
+    a missing one still 404s.
+    """
+    stored = stored_version(resource_type, object_id)
+    version = stored or 0
+    tag = etag(version)
+    key = cache_key(resource_type, object_id, version, variant)
+    body = cache.get(key)
+    if _matches(request.headers.get("If-None-Match", ""), version) and (stored is not None or body is not None):
+        resp = HttpResponseNotModified()
+        resp["ETag"] = tag
+        return resp
+    if body is None:
+        res = dict(build())
+        res["meta"] = {**(res.get("meta") or {}), "versionId": str(version)}
+        body = json.dumps(res, default=str)
+        cache.set(key, body, CACHE_TIMEOUT)
+    resp = HttpResponse(body, content_type="application/json")
+    resp["ETag"] = tag
+    return resp
@@ -32,7 +32,17 @@ def patient_to_fhir(patient):
     return res
 
 
-def practitioner_to_fhir(provider):
+def _latest_dea(regs):
+    # latest expiry first, undated registrations last
+    regs = list(regs)
+    dated = [d for d in regs if getattr(d,'expiry',None)]
+    if dated:
+        return max(dated, key=lambda d: d.expiry)
+    return regs[0] if regs else None
+
+def practitioner_to_fhir(provider, dea_regs=None, licenses=None):
+    # dea_regs / licenses: pass prefetched rows (e.g. provider.dea_regs.all()) when mapping in bulk;
+    # None falls back to one query each
     def _clean(v): return (v or '').strip()
     last = _clean(getattr(provider,'last_name',''))
     first = _clean(getattr(provider,'first_name',''))
@@ -46,8 +56,10 @@ def practitioner_to_fhir(provider):
     npi = _clean(getattr(provider,'npi',''))
     if npi: idents.append({'system':'http://hl7.org/fhir/sid/us-npi','value': npi})
     try:
-        from apps.registry.models import ProviderDEARegistration
-        dea = ProviderDEARegistration.objects.filter(provider=provider).order_by('-expiry').first()
+        if dea_regs is None:
+            from apps.registry.models import ProviderDEARegistration
+            dea_regs = ProviderDEARegistration.objects.filter(provider=provider)
+        dea = _latest_dea(dea_regs)
         if dea and _clean(getattr(dea,'dea_number','')):
             idents.append({'system':'urn:dea','value': _clean(getattr(dea,'dea_number',''))})
     except Exception:
@@ -56,8 +68,10 @@ def practitioner_to_fhir(provider):
     # qualifications (state licenses)
     quals = []
     try:
-        from apps.registry.models import ProviderLicense
-        for lic in ProviderLicense.objects.filter(provider=provider).order_by('state'):
+        if licenses is None:
+            from apps.registry.models import ProviderLicense
+            licenses = ProviderLicense.objects.filter(provider=provider)
+        for lic in sorted(licenses, key=lambda l: (l.state or '', l.id or 0)):
             quals.append({
                 'identifier':[{'system':'urn:state-license','value': _clean(getattr(lic,'number',''))}],
                 'code': {'text':'State License'},
@@ -286,3 +300,18 @@ def practitioner_role_from_facility(provider, pf):
         "practitioner": {"reference": f"Practitioner/{getattr(provider,'id','')}"},
         "organization": {"reference": f"Organization/{getattr(pf,'facility_id','')}"}
     }
+
+
+def practitioner_roles(provider, facilities=None, credentials=None):
+    # Facility roles, then payer-credential roles by payer name. Pass prefetched
+    # facilities / credentials (with payer joined) when mapping in bulk;
+    # None falls back to one query each.
+    if facilities is None:
+        from apps.registry.models import ProviderFacility
+        facilities = ProviderFacility.objects.filter(provider=provider).order_by('id')
+    if credentials is None:
+        from apps.registry.models import ProviderPayerCredential
+        credentials = ProviderPayerCredential.objects.filter(provider=provider).select_related('payer').order_by('payer__name', 'id')
+    roles = [practitioner_role_from_facility(provider, pf) for pf in facilities]
+    roles += [practitioner_role_from_credential(provider, c) for c in credentials]
+    return roles
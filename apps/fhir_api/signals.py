@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+
+from apps.billing.models import Superbill
+from apps.chart.models import Encounter, SoapNote
+from apps.patients.models import Patient
+from apps.registry.models import (Coverage, Facility, Payer, Provider, ProviderDEARegistration,
+                                  ProviderLicense)
+
+from . import resource_cache
+
+# source model -> instance -> [(resource_type, object_id)] whose served JSON depends on it
+TARGETS = {
+    Patient: lambda o: [("Patient", o.pk)],
+    Provider: lambda o: [("Practitioner", o.pk), ("PractitionerRole", o.pk)],
+    ProviderDEARegistration: lambda o: [("Practitioner", o.provider_id)],
+    ProviderLicense: lambda o: [("Practitioner", o.provider_id)],
+    Payer: lambda o: [("Organization", f"payer-{o.pk}")],
+    Facility: lambda o: [("Organization", f"facility-{o.pk}")],
+    Coverage: lambda o: [("Coverage", o.pk)],
+    Encounter: lambda o: [("Encounter", o.pk), ("DocumentReference", f"soap-{o.pk}")],
+    SoapNote: lambda o: [("DocumentReference", f"soap-{o.encounter_id}")],
+    Superbill: lambda o: [("Claim", o.pk)],
+}
+
+def _source_changed(sender, instance, **kwargs):
+    resource_cache.bump(TARGETS[sender](instance))
+
+def connect():
+    for model in TARGETS:
+        post_save.connect(_source_changed, sender=model, dispatch_uid=f"fhir-cache-{model.__name__}-save")
+        post_delete.connect(_source_changed, sender=model, dispatch_uid=f"fhir-cache-{model.__name__}-delete")
@@ -0,0 +1,35 @@
+# apps/fhir_api/tests/test_bulk_export.py
+import gzip
+import json
+from datetime import date
+from django.test import Client
+from apps.chart.models import ConditionEntry
+from apps.compliance.models import DisclosureLog
+from apps.fhir_api import bulk_export
+from apps.patients.models import Patient
+
+def test_kickoff_worker_status_and_download(db, settings, tmp_path):
+    settings.FHIR_EXPORT_DIR = str(tmp_path)
+    a = Patient.objects.create(first_name="A", last_name="B", date_of_birth=date(1980, 1, 1))
+    b = Patient.objects.create(first_name="C", last_name="D", date_of_birth=date(1990, 1, 1))
+    ConditionEntry.objects.create(patient=a, code="I10")
+
+    c = Client()
+    resp = c.get("/fhir/$export", {"_type": "Patient,Condition"})
+    assert resp.status_code == 202
+    status_url = resp["Content-Location"]
+    assert c.get(status_url).status_code == 202
+
+    job = bulk_export.claim_next()
+    bulk_export.run_job(job, processes=1)
+    assert bulk_export.claim_next() is None
+
+    manifest = c.get(status_url).json()
+    assert {o["type"]: o["count"] for o in manifest["output"]} == {"Patient": 2, "Condition": 1}
+    condition_url = next(o["url"] for o in manifest["output"] if o["type"] == "Condition")
+    body = gzip.decompress(b"".join(c.get(condition_url).streaming_content)).decode()
+    assert [json.loads(line)["code"]["coding"][0]["code"] for line in body.splitlines()] == ["I10"]
+    assert sorted(DisclosureLog.objects.filter(meta__job_id=job.id).values_list("patient_id", flat=True)) == [a.id, b.id]
+
+def test_kickoff_rejects_unknown_type(db):
+    assert Client().get("/fhir/$export", {"_type": "Medication"}).status_code == 400
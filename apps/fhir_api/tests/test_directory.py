@@ -0,0 +1,61 @@
+# apps/fhir_api/tests/test_directory.py
+import json
+from datetime import date
+from django.test import Client
+from apps.registry.models import (Facility, Payer, Provider, ProviderDEARegistration, ProviderFacility,
+                                  ProviderLicense, ProviderPayerCredential)
+
+def _directory(n):
+    fac = Facility.objects.create(name="Main St Clinic")
+    payers = [Payer.objects.create(name=name) for name in ("Zeta Health", "Acme Ins")]
+    for i in range(n):
+        pr = Provider.objects.create(first_name=f"F{i}", last_name=f"L{i}")
+        ProviderDEARegistration.objects.create(provider=pr, dea_number=f"AB{i}old", expiry=date(2020, 1, 1))
+        ProviderDEARegistration.objects.create(provider=pr, dea_number=f"AB{i}new", expiry=date(2030, 1, 1))
+        ProviderLicense.objects.create(provider=pr, state="WI", number=f"W{i}")
+        ProviderLicense.objects.create(provider=pr, state="IL", number=f"I{i}")
+        ProviderFacility.objects.create(provider=pr, facility=fac)
+        for payer in payers:
+            ProviderPayerCredential.objects.create(provider=pr, payer=payer)
+
+def _get(url, **params):
+    resp = Client().get(url, params)
+    assert resp.status_code == 200, resp.content
+    return json.loads(resp.content)
+
+def test_pages_with_constant_queries(db, django_assert_num_queries):
+    _directory(6)
+    with django_assert_num_queries(5):
+        page = _get("/fhir/Practitioner", _count=4, _include="PractitionerRole")
+    matches = [e["resource"] for e in page["entry"] if e["search"]["mode"] == "match"]
+    roles = [e["resource"] for e in page["entry"] if e["search"]["mode"] == "include"]
+    assert len(matches) == 4 and len(roles) == 12
+    assert [i["value"] for i in matches[0]["identifier"]] == ["AB0new"]
+    assert [q["issuer"]["display"] for q in matches[0]["qualification"]] == ["IL", "WI"]
+    assert roles[1]["organization"]["display"] == "Acme Ins"
+
+    nxt = [link["url"] for link in page["link"] if link["relation"] == "next"][0]
+    with django_assert_num_queries(5):
+        rest = json.loads(Client().get(nxt).content)
+    assert len([e for e in rest["entry"] if e["search"]["mode"] == "match"]) == 2
+    assert not [link for link in rest["link"] if link["relation"] == "next"]
+
+def test_without_include_skips_role_queries(db, django_assert_num_queries):
+    _directory(3)
+    with django_assert_num_queries(3):
+        page = _get("/fhir/Practitioner", name="L1")
+    assert [e["resource"]["id"] for e in page["entry"]] == [str(Provider.objects.get(last_name="L1").id)]
+
+def test_single_reads_match_search_mapping(db):
+    _directory(1)
+    pr = Provider.objects.get()
+    single = _get(f"/fhir/Practitioner/{pr.id}")
+    searched = _get("/fhir/Practitioner")["entry"][0]["resource"]
+    single.pop("meta")
+    assert single == searched
+    roles = _get(f"/fhir/PractitionerRole/provider/{pr.id}")["entry"]
+    assert len(roles) == 3
+
+def test_bad_params(db):
+    for params in ({"_count": "x"}, {"_include": "Organization"}, {"identifier": "urn:other|1"}):
+        assert Client().get("/fhir/Practitioner", params).status_code == 400
@@ -0,0 +1,53 @@
+# apps/fhir_api/tests/test_everything.py
+import json
+from datetime import date, timedelta
+from django.test import Client
+from django.utils import timezone
+from apps.chart.models import AllergyEntry, ConditionEntry, Encounter, SoapNote, VitalSign
+from apps.patients.models import Patient
+
+def _get(url, **params):
+    resp = Client().get(url, params)
+    assert resp.status_code == 200, resp.content
+    return json.loads(b"".join(resp.streaming_content))
+
+def _patient_with_history(n_conditions=5):
+    p = Patient.objects.create(first_name="A", last_name="B", date_of_birth=date(1980, 1, 1))
+    enc = Encounter.objects.create(patient=p)
+    SoapNote.objects.create(encounter=enc, assessment="ok")
+    VitalSign.objects.create(encounter=enc, patient=p, code="8867-4", value=70)
+    for i in range(n_conditions):
+        ConditionEntry.objects.create(patient=p, code=f"C{i}")
+    AllergyEntry.objects.create(patient=p, substance_code="PCN")
+    return p
+
+def test_pages_cover_every_resource_once(db, django_assert_max_num_queries):
+    p = _patient_with_history()
+    url = f"/fhir/Patient/{p.id}/$everything"
+    with django_assert_max_num_queries(8):
+        page = _get(url, _count=4)
+    seen = [e["resource"]["resourceType"] for e in page["entry"]]
+    assert seen == ["Patient", "Encounter", "DocumentReference", "Observation"]
+    while True:
+        nxt = [link["url"] for link in page["link"] if link["relation"] == "next"]
+        if not nxt:
+            break
+        page = json.loads(b"".join(Client().get(nxt[0]).streaming_content))
+        seen += [e["resource"]["resourceType"] for e in page["entry"]]
+    assert seen.count("Condition") == 5 and seen[-1] == "AllergyIntolerance"
+
+def test_since_and_type_filters(db):
+    p = _patient_with_history(n_conditions=2)
+    ConditionEntry.objects.filter(code="C0").update(updated_at=timezone.now() - timedelta(days=10))
+    since = (timezone.now() - timedelta(days=1)).isoformat()
+    page = _get(f"/fhir/Patient/{p.id}/$everything", _type="Condition", _since=since)
+    assert [e["resource"]["code"]["coding"][0]["code"] for e in page["entry"]] == ["C1"]
+    assert Client().get(f"/fhir/Patient/{p.id}/$everything", {"_type": "Nope"}).status_code == 400
+    assert Client().get("/fhir/Patient/999999/$everything").status_code == 404
+
+def test_since_applies_to_patient(db):
+    p = _patient_with_history(n_conditions=1)
+    assert _get(f"/fhir/Patient/{p.id}/$everything", _since="2999-01-01")["entry"] == []
+    since = (timezone.now() - timedelta(days=1)).isoformat()
+    page = _get(f"/fhir/Patient/{p.id}/$everything", _type="Patient", _since=since)
+    assert [e["resource"]["resourceType"] for e in page["entry"]] == ["Patient"]
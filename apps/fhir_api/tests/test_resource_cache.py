@@ -0,0 +1,56 @@
+# apps/fhir_api/tests/test_resource_cache.py
+import json
+from datetime import date
+from django.core.cache import cache
+from django.test import Client
+from apps.patients.models import Patient
+from apps.registry.models import Provider, ProviderLicense
+from apps.fhir_api import resource_cache
+
+def _patient():
+    cache.clear()
+    return Patient.objects.create(first_name="Ann", last_name="Lee", date_of_birth=date(1980, 1, 1))
+
+def test_etag_and_version_follow_saves(db):
+    p = _patient()
+    first = Client().get(f"/fhir/Patient/{p.id}")
+    body = json.loads(first.content)
+    assert first["ETag"] == 'W/"1"' and body["meta"]["versionId"] == "1"
+
+    p.last_name = "Park"
+    p.save()
+    second = Client().get(f"/fhir/Patient/{p.id}")
+    assert second["ETag"] == 'W/"2"'
+    assert json.loads(second.content)["name"][0]["family"] == "Park"
+
+def test_if_none_match_skips_mapper(db, django_assert_num_queries, monkeypatch):
+    p = _patient()
+    tag = Client().get(f"/fhir/Patient/{p.id}")["ETag"]
+    monkeypatch.setattr("apps.fhir_api.views.patient_to_fhir", lambda *a: 1 / 0)
+    with django_assert_num_queries(1):
+        resp = Client().get(f"/fhir/Patient/{p.id}", HTTP_IF_NONE_MATCH=tag)
+    assert resp.status_code == 304 and resp["ETag"] == tag
+    # a cache hit on an unconditional read does not map either
+    with django_assert_num_queries(1):
+        assert Client().get(f"/fhir/Patient/{p.id}").status_code == 200
+
+def test_related_rows_bump_practitioner(db):
+    cache.clear()
+    pr = Provider.objects.create(first_name="Doc", last_name="Who", npi="1234567893")
+    v = resource_cache.current_version("Practitioner", pr.id)
+    ProviderLicense.objects.create(provider=pr, state="IL", number="036-1")
+    assert resource_cache.current_version("Practitioner", pr.id) == v + 1
+    resp = json.loads(Client().get(f"/fhir/Practitioner/{pr.id}").content)
+    assert resp["qualification"][0]["identifier"][0]["value"] == "036-1"
+
+def test_deleted_resource_is_not_served_from_cache(db):
+    p = _patient()
+    assert Client().get(f"/fhir/Patient/{p.id}").status_code == 200
+    pk = p.id
+    p.delete()
+    assert Client().get(f"/fhir/Patient/{pk}").status_code == 404
+
+def test_unknown_id_with_version_zero_etag_is_404(db):
+    cache.clear()
+    resp = Client().get("/fhir/Patient/987654", HTTP_IF_NONE_MATCH='W/"0"')
+    assert resp.status_code == 404
@@ -9,6 +9,9 @@ from .views import (
 
 urlpatterns = [
     path('ping', views.FHIRPing.as_view(), name='fhir-ping'),
+    path('$export', views.BulkExportKickoff.as_view(), name='fhir-bulk-export'),
+    path('$export-status/<int:job_id>', views.BulkExportStatus.as_view(), name='fhir-bulk-status'),
+    path('$export-file/<int:job_id>/<str:resource_type>.ndjson', views.BulkExportFile.as_view(), name='fhir-bulk-file'),
     path('Organization/facility/<int:pk>', views.OrganizationFromFacility.as_view(), name='fhir-org-fac'),
     path('ClaimResponse/<int:pk>', views.ClaimResponseView.as_view(), name='fhir-claimresponse'),
     path('PractitionerRole/provider/<int:pk>', views.PractitionerRoleForProvider.as_view(), name='fhir-practitionerrole-bundle'),
@@ -20,7 +23,9 @@ urlpatterns = [
     path('Coverage/<int:pk>', views.CoverageResource.as_view(), name='fhir-coverage'),
     path('Organization/payer/<int:pk>', views.OrganizationFromPayer.as_view(), name='fhir-org-from-payer'),
     path('PractitionerRole/<int:pk>', views.PractitionerRoleResource.as_view(), name='fhir-practitionerrole'),
+    path('Practitioner', views.PractitionerSearch.as_view(), name='fhir-practitioner-search'),
     path('Practitioner/<int:pk>', views.PractitionerResource.as_view(), name='fhir-practitioner'),
+    path('Patient/<int:pk>/$everything', views.PatientEverything.as_view(), name='fhir-patient-everything-op'),
     path('Patient/<int:pk>/everything', views.PatientEverything.as_view(), name='fhir-patient-everything'),
     path('Patient/<int:pk>', views.PatientResource.as_view(), name='fhir-patient'),
     path('health', views.FHIRHealthView.as_view(), name='fhir-health'),
@@ -1,14 +1,16 @@
-from .resources import practitioner_role_from_credential, practitioner_to_fhir
-from apps.registry.models import Provider as DbProvider, ProviderPayerCredential as DbCred
-from .resources import patient_to_fhir, coverage_to_fhir, encounter_to_fhir, documentreference_soap, observation_from_vital, condition_to_fhir, allergy_to_fhir
-from .resources import patient_to_fhir, practitioner_to_fhir, practitioner_role_to_fhir, organization_from_payer, coverage_to_fhir, encounter_to_fhir, documentreference_soap, claim_from_superbill, observation_from_vital, condition_to_fhir, allergy_to_fhir
-from django.http import JsonResponse
+from .resources import practitioner_to_fhir
+from apps.registry.models import Provider as DbProvider
+from .resources import patient_to_fhir, coverage_to_fhir, encounter_to_fhir, documentreference_soap, observation_from_vital
+from .resources import patient_to_fhir, practitioner_to_fhir, practitioner_role_to_fhir, organization_from_payer, coverage_to_fhir, encounter_to_fhir, documentreference_soap, claim_from_superbill, observation_from_vital
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.http import Http404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.request import Request
 
+from . import resource_cache
+
 from datetime import datetime, timezone
 
 from fhir.resources.patient import Patient as FhirPatient
@@ -92,12 +94,14 @@ class PatientBundleView(APIView):
     def get(self, request: Request, pk: int):
         if DbPatient is None:
             raise Http404("Patient model not available")
-        dbp = get_object_or_404(DbPatient, pk=pk)
-        patient_res = FhirPatient(**fhir_patient_dict(dbp))
-        bundle = Bundle.construct()
-        bundle.type = "collection"
-        bundle.entry = [{"resource": patient_res.dict()}]
-        return Response(bundle.dict())
+        def build():
+            dbp = get_object_or_404(DbPatient, pk=pk)
+            patient_res = FhirPatient(**fhir_patient_dict(dbp))
+            bundle = Bundle.construct()
+            bundle.type = "collection"
+            bundle.entry = [{"resource": patient_res.dict()}]
+            return bundle.dict()
+        return resource_cache.cached_response(request, "Patient", pk, build, variant="bundle")
 
 class FirstPatientBundleView(APIView):
     def get(self, request: Request):
@@ -116,9 +120,10 @@ class PatientResourceView(APIView):
     def get(self, request: Request, pk: int):
         if DbPatient is None:
             raise Http404("Patient model not available")
-        dbp = get_object_or_404(DbPatient, pk=pk)
-        patient_res = FhirPatient(**fhir_patient_dict(dbp))
-        return Response(patient_res.dict())
+        def build():
+            dbp = get_object_or_404(DbPatient, pk=pk)
+            return FhirPatient(**fhir_patient_dict(dbp)).dict()
+        return resource_cache.cached_response(request, "Patient", pk, build, variant="validated")
 
 class CapabilityStatementView(APIView):
     def get(self, request: Request):
@@ -133,16 +138,20 @@ class CapabilityStatementView(APIView):
             rest=[{
                 "mode": "server",
                 "resource": [
-                    {"type": "Patient", "interaction": [{"code": "read"}, {"code": "search-type"}]}
+                    {"type": "Patient", "interaction": [{"code": "read"}, {"code": "search-type"}]},
+                    {"type": "Practitioner", "interaction": [{"code": "read"}, {"code": "search-type"}]}
                 ]
             }]
         )
         return Response(cs.dict())
 from apps.registry.models import Provider as DbProvider, Payer as DbPayer, Coverage as DbCoverage
-from apps.chart.models import Encounter as DbEncounter, VitalSign as DbVital, ConditionEntry as DbCondition, AllergyEntry as DbAllergy, SoapNote as DbSoap
+from apps.chart.models import Encounter as DbEncounter, VitalSign as DbVital, SoapNote as DbSoap
 from apps.billing.models import Superbill as DbSuperbill
 
 
+def _outcome(status, diagnostics, code="processing"):
+    return JsonResponse({"resourceType":"OperationOutcome","issue":[{"severity":"error","code":code,"diagnostics":diagnostics}]}, status=status)
+
 class FHIRHealthView(APIView):
     def get(self, request: Request):
         # quick smoke of first records; do not fail if missing
@@ -176,49 +185,71 @@ class FHIRHealthView(APIView):
 
 class PatientResource(APIView):
     def get(self, request: Request, pk: int):
-        p = get_object_or_404(DbPatient, pk=pk)
-        return JsonResponse(patient_to_fhir(p))
+        return resource_cache.cached_response(
+            request, "Patient", pk, lambda: patient_to_fhir(get_object_or_404(DbPatient, pk=pk)))
 
 
 class PractitionerResource(APIView):
     def get(self, request: Request, pk: int):
-        pr = get_object_or_404(DbProvider, pk=pk)
-        return JsonResponse(practitioner_to_fhir(pr))
+        return resource_cache.cached_response(
+            request, "Practitioner", pk, lambda: practitioner_to_fhir(get_object_or_404(DbProvider, pk=pk)))
+
+class PractitionerSearch(APIView):
+    """
+    GET Practitioner?: paged provider directory as a searchset Bundle.
+    ?name= (first/last name prefix), ?identifier=[system|]NPI, ?_count=N
+    (follow the `next` link) and ?_include=PractitionerRole to add each
+    provider's facility and payer-credential roles.
+    """
+    def get(self, request: Request):
+        try:
+            query = directory.parse_params(request.GET)
+        except directory.DirectoryError as e:
+            return _outcome(400, str(e), code="invalid")
+
+        def next_url(cursor):
+            params = request.GET.copy()
+            params["_cursor"] = cursor
+            return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+        return JsonResponse(directory.search_bundle(query, request.build_absolute_uri(), next_url))
 
 class PractitionerRoleResource(APIView):
     def get(self, request: Request, pk: int):
-        pr = get_object_or_404(DbProvider, pk=pk)
         # we don't have organization/facility id; return bare role
-        return JsonResponse(practitioner_role_to_fhir(pr))
+        return resource_cache.cached_response(
+            request, "PractitionerRole", pk, lambda: practitioner_role_to_fhir(get_object_or_404(DbProvider, pk=pk)))
 
 class OrganizationFromPayer(APIView):
     def get(self, request: Request, pk: int):
-        payer = get_object_or_404(DbPayer, pk=pk)
-        return JsonResponse(organization_from_payer(payer))
+        return resource_cache.cached_response(
+            request, "Organization", f"payer-{pk}", lambda: organization_from_payer(get_object_or_404(DbPayer, pk=pk)))
 
 class CoverageResource(APIView):
     def get(self, request: Request, pk: int):
-        cov = get_object_or_404(DbCoverage, pk=pk)
-        return JsonResponse(coverage_to_fhir(cov))
+        return resource_cache.cached_response(
+            request, "Coverage", pk, lambda: coverage_to_fhir(get_object_or_404(DbCoverage, pk=pk)))
 
 class EncounterResource(APIView):
     def get(self, request: Request, pk: int):
-        enc = get_object_or_404(DbEncounter, pk=pk)
-        return JsonResponse(encounter_to_fhir(enc))
+        return resource_cache.cached_response(
+            request, "Encounter", pk, lambda: encounter_to_fhir(get_object_or_404(DbEncounter, pk=pk)))
 
 class DocumentReferenceSoap(APIView):
     def get(self, request: Request, pk: int):
-        enc = get_object_or_404(DbEncounter, pk=pk)
-        try:
-            soap = DbSoap.objects.filter(encounter=enc).first()
-        except Exception:
-            soap = None
-        return JsonResponse(documentreference_soap(enc, soap))
+        def build():
+            enc = get_object_or_404(DbEncounter, pk=pk)
+            try:
+                soap = DbSoap.objects.filter(encounter=enc).first()
+            except Exception:
+                soap = None
+            return documentreference_soap(enc, soap)
+        return resource_cache.cached_response(request, "DocumentReference", f"soap-{pk}", build)
 
 class ClaimFromSuperbill(APIView):
     def get(self, request: Request, pk: int):
-        sb = get_object_or_404(DbSuperbill, pk=pk)
-        return JsonResponse(claim_from_superbill(sb))
+        return resource_cache.cached_response(
+            request, "Claim", pk, lambda: claim_from_superbill(get_object_or_404(DbSuperbill, pk=pk)))
 
 from apps.registry.models import Coverage as DbCoverage
 
@@ -242,7 +273,8 @@ class CoverageEligibilityResponseView(APIView):
         }
         return JsonResponse(out)
 
-from .resources import vitals_bundle_from_encounter, observation_from_vital
+from .resources import vitals_bundle_from_encounter, observation_from_vital, practitioner_roles
+from . import directory, everything
 
 class VitalsObservationBundle(APIView):
     def get(self, request: Request, pk: int):
@@ -262,61 +294,30 @@ class VitalsObservationBundle(APIView):
 
 
 class PatientEverything(APIView):
-    """Bundle: Patient + Coverages + last Encounter (+ SOAP) + vitals + problems + allergies."""
+    """
+    Patient/{id}/$everything: Patient, Coverages, Encounters, SOAP notes,
+    vitals, problems and allergies as a streamed searchset Bundle.
+    ?_count=N pages (follow the `next` link), ?_since=<instant> keeps only
+    resources updated after it, ?_type=Condition,Observation narrows types.
+    """
     def get(self, request: Request, pk: int):
         try:
             p = DbPatient.objects.get(pk=pk)
         except DbPatient.DoesNotExist:
-            return JsonResponse({"resourceType":"OperationOutcome","issue":[{"severity":"error","diagnostics":"Patient not found"}]}, status=404)
-
-        bundle = {"resourceType":"Bundle","type":"collection","entry":[]}
-
-        # Patient
-        bundle["entry"].append({"resource": patient_to_fhir(p)})
-
-        # Coverages
-        try:
-            from apps.registry.models import Coverage as DbCoverage
-            for cov in DbCoverage.objects.filter(patient=p).order_by("-is_primary","priority","id")[:10]:
-                bundle["entry"].append({"resource": coverage_to_fhir(cov)})
-        except Exception:
-            pass
-
-        # Last encounter + SOAP + vitals (fallback to patient-level vitals if none on encounter)
+            return _outcome(404, "Patient not found", code="not-found")
         try:
-            enc = DbEncounter.objects.filter(patient=p).order_by("-id").first()
-            if enc:
-                bundle["entry"].append({"resource": encounter_to_fhir(enc)})
-                try:
-                    from apps.chart.models import SoapNote as DbSoap
-                    soap = DbSoap.objects.filter(encounter=enc).first()
-                except Exception:
-                    soap = None
-                bundle["entry"].append({"resource": documentreference_soap(enc, soap)})
-
-                vit_qs = list(DbVital.objects.filter(encounter=enc).order_by("id")[:50])
-                if not vit_qs:
-                    vit_qs = list(DbVital.objects.filter(patient=p).order_by("-id")[:50])
-                for v in vit_qs:
-                    bundle["entry"].append({"resource": observation_from_vital(v)})
-        except Exception:
-            pass
-
-        # Problems
-        try:
-            for c in DbCondition.objects.filter(patient=p).order_by("-id")[:50]:
-                bundle["entry"].append({"resource": condition_to_fhir(c)})
-        except Exception:
-            pass
+            query = everything.parse_params(request.GET)
+        except everything.EverythingError as e:
+            return _outcome(400, str(e), code="invalid")
 
-        # Allergies
-        try:
-            for a in DbAllergy.objects.filter(patient=p).order_by("-id")[:50]:
-                bundle["entry"].append({"resource": allergy_to_fhir(a)})
-        except Exception:
-            pass
+        def next_url(cursor):
+            params = request.GET.copy()
+            params["_cursor"] = cursor
+            return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
 
-        return JsonResponse(bundle)
+        page = everything.EverythingPage(p, query)
+        body = everything.stream_bundle(page, request.build_absolute_uri(), next_url)
+        return StreamingHttpResponse(body, content_type="application/fhir+json")
 
 class PractitionerRoleForProvider(APIView):
     # Returns a Bundle of PractitionerRole resources (one per payer credential). Falls back to single role if none.
@@ -325,21 +326,7 @@ class PractitionerRoleForProvider(APIView):
             pr = DbProvider.objects.get(pk=pk)
         except DbProvider.DoesNotExist:
             return JsonResponse({"resourceType":"OperationOutcome","issue":[{"severity":"error","diagnostics":"Provider not found"}]}, status=404)
-        roles = []
-        # Facility-based roles (if linked)
-        try:
-            pfs = DbPF.objects.filter(provider=pr).select_related('facility')
-            for pf in pfs:
-                roles.append({"resource": practitioner_role_from_facility(pr, pf)})
-        except Exception:
-            pass
-
-        try:
-            creds = DbCred.objects.filter(provider=pr).select_related('payer').order_by('payer__name')
-            for c in creds:
-                roles.append({"resource": practitioner_role_from_credential(pr, c)})
-        except Exception:
-            pass
+        roles = [{"resource": r} for r in practitioner_roles(pr)]
         if not roles:
             # no credentials -> return a minimal single role as a Bundle for consistency
             roles = [{"resource": {"resourceType":"PractitionerRole","id": f"role-{pr.id}","practitioner":{"reference": f"Practitioner/{pr.id}"}}}]
@@ -381,20 +368,78 @@ class ClaimResponseView(APIView):
         
         return JsonResponse(out)
 
-from apps.registry.models import ProviderFacility as DbPF
-from .resources import organization_from_facility, practitioner_role_from_facility
+from .resources import organization_from_facility
 
 class OrganizationFromFacility(APIView):
     def get(self, request: Request, pk: int):
         from apps.registry.models import Facility as DbFacility
         try:
-            fac = DbFacility.objects.get(pk=pk)
+            return resource_cache.cached_response(
+                request, "Organization", f"facility-{pk}", lambda: organization_from_facility(DbFacility.objects.get(pk=pk)))
         except DbFacility.DoesNotExist:
             return JsonResponse({"resourceType":"OperationOutcome","issue":[{"severity":"error","diagnostics":"Facility not found"}]}, status=404)
-        return JsonResponse(organization_from_facility(fac))
 
 # facility roles will be added inside view body at runtime
 
 class FHIRPing(APIView):
     def get(self, request: Request):
         return JsonResponse({"ok": True, "pong": True})
+
+import os
+from django.http import FileResponse
+from django.urls import reverse
+from apps.compliance.models import ExportJob
+from . import bulk_export
+
+class BulkExportKickoff(APIView):
+    """
+    System-level $export kick-off (FHIR Bulk Data): ?_type=Patient,Condition&_since=<instant>.
+    Queues an ExportJob and answers 202 with Content-Location pointing at the status URL.
+    """
+    def get(self, request: Request):
+        try:
+            since = everything.parse_since(request.GET.get("_since"))
+            types = [t.strip() for t in (request.GET.get("_type") or "").split(",") if t.strip()]
+            job = bulk_export.kick_off(types, since, requested_by=getattr(request, "user", None),
+                                       request_url=request.build_absolute_uri())
+        except ValueError as e:
+            return _outcome(400, str(e), code="invalid")
+        resp = JsonResponse({}, status=202)
+        resp["Content-Location"] = request.build_absolute_uri(reverse("fhir-bulk-status", args=[job.id]))
+        return resp
+
+class BulkExportStatus(APIView):
+    """Polling: 202 + X-Progress while queued/running, 200 + manifest when done, 500 on failure."""
+    def get(self, request: Request, job_id: int):
+        job = ExportJob.objects.filter(pk=job_id, scope=bulk_export.SCOPE).first()
+        if job is None:
+            return _outcome(404, "Export job not found", code="not-found")
+        if job.status in ("QUEUED", "PROCESSING"):
+            resp = JsonResponse({}, status=202)
+            resp["X-Progress"] = job.status.lower()
+            resp["Retry-After"] = "10"
+            return resp
+        if job.status == "FAILED":
+            return _outcome(500, job.meta.get("error") or "Export failed", code="exception")
+        output = [{"type": o["type"], "count": o["count"],
+                   "url": request.build_absolute_uri(reverse("fhir-bulk-file", args=[job.id, o["type"]]))}
+                  for o in job.meta.get("output", [])]
+        return JsonResponse({
+            "transactionTime": job.requested_at.isoformat(),
+            "request": job.meta.get("request", ""),
+            "requiresAccessToken": False,
+            "output": output,
+            "error": [],
+        })
+
+class BulkExportFile(APIView):
+    def get(self, request: Request, job_id: int, resource_type: str):
+        job = ExportJob.objects.filter(pk=job_id, scope=bulk_export.SCOPE, status="COMPLETED").first()
+        if job is None or resource_type not in bulk_export.EXPORT_TYPES:
+            return _outcome(404, "Export file not found", code="not-found")
+        path = os.path.join(job.location, bulk_export.file_name(resource_type))
+        if not os.path.exists(path):
+            return _outcome(404, "Export file not found", code="not-found")
+        resp = FileResponse(open(path, "rb"), content_type="application/fhir+ndjson")
+        resp["Content-Encoding"] = "gzip"
+        return resp
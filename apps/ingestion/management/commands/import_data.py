@@ -46,6 +46,9 @@ def _normalize_values(app_label: str, model_name: str, values: dict):
 
     return values
 
+# Models whose rows feed the claims edit cache (apps.claims.edit_cache).
+EDIT_TABLE_MODELS = {("claims", "mue"), ("claims", "ncciedit")}
+
 def _validate_foreign_keys(app_label: str, model_name: str, values: dict, ds_id: str):
     """
     Minimal FK validation for known datasets:
@@ -86,6 +89,7 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING("No datasets in manifest."))
             return
 
+        edit_datasets = []
         for ds in datasets:
             ds_id = ds.get("id")
             desc = ds.get("description", "")
@@ -148,4 +152,12 @@ class Command(BaseCommand):
 
                 self.stdout.write(self.style.SUCCESS(f"[{ds_id}] rows processed: {count}; provenance id={prov.id}"))
 
+            if (app_label, model_name.lower()) in EDIT_TABLE_MODELS:
+                edit_datasets.append(ds_id)
+
+        if edit_datasets:
+            from apps.claims.edit_cache import bump_version
+            version = bump_version(note=f"import_data: {', '.join(edit_datasets)}")
+            self.stdout.write(self.style.NOTICE(f"Edit tables changed -> version {version}"))
+
         self.stdout.write(self.style.SUCCESS("All datasets imported."))
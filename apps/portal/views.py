@@ -3,17 +3,18 @@ from django.urls import reverse
 from django.contrib import messages
 
 from apps.patients.models import Patient, Coverage
-from apps.claims.models import Claim, EdiExport, Denial, DenialStatusHistory
+from apps.claims.models import Claim, EdiExport, Denial
 from apps.claims.scrubber import run_scrubber
+from apps.claims.denials import set_status
 # If these helpers exist in your repo, keep them. If not, you can comment them out.
 try:
     from apps.claims.autofix import propose_changes, apply_changes
 except Exception:
     propose_changes = apply_changes = None
 try:
-    from apps.claims.x12_837p import build_and_write_837p
+    from apps.claims.x12_837p import write_837p_batch
 except Exception:
-    build_and_write_837p = None
+    write_837p_batch = None
 
 def spa(request):
     return render(request, "portal/spa.html")
@@ -24,7 +25,8 @@ def dashboard(request):
         "coverages": Coverage.objects.count(),
         "claims": Claim.objects.count(),
         "exports": EdiExport.objects.count(),
-        "errors": Claim.objects.filter(findings__severity="ERROR").distinct().count(),
+        "errors": Claim.objects.filter(findings__severity="ERROR",
+                                       findings__resolved_at__isnull=True).distinct().count(),
     }
     return render(request, "portal/dashboard.html", {"counts": counts})
 
@@ -43,7 +45,8 @@ def claim_detail(request, pk: int):
         "c": c,
         "lines": list(c.lines.all()),
         "dx": list(c.diagnoses.order_by("order")),
-        "findings": list(c.findings.all().values("code","severity","message","suggestion")),
+        "findings": list(c.findings.filter(resolved_at__isnull=True)
+                         .values("code","severity","message","suggestion","first_seen")),
         "exports": list(c.edi_exports.all().order_by("-created_at")
                         .values("id","file_path","status","sha256","created_at")),
     }
@@ -68,22 +71,15 @@ def claim_autofix(request, pk: int):
     return render(request, "portal/autofix_preview.html", {"claim": c, "changes": preview})
 
 def claim_submit(request, pk: int):
-    if not build_and_write_837p:
+    if not write_837p_batch:
         messages.error(request, "837 generator not available.")
         return redirect(reverse("portal-claim-detail", args=[pk]))
     c = get_object_or_404(Claim, pk=pk)
-    if c.findings.filter(severity="ERROR").exists():
+    if c.findings.filter(severity="ERROR", resolved_at__isnull=True).exists():
         messages.error(request, "Claim has blocking errors.")
         return redirect(reverse("portal-claim-detail", args=[pk]))
-    pat = Patient.objects.filter(pk=c.patient_id).first()
-    cov = (Coverage.objects.filter(patient_id=getattr(pat, "id", None))
-           .order_by("-effective_date").first()) if pat else None
-    payer_name = (cov.payer_name if cov and cov.payer_name else (c.payer_name or "PAYER"))
-    fpath = build_and_write_837p(c, pat, cov, payer_name)
-    from hashlib import sha256
-    h = sha256(open(fpath,"rb").read()).hexdigest()
-    EdiExport.objects.create(claim=c, file_path=fpath, sha256=h, status="QUEUED")
-    messages.success(request, f"837 generated: {fpath}")
+    exp = write_837p_batch([c.id])[0]
+    messages.success(request, f"837 generated: {exp.file_path} (ISA {exp.interchange_id})")
     return redirect(reverse("portal-claim-detail", args=[pk]))
 
 def denials_list(request):
@@ -99,13 +95,7 @@ def denial_detail(request, denial_id: int):
         note = request.POST.get("note","")
         valid = {s for s, _ in Denial.STATUS}
         if st in valid:
-            old = d.status
-            d.status = st
-            d.save(update_fields=["status"])
-            if note:
-                DenialStatusHistory.objects.create(
-                    denial=d, from_status=old or "", to_status=st, note=note
-                )
+            set_status(d, st, note, history=bool(note))
             messages.success(request, "Denial updated.")
             # fall through to render
     hist = list(d.history.order_by("-created_at").values("from_status","to_status","note","created_at"))
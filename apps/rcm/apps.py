@@ -3,3 +3,7 @@ class RcmConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.rcm"
     verbose_name = "RCM / Payers"
+
+    def ready(self):
+        from . import signals
+        signals.connect()
@@ -0,0 +1,116 @@
+"""
+Evaluate RCM rules for many superbills in one pass.
+
+Superbills are read `chunk_size` at a time with their patient and encounter
+joined in, their lines (and each line's rendering provider) prefetched in
+one query, and the primary registry Coverage of every patient in the chunk
+loaded in one more. The compiled rule set is version-checked once per batch
+and the applicable rules are resolved once per (payer, plan, date of service).
+`evaluate_superbills()` yields one result dict per superbill, in id order,
+so callers can stream them as NDJSON.
+"""
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from django.db.models import Prefetch
+
+from apps.billing.models import Superbill, SuperbillLine
+from apps.registry.models import Coverage
+
+from .rule_engine import PROCESS_TRACE, Resolver, RuleTrace, get_rule_set
+
+DEFAULT_CHUNK_SIZE = 200
+
+def line_dict(ln: SuperbillLine) -> dict:
+    prov = ln.rendering_provider
+    return {
+        "code": ln.code,
+        "mods": [m for m in [ln.mod1, ln.mod2, ln.mod3, ln.mod4] if m],
+        "pos": ln.pos,
+        "dx_ptrs": list(ln.dx_ptrs or []),
+        "units": ln.units,
+        "charge": float(ln.charge or 0),
+        "taxonomy": prov.taxonomy_code if prov is not None else "",
+    }
+
+def age_on(dob: Optional[date], dos: Optional[date]) -> Optional[int]:
+    if not dob or not dos:
+        return None
+    return dos.year - dob.year - ((dos.month, dos.day) < (dob.month, dob.day))
+
+def _date_of_service(sb: Superbill) -> Optional[date]:
+    enc = sb.encounter
+    when = getattr(enc, "started_at", None) or sb.created_at
+    return when.date() if when else None
+
+def _coverages(patient_ids: Iterable[int]) -> Dict[int, List[Coverage]]:
+    """patient_id -> coverages, primary first."""
+    out: Dict[int, List[Coverage]] = {}
+    qs = (Coverage.objects.filter(patient_id__in=set(patient_ids)).select_related("payer")
+          .order_by("patient_id", "-is_primary", "priority", "cob_order", "id"))
+    for cov in qs:
+        out.setdefault(cov.patient_id, []).append(cov)
+    return out
+
+def _coverage_on(coverages: List[Coverage], dos: Optional[date]) -> Optional[Coverage]:
+    for cov in coverages:
+        if dos is None or ((not cov.effective_start or cov.effective_start <= dos)
+                           and (not cov.effective_end or dos <= cov.effective_end)):
+            return cov
+    return None
+
+def _evaluate_one(sb: Superbill, coverages: List[Coverage], resolver: Resolver,
+                  trace: Optional[RuleTrace]) -> dict:
+    dos = _date_of_service(sb)
+    patient = sb.patient
+    cov = _coverage_on(coverages, dos)
+    hdr = {
+        "patient_id": sb.patient_id,
+        "dos": dos.isoformat() if dos else None,
+        "sex": patient.gender or "",
+        "age": age_on(patient.dob or patient.date_of_birth, dos),
+        "payer_id": cov.payer.payer_id if cov is not None else "",
+        "plan": cov.plan_name if cov is not None else "",
+    }
+    dx_list = list(sb.icd_codes or [])
+    lines = [line_dict(ln) for ln in sb.billing_lines.all()]
+    applicable = resolver.resolve(hdr["payer_id"], hdr["plan"], dos)
+    issues = applicable.evaluate(dx_list, lines, age=hdr["age"], sex=hdr["sex"], trace=trace)
+    return {"superbill_id": sb.id, "header": hdr, "lines": lines, "dx": dx_list, "issues": issues}
+
+def superbill_ids(ids: Optional[Iterable[int]] = None, day: Optional[date] = None, status: str = ""):
+    """Superbill ids selected by explicit ids and/or creation date and status."""
+    qs = Superbill.objects.all()
+    if ids is not None:
+        qs = qs.filter(id__in=ids)
+    if day is not None:
+        qs = qs.filter(created_at__date=day)
+    if status:
+        qs = qs.filter(status=status)
+    return qs.order_by("id").values_list("id", flat=True)
+
+def evaluate_superbills(ids: Iterable[int], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                        trace: Optional[RuleTrace] = None) -> Iterator[dict]:
+    """
+    Yield one result per existing superbill in `ids`, ordered by id. With a
+    `trace`, per-rule timings are collected into it and, once the batch is
+    exhausted, merged into PROCESS_TRACE.
+    """
+    ids = sorted(set(ids))
+    chunk_size = max(1, int(chunk_size))
+    resolver = get_rule_set().resolver()
+    lines = Prefetch("billing_lines", queryset=SuperbillLine.objects.select_related("rendering_provider").order_by("id"))
+    for start in range(0, len(ids), chunk_size):
+        chunk = list(Superbill.objects.filter(id__in=ids[start:start + chunk_size])
+                     .select_related("patient", "encounter").prefetch_related(lines).order_by("id"))
+        coverages = _coverages(sb.patient_id for sb in chunk)
+        for sb in chunk:
+            yield _evaluate_one(sb, coverages.get(sb.patient_id, []), resolver, trace)
+    if trace is not None:
+        PROCESS_TRACE.merge(trace)
+
+def with_trace(results: Iterable[dict], trace: Optional[RuleTrace]) -> Iterator[dict]:
+    """Pass results through, then append {"trace": [...]} once they are exhausted."""
+    yield from results
+    if trace is not None:
+        yield {"trace": trace.as_list()}
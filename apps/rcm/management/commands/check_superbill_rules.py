@@ -0,0 +1,60 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from apps.claims import streaming
+from apps.rcm.batch import evaluate_superbills, superbill_ids, with_trace, DEFAULT_CHUNK_SIZE
+from apps.rcm.rule_engine import RuleTrace
+
+class Command(BaseCommand):
+    help = "Evaluate RCM rules for many superbills in one pass, writing one NDJSON result per superbill."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", type=str, default="", help="Comma-separated superbill ids")
+        parser.add_argument("--date", type=str, default="", help="Superbills created on this day (YYYY-MM-DD)")
+        parser.add_argument("--status", type=str, default="", help="Only superbills with this status")
+        parser.add_argument("--trace", action="store_true",
+                            help="Time every rule and append a final {\"trace\": [...]} line")
+        parser.add_argument("--issues-only", action="store_true", help="Skip superbills without issues")
+        parser.add_argument("--output", type=str, default="", help="Write NDJSON here instead of stdout")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                            help="Superbills per prefetch chunk")
+
+    def handle(self, *args, **opts):
+        ids = day = None
+        if opts["ids"]:
+            try:
+                ids = [int(x) for x in opts["ids"].split(",") if x.strip()]
+            except ValueError:
+                raise CommandError("--ids must be a comma-separated list of integers")
+        if opts["date"]:
+            day = parse_date(opts["date"])
+            if day is None:
+                raise CommandError("--date must be YYYY-MM-DD")
+        if opts["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be >= 1")
+
+        counts = {"superbills": 0, "with_issues": 0, "issues": 0}
+
+        def counted(results):
+            for res in results:
+                counts["superbills"] += 1
+                counts["issues"] += len(res["issues"])
+                counts["with_issues"] += bool(res["issues"])
+                if res["issues"] or not opts["issues_only"]:
+                    yield res
+
+        selected = list(superbill_ids(ids, day, opts["status"]))
+        trace = RuleTrace() if opts["trace"] else None
+        rows = with_trace(counted(evaluate_superbills(selected, chunk_size=opts["chunk_size"], trace=trace)), trace)
+        out = open(opts["output"], "w", encoding="utf-8") if opts["output"] else sys.stdout
+        try:
+            for chunk in streaming.iter_ndjson(rows):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        self.stderr.write(self.style.SUCCESS(
+            f"Checked {counts['superbills']} superbills: {counts['issues']} issues "
+            f"on {counts['with_issues']}."
+        ))
@@ -36,3 +36,10 @@ class Rule(models.Model):
     effective_end = models.DateField(null=True, blank=True)
 
     def __str__(self): return f"{self.severity} {self.name}"
+
+class RuleSetVersion(models.Model):
+    """Single-row stamp bumped whenever a Rule or PayerPlan changes; compiled rule sets reload on mismatch."""
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self): return f"rules v{self.version}"
@@ -0,0 +1,342 @@
+"""
+Compiled, process-wide RCM rule set.
+
+- Active rules are loaded once and filed by target: (payer, plan), where
+  payer is payer_id_str or the linked PayerPlan's payer id, plan is that
+  PayerPlan's plan_id (or name) and "" means any. Each target holds an
+  IntervalIndex over effective dates, so the rules for a (payer, plan, date
+  of service) are found with a bisect per target instead of a scan. Claims
+  only know the coverage's plan name, so `resolve()` maps a plan name to its
+  PayerPlan's plan_id first (the plan_id itself is accepted too).
+- `resolve()` returns an Applicable: the generic rules plus those for the
+  claim's payer and plan, split by scope and, for LINE rules, by cpt_code
+  ("" = every code). A line is only tested against the rules filed under
+  its own code plus the code-agnostic ones. A Resolver memoizes that per key
+  for the length of a batch.
+- pos_allowed / dx_* / modifiers_required / sex / taxonomy lists are
+  frozensets, so each check is a set operation instead of rebuilding lists
+  per line.
+- Age and sex are checked against the patient, taxonomy (LINE rules only)
+  against the line's rendering provider; a value that is unknown for the
+  claim is not held against it.
+- The cache is stamped with RuleSetVersion.version, which signals bump on
+  every Rule / PayerPlan save or delete; other processes drop their stale
+  copy on the next `get_rule_set()` call. QuerySet.update() bypasses the
+  signals, so callers doing bulk edits should call `bump_version()`.
+- Tracing is opt-in: pass a RuleTrace to evaluate() and merge it into
+  PROCESS_TRACE, the per-process table behind the rules metrics view.
+"""
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Rule, RuleSetVersion
+
+_LOCK = threading.Lock()
+_CACHE: Optional["RuleSet"] = None
+
+def normalize_sex(value: str) -> str:
+    """'male' / 'Female' / 'm' -> 'M' / 'F'; anything else upper-cased, '' when unknown."""
+    v = (value or "").strip().upper()
+    return {"MALE": "M", "FEMALE": "F", "UNKNOWN": ""}.get(v, v)
+
+def _norm(value: str) -> str:
+    return (value or "").strip().upper()
+
+class CompiledRule:
+    __slots__ = ("order", "id", "name", "scope", "severity", "message", "payer", "plan", "plan_name", "cpt",
+                 "pos_allowed", "modifiers_required", "modifiers_set", "dx_required_any", "dx_allowed",
+                 "min_age", "max_age", "sex_allowed", "taxonomy_allowed", "effective_start", "effective_end")
+
+    def __init__(self, order: int, r: Rule):
+        self.order = order
+        self.id = r.id
+        self.name = r.name
+        self.scope = r.scope
+        self.severity = r.severity
+        self.message = r.message
+        plan = r.payer_plan if r.payer_plan_id else None
+        self.payer = _norm(r.payer_id_str or (plan.payer_id_str if plan else ""))
+        self.plan = _norm((plan.plan_id or plan.name) if plan else "")
+        self.plan_name = _norm(plan.name if plan else "")
+        self.cpt = r.cpt_code or ""
+        self.pos_allowed = frozenset(r.pos_allowed or ())
+        self.modifiers_required = tuple(r.modifiers_required or ())   # keeps order for messages
+        self.modifiers_set = frozenset(self.modifiers_required)
+        self.dx_required_any = frozenset(r.dx_required_any or ())
+        self.dx_allowed = frozenset(r.dx_allowed or ())
+        self.min_age = r.min_age
+        self.max_age = r.max_age
+        self.sex_allowed = frozenset(normalize_sex(s) for s in r.sex_allowed or ())
+        self.taxonomy_allowed = frozenset(r.provider_taxonomy_allowed or ())
+        self.effective_start = r.effective_start
+        self.effective_end = r.effective_end
+
+    def effective_on(self, dos: Optional[date]) -> bool:
+        if dos is None:
+            return True
+        return not ((self.effective_start and dos < self.effective_start)
+                    or (self.effective_end and dos > self.effective_end))
+
+    def _check_patient(self, age: Optional[int], sex: str, line: Optional[int] = None) -> List[dict]:
+        out = []
+        if age is not None and ((self.min_age is not None and age < self.min_age)
+                                or (self.max_age is not None and age > self.max_age)):
+            out.append(self._issue(f"Patient age {age} outside {self.min_age or 0}-{self.max_age or 'any'}", line))
+        if self.sex_allowed and sex and sex not in self.sex_allowed:
+            out.append(self._issue(f"Patient sex {sex} not allowed", line))
+        return out
+
+    def _issue(self, msg: str, line: Optional[int] = None) -> dict:
+        if line is None:
+            return {"severity": self.severity, "scope": "CLAIM", "rule": self.name, "msg": self.message or msg}
+        return {"severity": self.severity, "scope": "LINE", "line": line, "rule": self.name, "msg": self.message or msg}
+
+    def check_claim(self, dx_set: frozenset, age: Optional[int] = None, sex: str = "") -> List[dict]:
+        out = []
+        if self.dx_allowed and dx_set - self.dx_allowed:
+            out.append(self._issue("DX not allowed"))
+        if self.dx_required_any and not dx_set & self.dx_required_any:
+            out.append(self._issue("Required DX missing"))
+        out += self._check_patient(age, sex)
+        return out
+
+    def check_line(self, idx: int, ln: dict, mods: frozenset, pointed_dx: frozenset,
+                   age: Optional[int] = None, sex: str = "") -> List[dict]:
+        out = []
+        if self.pos_allowed and ln["pos"] and ln["pos"] not in self.pos_allowed:
+            out.append(self._issue(f"POS {ln['pos']} not allowed", idx))
+        if self.modifiers_set and not self.modifiers_set <= mods:
+            missing = [m for m in self.modifiers_required if m not in mods]
+            out.append(self._issue(f"Missing modifier(s): {', '.join(missing)}", idx))
+        if self.dx_required_any and not pointed_dx & self.dx_required_any:
+            out.append(self._issue("Required DX pointer missing", idx))
+        taxonomy = ln.get("taxonomy") or ""
+        if self.taxonomy_allowed and taxonomy and taxonomy not in self.taxonomy_allowed:
+            out.append(self._issue(f"Provider taxonomy {taxonomy} not allowed", idx))
+        out += self._check_patient(age, sex, idx)
+        return out
+
+class Applicable:
+    """The rules that apply to one (payer, plan, date of service), grouped for evaluation."""
+    __slots__ = ("claim_rules", "line_rules", "size")
+
+    def __init__(self, rules: Iterable[CompiledRule]):
+        self.claim_rules: List[CompiledRule] = []
+        self.line_rules: Dict[str, List[CompiledRule]] = {}   # cpt ("" = every code) -> rules
+        self.size = 0
+        for cr in sorted(rules, key=lambda r: r.order):
+            self.size += 1
+            if cr.scope == "CLAIM":
+                self.claim_rules.append(cr)
+            else:
+                self.line_rules.setdefault(cr.cpt, []).append(cr)
+
+    def evaluate(self, dx_list: List[str], lines: List[dict], age: Optional[int] = None, sex: str = "",
+                 trace: Optional["RuleTrace"] = None) -> List[dict]:
+        """
+        Issues for one claim, ordered by rule then line like the old rules x
+        lines scan. `trace` times every rule check and counts its issues.
+        """
+        sex = normalize_sex(sex)
+        dx_set = frozenset(dx for dx in dx_list if dx)
+        hits: List[Tuple[int, int, int, dict]] = []
+        for cr in self.claim_rules:
+            if trace is None:
+                found = cr.check_claim(dx_set, age, sex)
+            else:
+                started = time.perf_counter()
+                found = cr.check_claim(dx_set, age, sex)
+                trace.record(cr, len(found), time.perf_counter() - started)
+            for n, issue in enumerate(found):
+                hits.append((cr.order, 0, n, issue))
+        if self.line_rules:
+            for idx, ln in enumerate(lines, start=1):
+                mods = frozenset(ln["mods"])
+                pointed = frozenset(dx_list[p - 1] for p in ln["dx_ptrs"]
+                                    if isinstance(p, int) and 0 < p <= len(dx_list))
+                for code in ("", ln["code"]) if ln["code"] else ("",):
+                    for cr in self.line_rules.get(code, ()):
+                        if trace is None:
+                            found = cr.check_line(idx, ln, mods, pointed, age, sex)
+                        else:
+                            started = time.perf_counter()
+                            found = cr.check_line(idx, ln, mods, pointed, age, sex)
+                            trace.record(cr, len(found), time.perf_counter() - started)
+                        for n, issue in enumerate(found):
+                            hits.append((cr.order, idx, n, issue))
+        hits.sort(key=lambda h: h[:3])
+        return [h[3] for h in hits]
+
+class RuleTrace:
+    """
+    Per-rule counters: checks run (lines for LINE rules, claims for CLAIM
+    rules), issues raised and cumulative seconds. One instance per traced
+    request or batch, merged into the process-wide PROCESS_TRACE.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.rows: Dict[int, list] = {}   # rule id -> [name, scope, checks, issues, seconds]
+            self.since = timezone.now()
+
+    def record(self, cr: CompiledRule, issues: int, seconds: float):
+        row = self.rows.get(cr.id)
+        if row is None:
+            row = self.rows.setdefault(cr.id, [cr.name, cr.scope, 0, 0, 0.0])
+        row[2] += 1
+        row[3] += issues
+        row[4] += seconds
+
+    def merge(self, other: "RuleTrace"):
+        with self._lock:
+            for rule_id, (name, scope, checks, issues, seconds) in other.rows.items():
+                row = self.rows.setdefault(rule_id, [name, scope, 0, 0, 0.0])
+                row[0], row[1] = name, scope
+                row[2] += checks
+                row[3] += issues
+                row[4] += seconds
+
+    def as_list(self) -> List[dict]:
+        out = []
+        for rule_id, (name, scope, checks, issues, seconds) in list(self.rows.items()):
+            out.append({
+                "rule_id": rule_id,
+                "rule": name,
+                "scope": scope,
+                "checks": checks,
+                "issues": issues,
+                "seconds": round(seconds, 6),
+                "avg_us": round(seconds / checks * 1e6, 2) if checks else 0.0,
+                "hit_rate": round(issues / checks, 4) if checks else 0.0,
+            })
+        return sorted(out, key=lambda r: -r["seconds"])
+
+    def snapshot(self) -> dict:
+        return {"pid": os.getpid(), "since": self.since.isoformat(), "rules": self.as_list()}
+
+PROCESS_TRACE = RuleTrace()
+
+class IntervalIndex:
+    """
+    One payer/plan target's rules over effective dates. The distinct window
+    boundaries split the calendar into segments with a fixed rule subset;
+    a date of service is located with bisect and the segment's subset is
+    built on first use.
+    """
+    def __init__(self, rules: List[CompiledRule]):
+        self.rules = rules
+        points = {r.effective_start for r in rules if r.effective_start}
+        points |= {r.effective_end + timedelta(days=1) for r in rules if r.effective_end and r.effective_end < date.max}
+        self.bounds: List[date] = sorted(points)
+        self._segments: Dict[int, Tuple[CompiledRule, ...]] = {}
+
+    def at(self, dos: Optional[date]) -> Tuple[CompiledRule, ...]:
+        if dos is None:
+            return tuple(self.rules)
+        i = bisect_right(self.bounds, dos)
+        seg = self._segments.get(i)
+        if seg is None:
+            probe = self.bounds[i - 1] if i else date.min
+            seg = self._segments[i] = tuple(r for r in self.rules if r.effective_on(probe))
+        return seg
+
+class RuleSet:
+    def __init__(self, version: int, rules: Iterable[CompiledRule]):
+        self.version = version
+        self.size = 0
+        by_target: Dict[Tuple[str, str], List[CompiledRule]] = {}   # (payer, plan); "" = any
+        self.plan_keys: Dict[Tuple[str, str], str] = {}              # (payer, plan name or id) -> plan
+        for cr in rules:
+            self.size += 1
+            by_target.setdefault((cr.payer, cr.plan), []).append(cr)
+            if cr.plan:
+                self.plan_keys[(cr.payer, cr.plan)] = cr.plan
+                if cr.plan_name:
+                    self.plan_keys.setdefault((cr.payer, cr.plan_name), cr.plan)
+        self.targets = {key: IntervalIndex(rs) for key, rs in by_target.items()}
+
+    @classmethod
+    def load(cls, version: int) -> "RuleSet":
+        qs = Rule.objects.filter(active=True).select_related("payer_plan").order_by("id")
+        return cls(version, (CompiledRule(i, r) for i, r in enumerate(qs)))
+
+    def resolve(self, payer_id: str = "", plan: str = "", dos: Optional[date] = None) -> Applicable:
+        """Generic rules, plus the payer's and the payer plan's when known, effective on `dos`."""
+        payer_id, plan = _norm(payer_id), _norm(plan)
+        if plan:
+            plan = self.plan_keys.get((payer_id, plan)) or self.plan_keys.get(("", plan)) or plan
+        keys = {("", "")}
+        if payer_id:
+            keys.add((payer_id, ""))
+        if plan:
+            keys |= {("", plan), (payer_id, plan)}
+        rules: List[CompiledRule] = []
+        for key in keys:
+            index = self.targets.get(key)
+            if index is not None:
+                rules.extend(index.at(dos))
+        return Applicable(rules)
+
+    def resolver(self) -> "Resolver":
+        return Resolver(self)
+
+    def evaluate(self, dx_list: List[str], lines: List[dict], payer_id: str = "", dos: Optional[date] = None,
+                 age: Optional[int] = None, sex: str = "", plan: str = "",
+                 trace: Optional[RuleTrace] = None) -> List[dict]:
+        return self.resolve(payer_id, plan, dos).evaluate(dx_list, lines, age, sex, trace)
+
+class Resolver:
+    """Per-batch memo of RuleSet.resolve() by (payer, plan, date of service)."""
+    def __init__(self, rules: RuleSet):
+        self.rules = rules
+        self._cache: Dict[Tuple[str, str, Optional[date]], Applicable] = {}
+
+    def resolve(self, payer_id: str = "", plan: str = "", dos: Optional[date] = None) -> Applicable:
+        key = (payer_id, plan, dos)
+        hit = self._cache.get(key)
+        if hit is None:
+            hit = self._cache[key] = self.rules.resolve(payer_id, plan, dos)
+        return hit
+
+def current_version() -> int:
+    row = RuleSetVersion.objects.filter(pk=1).values_list("version", flat=True).first()
+    return row or 0
+
+def bump_version() -> int:
+    """Mark the rules as changed; every process recompiles on next access."""
+    RuleSetVersion.objects.get_or_create(pk=1)
+    RuleSetVersion.objects.filter(pk=1).update(version=F("version") + 1)
+    invalidate()
+    return current_version()
+
+def invalidate():
+    global _CACHE
+    with _LOCK:
+        _CACHE = None
+
+def get_rule_set(check_version: bool = True) -> RuleSet:
+    """
+    Return the compiled rules, recompiling when the stored version moved.
+    Pass check_version=False inside a batch that already validated the cache.
+    """
+    global _CACHE
+    cached = _CACHE
+    if cached is not None and not check_version:
+        return cached
+    version = current_version()
+    if cached is not None and cached.version == version:
+        return cached
+    with _LOCK:
+        if _CACHE is None or _CACHE.version != version:
+            _CACHE = RuleSet.load(version)
+        return _CACHE
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+
+from . import rule_engine
+from .models import PayerPlan, Rule
+
+def _rules_changed(sender, **kwargs):
+    rule_engine.bump_version()
+
+def connect():
+    for model in (Rule, PayerPlan):
+        post_save.connect(_rules_changed, sender=model, dispatch_uid=f"rcm-rules-{model.__name__}-save")
+        post_delete.connect(_rules_changed, sender=model, dispatch_uid=f"rcm-rules-{model.__name__}-delete")
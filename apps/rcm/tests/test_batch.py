@@ -0,0 +1,82 @@
+# apps/rcm/tests/test_batch.py
+import json
+from datetime import date
+import pytest
+from django.test import Client
+from apps.billing.models import Superbill, SuperbillLine
+from apps.chart.models import Encounter
+from apps.patients.models import Patient
+from apps.rcm import rule_engine
+from apps.rcm.batch import evaluate_superbills
+from apps.rcm.models import PayerPlan, Rule
+from apps.registry.models import Coverage, Payer
+
+@pytest.fixture(autouse=True)
+def _fresh_rule_set():
+    rule_engine.invalidate()
+    yield
+    rule_engine.invalidate()
+
+def _superbill(gender, payer=None, codes=("99213",)):
+    pt = Patient.objects.create(first_name="A", last_name="B", date_of_birth=date(1990, 6, 1), gender=gender)
+    if payer is not None:
+        Coverage.objects.create(patient=pt, payer=payer, member_id="M1")
+    sb = Superbill.objects.create(encounter=Encounter.objects.create(patient=pt), patient=pt, icd_codes=["Z00.00"])
+    for code in codes:
+        SuperbillLine.objects.create(superbill=sb, code=code, pos="11", dx_ptrs=[1])
+    return sb
+
+def test_batch_applies_payer_sex_and_age(db, django_assert_max_num_queries):
+    acme = Payer.objects.create(name="Acme", payer_id="ACME01")
+    Rule.objects.create(name="acme only", payer_id_str="ACME01", cpt_code="99213", modifiers_required=["25"])
+    Rule.objects.create(name="female only", cpt_code="59400", sex_allowed=["F"])
+    Rule.objects.create(name="peds", scope="CLAIM", max_age=17)
+    Rule.objects.create(name="retired", scope="CLAIM", effective_end=date(2000, 1, 1))
+    a = _superbill("male", payer=acme, codes=("99213", "59400"))
+    b = _superbill("female", payer=Payer.objects.create(name="Other", payer_id="OTH"))
+
+    rule_engine.get_rule_set()
+    with django_assert_max_num_queries(6):
+        results = list(evaluate_superbills([b.id, a.id, 999999]))
+    assert [r["superbill_id"] for r in results] == [a.id, b.id]
+    assert results[0]["header"]["payer_id"] == "ACME01"
+    assert sorted(i["rule"] for i in results[0]["issues"]) == ["acme only", "female only", "peds"]
+    assert [i["rule"] for i in results[1]["issues"]] == ["peds"]
+
+def test_batch_endpoint_streams_ndjson(db):
+    sb = _superbill("female")
+    resp = Client().post("/rcm/rules/check/superbills.ndjson", json.dumps({"ids": [sb.id]}),
+                         content_type="application/json")
+    assert resp.status_code == 200
+    rows = [json.loads(line) for line in b"".join(resp.streaming_content).decode().splitlines()]
+    assert [r["superbill_id"] for r in rows] == [sb.id]
+    assert Client().post("/rcm/rules/check/superbills.ndjson", "{}", content_type="application/json").status_code == 400
+
+def test_trace_counts_checks_and_feeds_metrics(db):
+    Rule.objects.create(name="female only", cpt_code="59400", sex_allowed=["F"])
+    Rule.objects.create(name="any line", pos_allowed=["11"])
+    sb = _superbill("male", codes=("59400", "99213"))
+    rule_engine.PROCESS_TRACE.reset()
+
+    body = Client().get(f"/rcm/rules/check/superbill/{sb.id}.json", {"trace": "1"}).json()
+    rows = {r["rule"]: r for r in body["trace"]}
+    assert (rows["female only"]["checks"], rows["female only"]["issues"]) == (1, 1)
+    assert (rows["any line"]["checks"], rows["any line"]["issues"]) == (2, 0)
+    assert "trace" not in Client().get(f"/rcm/rules/check/superbill/{sb.id}.json").json()
+
+    metrics = Client().get("/rcm/rules/metrics.json").json()
+    assert {r["rule"]: r["checks"] for r in metrics["rules"]} == {"female only": 1, "any line": 2}
+
+def test_batch_matches_coverage_plan_name_to_payer_plan_id(db):
+    acme = Payer.objects.create(name="Acme", payer_id="ACME01")
+    gold = PayerPlan.objects.create(payer_id_str="ACME01", plan_id="G-100", name="Gold PPO")
+    Rule.objects.create(name="gold needs 25", payer_plan=gold, cpt_code="99213", modifiers_required=["25"])
+    sb = _superbill("female", payer=acme)
+    Coverage.objects.filter(patient=sb.patient).update(plan_name="Gold PPO")
+    other = _superbill("female", payer=acme)
+    Coverage.objects.filter(patient=other.patient).update(plan_name="Silver")
+
+    results = list(evaluate_superbills([sb.id, other.id]))
+    assert results[0]["header"]["plan"] == "Gold PPO"
+    assert [i["rule"] for i in results[0]["issues"]] == ["gold needs 25"]
+    assert results[1]["issues"] == []
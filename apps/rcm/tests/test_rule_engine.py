@@ -0,0 +1,61 @@
+# apps/rcm/tests/test_rule_engine.py
+import pytest
+from apps.rcm import rule_engine
+from apps.rcm.models import PayerPlan, Rule
+
+@pytest.fixture(autouse=True)
+def _fresh_rule_set():
+    rule_engine.invalidate()
+    yield
+    rule_engine.invalidate()
+
+def _line(code, mods=(), pos="11", ptrs=(1,)):
+    return {"code": code, "mods": list(mods), "pos": pos, "dx_ptrs": list(ptrs), "units": 1, "charge": 0.0}
+
+def test_line_rules_only_hit_their_cpt(db):
+    Rule.objects.create(name="25 on E/M", cpt_code="99214", modifiers_required=["25"], severity="BLOCK")
+    Rule.objects.create(name="office only", pos_allowed=["11"])
+    Rule.objects.create(name="htn dx", cpt_code="93000", dx_required_any=["I10"])
+    Rule.objects.create(name="no z-codes", scope="CLAIM", dx_allowed=["E11.9", "I10"])
+
+    rules = rule_engine.get_rule_set()
+    issues = rules.evaluate(["E11.9", "Z00.00"], [_line("99214"), _line("93000", pos="22"), _line("36415")])
+    assert [(i["rule"], i.get("line")) for i in issues] == [
+        ("25 on E/M", 1),
+        ("office only", 2),
+        ("htn dx", 2),
+        ("no z-codes", None),
+    ]
+    assert issues[0]["msg"] == "Missing modifier(s): 25"
+
+def test_payer_targeting_and_recompile_on_save(db):
+    plan = PayerPlan.objects.create(payer_label="ACME", payer_id_str="ACME01")
+    rule = Rule.objects.create(name="acme pos", payer_plan=plan, pos_allowed=["11"])
+    first = rule_engine.get_rule_set()
+    assert first.evaluate([], [_line("99213", pos="22")], payer_id="OTHER") == []
+    assert len(first.evaluate([], [_line("99213", pos="22")], payer_id="ACME01")) == 1
+    assert rule_engine.get_rule_set() is first
+
+    rule.active = False
+    rule.save()
+    fresh = rule_engine.get_rule_set()
+    assert fresh is not first and fresh.size == 0
+
+def test_resolve_by_payer_plan_and_effective_date(db):
+    from datetime import date
+    gold = PayerPlan.objects.create(payer_label="ACME", payer_id_str="ACME01", plan_id="GOLD")
+    Rule.objects.create(name="generic")
+    Rule.objects.create(name="acme 2024", payer_id_str="acme01",
+                        effective_start=date(2024, 1, 1), effective_end=date(2024, 12, 31))
+    Rule.objects.create(name="acme 2025+", payer_id_str="ACME01", effective_start=date(2025, 1, 1))
+    Rule.objects.create(name="gold plan", payer_plan=gold)
+
+    rules = rule_engine.get_rule_set()
+    names = lambda a: sorted(r.name for r in a.claim_rules + [r for rs in a.line_rules.values() for r in rs])
+    assert names(rules.resolve("", "", date(2024, 6, 1))) == ["generic"]
+    assert names(rules.resolve("ACME01", "", date(2024, 12, 31))) == ["acme 2024", "generic"]
+    assert names(rules.resolve("ACME01", "", date(2025, 1, 1))) == ["acme 2025+", "generic"]
+    assert names(rules.resolve("ACME01", "gold", date(2023, 1, 1))) == ["generic", "gold plan"]
+
+    resolver = rules.resolver()
+    assert resolver.resolve("ACME01", "", date(2025, 3, 1)) is resolver.resolve("ACME01", "", date(2025, 3, 1))
@@ -2,4 +2,6 @@ from django.urls import path
 from . import views
 urlpatterns = [
     path('rules/check/superbill/<int:superbill_id>.json', views.rules_check_superbill, name='rcm-rules-check-superbill'),
+    path('rules/check/superbills.ndjson', views.rules_check_superbills, name='rcm-rules-check-superbills'),
+    path('rules/metrics.json', views.rules_metrics, name='rcm-rules-metrics'),
 ]
@@ -1,64 +1,67 @@
-from django.http import JsonResponse
-from django.views.decorators.http import require_GET
-from apps.rcm.models import Rule
-from apps.billing.models import Superbill, SuperbillLine
+import json
+from typing import Optional
 
-def _line_dict(ln: SuperbillLine):
-    return {
-        "code": ln.code,
-        "mods": [m for m in [ln.mod1,ln.mod2,ln.mod3,ln.mod4] if m],
-        "pos": ln.pos,
-        "dx_ptrs": list(ln.dx_ptrs or []),
-        "units": ln.units,
-        "charge": float(ln.charge or 0),
-    }
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from apps.billing.models import Superbill
+from apps.claims import streaming
+from apps.rcm.batch import evaluate_superbills, superbill_ids, with_trace, DEFAULT_CHUNK_SIZE
+from apps.rcm.rule_engine import PROCESS_TRACE, RuleTrace
 
-def _evaluate(sb: Superbill):
-    # assemble claim context
-    hdr = {
-        "patient_id": getattr(sb,'patient_id',None),
-        "sex": "", "age": None,  # placeholders (wire later to demographics/DOB)
-        "payer_id": "",          # placeholder; wire to Coverage later
-    }
-    # legacy dx on header
-    dx_list = list(getattr(sb,'icd_codes',[]) or [])
-    lines = []
-    issues = []
-    for ln in SuperbillLine.objects.filter(superbill=sb).order_by('id'):
-        lines.append(_line_dict(ln))
+def _evaluate(sb: Superbill, trace: Optional[RuleTrace] = None):
+    out = list(evaluate_superbills([sb.pk], trace=trace))[0]
+    out.pop("superbill_id")
+    return out
 
-    # run rules (coarse MVP)
-    rules = Rule.objects.filter(active=True)
-    for r in rules:
-        # scope
-        if r.scope == 'CLAIM':
-            # dx constraints
-            if r.dx_allowed and any(dx not in r.dx_allowed for dx in dx_list if dx):
-                issues.append({"severity": r.severity, "scope": "CLAIM", "rule": r.name, "msg": r.message or "DX not allowed"})
-            if r.dx_required_any and not any(dx in r.dx_required_any for dx in dx_list if dx):
-                issues.append({"severity": r.severity, "scope": "CLAIM", "rule": r.name, "msg": r.message or "Required DX missing"})
-        else:
-            # LINE rules
-            for idx, ln in enumerate(lines, start=1):
-                if r.cpt_code and r.cpt_code != ln["code"]:
-                    continue
-                if r.pos_allowed and ln["pos"] and ln["pos"] not in r.pos_allowed:
-                    issues.append({"severity": r.severity, "scope":"LINE", "line": idx, "rule": r.name, "msg": r.message or f"POS {ln['pos']} not allowed"})
-                if r.modifiers_required:
-                    missing = [m for m in r.modifiers_required if m not in ln["mods"]]
-                    if missing:
-                        issues.append({"severity": r.severity, "scope":"LINE", "line": idx, "rule": r.name, "msg": r.message or f"Missing modifier(s): {', '.join(missing)}"})
-                if r.dx_required_any:
-                    # map dx_ptrs (1-based) to header dx list
-                    ptr_any = any( (p>0 and p<=len(dx_list) and dx_list[p-1] in r.dx_required_any) for p in ln["dx_ptrs"] )
-                    if not ptr_any:
-                        issues.append({"severity": r.severity, "scope":"LINE", "line": idx, "rule": r.name, "msg": r.message or "Required DX pointer missing"})
-    return {"header": hdr, "lines": lines, "dx": dx_list, "issues": issues}
+def _tracing(request) -> bool:
+    return request.GET.get("trace", "").lower() in ("1", "true", "yes")
 
 @require_GET
 def rules_check_superbill(request, superbill_id:int):
+    """?trace=1 adds per-rule checks, issues and seconds for this evaluation."""
     sb = Superbill.objects.filter(pk=superbill_id).first()
     if not sb:
         return JsonResponse({"ok": False, "error": "not-found"}, status=404)
-    out = _evaluate(sb)
+    trace = RuleTrace() if _tracing(request) else None
+    out = _evaluate(sb, trace)
+    if trace is not None:
+        out["trace"] = trace.as_list()
     return JsonResponse({"ok": True, **out})
+
+@csrf_exempt
+@require_POST
+def rules_check_superbills(request):
+    """
+    Batch check, streamed as NDJSON (one result per superbill).
+    Body: {"ids": [1, 2, 3]} and/or {"date": "YYYY-MM-DD", "status": "DRAFT"}
+    ?trace=1 appends a final {"trace": [...]} line with per-rule totals.
+    """
+    try:
+        p = json.loads(request.body.decode() or '{}')
+    except Exception:
+        return JsonResponse({'ok': False, 'error': 'bad-json'}, status=400)
+    ids, day = p.get("ids"), None
+    if ids is not None:
+        try:
+            ids = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            return JsonResponse({'ok': False, 'error': 'ids must be a list of integers'}, status=400)
+    if p.get("date"):
+        day = parse_date(str(p["date"]))
+        if day is None:
+            return JsonResponse({'ok': False, 'error': 'date must be YYYY-MM-DD'}, status=400)
+    if ids is None and day is None:
+        return JsonResponse({'ok': False, 'error': 'ids or date required'}, status=400)
+
+    selected = superbill_ids(ids, day, str(p.get("status") or ""))
+    trace = RuleTrace() if _tracing(request) else None
+    results = evaluate_superbills(list(selected), chunk_size=DEFAULT_CHUNK_SIZE, trace=trace)
+    return StreamingHttpResponse(streaming.iter_ndjson(with_trace(results, trace)),
+                                 content_type=streaming.CONTENT_TYPES["ndjson"])
+
+@require_GET
+def rules_metrics(request):
+    """Per-rule totals from every traced evaluation in this worker process, slowest rule first."""
+    return JsonResponse(PROCESS_TRACE.snapshot())
@@ -231,6 +231,7 @@ class Coverage(models.Model):
     cob_order = models.PositiveSmallIntegerField(default=1)
     coverage_class_json = models.JSONField(default=list, blank=True)
     extensions_json = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         indexes = [
@@ -106,8 +106,15 @@ SPECTACULAR_SETTINGS = {
 
 EXPORTS_DIR = os.path.join(BASE_DIR, "exports", "edi")
 IMPORTS_ERA_DIR = os.path.join(BASE_DIR, "imports", "era")
+IMPORTS_ACK_DIR = os.path.join(BASE_DIR, "imports", "ack")  # 999 / 277CA
+NCCI_EDITIONS_DIR = os.path.join(BASE_DIR, "data", "ncci")  # compiled quarterly PTP/MUE (.bin)
+EDI_OUTBOX_DIR = os.path.join(BASE_DIR, "exports", "outbox")  # OutboxTransport drop (stands in for SFTP)
+EDI_TRANSPORT = "apps.claims.edi_transport.OutboxTransport"
+FHIR_EXPORT_DIR = os.path.join(BASE_DIR, "exports", "fhir")  # bulk $export NDJSON, one folder per ExportJob
 os.makedirs(EXPORTS_DIR, exist_ok=True)
 os.makedirs(IMPORTS_ERA_DIR, exist_ok=True)
+os.makedirs(IMPORTS_ACK_DIR, exist_ok=True)
+os.makedirs(FHIR_EXPORT_DIR, exist_ok=True)
 
 AUTOFIX_FLAGS = {
     "POS_CONFLICT": True,